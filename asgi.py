@@ -0,0 +1,558 @@
+"""ASGI entry point: async participant and admin APIs on Starlette + asyncpg.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker --workers 2
+
+The participant endpoints, the admin participants list and the admin event
+stream run as coroutines on an asyncpg pool, so a request waiting on the
+database holds no thread and one process can keep thousands of participant
+sessions and SSE streams open. Every other route (pages, static files, admin
+tools) is the Flask app from app.py, run on a thread pool. Routes, the admin
+session cookie and the JSON bodies are the same as with `python app.py`.
+
+With DATABASE_URL=sqlite:///... the same coroutines call the SQLite backend on
+worker threads instead. tests/test_asgi.py runs one participant and admin flow
+through both apps and requires identical responses; run it with
+TEST_DATABASE_URL set to cover asyncpg.
+"""
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags, quote_etag
+
+from app import app as flask_app
+from quiz import queues
+from quiz.admin_api import (
+    encode_participant_cursor, parse_participant_list_args, participant_list_columns, participant_list_etag,
+    participant_list_rows
+)
+from quiz.bus import SSE_HEARTBEAT_SECONDS, SSE_STREAM_SECONDS, event_bus
+from quiz.caches import get_question_set, live_event, peek_question_set, quiz_status_cache
+from quiz.db import DB_POOL_MAX, DB_POOL_TIMEOUT, PoolTimeout, numbered_placeholders
+from quiz.leaderboard import leaderboards
+from quiz.metrics import metrics, record_query
+from quiz.participant_api import (
+    ANSWER_SHAPE_MESSAGE, PARTICIPANT_TOKEN_HEADER, PARTICIPANT_TOKEN_MESSAGE, QUIZ_CLOSED_MESSAGE,
+    parse_answers_payload, participant_token_error, quiz_participant_error, read_participant_token,
+    registration_error, registration_response, save_status_response, submission_status, with_participant_token
+)
+from quiz.queues import answer_buffer, submission_pending, submission_queue
+from quiz.scoring import score_answers, valid_answer
+from quiz.storage import PostgresStorage, serialize_participant, storage
+from quiz.web import GZIP_LEVEL, GZIP_MIN_BYTES
+
+# SSE streams cost a coroutine here rather than a thread, so the cap is much higher
+ASGI_SSE_MAX_CLIENTS = int(os.getenv('ASGI_SSE_MAX_CLIENTS', '2000'))
+
+class AsyncPostgresStorage:
+    """The Postgres backend's hot-path statements on an asyncpg pool
+
+    Statements come from PostgresStorage's registry; asyncpg prepares each one
+    on first use per connection and keeps it in its statement cache.
+    """
+
+    queries = PostgresStorage.queries
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.pool = None
+
+    async def connect(self):
+        import asyncpg
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            # Connections open on first use, so startup needs no database round trips
+            min_size=0,
+            max_size=DB_POOL_MAX,
+            init=self._init_connection
+        )
+
+    @staticmethod
+    async def _init_connection(conn):
+        # Same Python values as psycopg2: dicts/lists for json(b)
+        for type_name in ('json', 'jsonb'):
+            await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def _acquire(self):
+        try:
+            return await self.pool.acquire(timeout=DB_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"no database connection available after {DB_POOL_TIMEOUT:.1f}s")
+
+    async def _fetch(self, query, params, label, fetchone=False, conn=None):
+        """Run one statement, recording it like execute_query(); rows come back as dicts
+
+        Pass `conn` to run inside a transaction already open on it.
+        """
+        sql, keys = numbered_placeholders(query)
+        args = [params[key] for key in keys]
+        failed = False
+        rows = 0
+        start = time.perf_counter()
+        checked_out = None
+        try:
+            if conn is None:
+                held = await self._acquire()
+                checked_out = time.perf_counter()
+                try:
+                    records = await held.fetch(sql, *args)
+                finally:
+                    await self.pool.release(held)
+            else:
+                checked_out = start
+                records = await conn.fetch(sql, *args)
+            rows = len(records)
+            result = [dict(record) for record in records]
+            return (result[0] if result else None) if fetchone else result
+        except Exception as e:
+            failed = True
+            print(f"Database error: {e}")
+            raise
+        finally:
+            record_query(label, query, start, checked_out, rows, failed)
+
+    async def _execute(self, name, params, fetchone=False):
+        """Run a registered statement by name"""
+        return await self._fetch(self.queries[name].query, params, name, fetchone=fetchone)
+
+    async def register(self, sso, name, email, location):
+        params = {'event_id': await live_event_id(), 'sso': sso, 'name': name, 'email': email, 'location': location}
+        # 'retry' means a concurrent request inserted this SSO/email after our
+        # snapshot was taken; running again sees the committed row
+        for _ in range(3):
+            result = await self._execute('register', params, fetchone=True)
+            if result['status'] != 'retry':
+                break
+        return result['status'], result['existing_location']
+
+    async def get_participant(self, sso, location):
+        params = {'event_id': await live_event_id(), 'sso': sso, 'location': location}
+        return await self._execute('get_participant', params, fetchone=True)
+
+    async def merge_answers(self, sso, location, answers):
+        params = {'answers': answers, 'event_id': await live_event_id(), 'sso': sso, 'location': location}
+        result = await self._execute('merge_answers', params, fetchone=True)
+        return PostgresStorage.merge_status(result)
+
+    async def submit_bulk(self, submissions, score_fn):
+        """Lock, score and submit in one transaction, like PostgresStorage.submit_bulk()
+
+        For direct submits only: queued_seconds is ignored and every participant
+        is stamped with the database's current time.
+        """
+        updated = []
+        conn = await self._acquire()
+        try:
+            async with conn.transaction():
+                for event_id, sso, location in submissions:
+                    params = {'event_id': event_id, 'sso': sso, 'location': location}
+                    row = await self._fetch(self.queries['submit_lock'].query, params, 'submit_lock',
+                                            fetchone=True, conn=conn)
+                    if row is None:
+                        continue
+                    score = score_fn((event_id, sso, location), row['answers'] or {})
+                    if score is None:
+                        continue
+                    updated.append(await self._fetch(self.queries['submit'].query, {**params, 'score': score},
+                                                     'submit', fetchone=True, conn=conn))
+        finally:
+            await self.pool.release(conn)
+        return updated
+
+    async def list_participants(self, location, columns, cursor=None, limit=None):
+        if cursor and cursor[1] is not None:
+            # asyncpg binds timestamps as datetimes, not ISO strings
+            cursor = (cursor[0], datetime.fromisoformat(cursor[1]), cursor[2])
+        query, params = PostgresStorage.participants_page_query(await live_event_id(), location, columns, cursor, limit)
+        return await self._fetch(query, params, 'list_participants')
+
+class ThreadedStorage:
+    """Async facade over a synchronous backend (SQLite): each call runs on a worker thread"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    async def connect(self):
+        await run_sync(self.storage.connect)
+
+    async def close(self):
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.storage, name)
+
+        async def call(*args, **kwargs):
+            return await run_sync(method, *args, **kwargs)
+        return call
+
+async def run_sync(fn, *args, **kwargs):
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+
+if isinstance(storage, PostgresStorage):
+    db = AsyncPostgresStorage(os.getenv('DATABASE_URL'))
+else:
+    db = ThreadedStorage(storage)
+
+# ===========================
+# Shared state from the quiz package
+# ===========================
+
+async def quiz_statuses():
+    """Open/closed map from memory, reloading on a worker thread only when stale"""
+    statuses = quiz_status_cache.peek()
+    return statuses if statuses is not None else await run_sync(quiz_status_cache.get_all)
+
+async def live_event_id():
+    event_id = live_event.peek()
+    return event_id if event_id is not None else await run_sync(live_event.id)
+
+async def question_set(location):
+    data = peek_question_set(location)
+    return data if data is not None else await run_sync(get_question_set, location)
+
+async def publish(location, event_type, data=None):
+    # In-process delivery is immediate; the NOTIFY to other workers uses the sync pool
+    await run_sync(event_bus.publish, location, event_type, data)
+
+class AsyncSubscriber:
+    """EventBus subscriber that hands events to an asyncio.Queue on the event loop"""
+
+    def __init__(self, loop, maxsize=1000):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def put_nowait(self, item):
+        # Called from whichever thread published the event
+        try:
+            self.loop.call_soon_threadsafe(self._put, item)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # A stuck client gets a full reload instead of an unbounded backlog
+            event_bus.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(('reload', None))
+
+# ===========================
+# Request/Response helpers
+# ===========================
+
+class BadRequest(Exception):
+    pass
+
+def json_response(payload, status=200, headers=None):
+    """Response serialized exactly like Flask's jsonify()"""
+    return Response(flask_app.json.encode(payload) + b'\n', status_code=status, headers=headers,
+                    media_type='application/json')
+
+async def read_json(request, silent=False):
+    try:
+        return json.loads(await request.body())
+    except ValueError:
+        if silent:
+            return {}
+        raise BadRequest('Request body must be JSON')
+
+def admin_logged_in(request):
+    """Read the admin flag from the Flask session cookie (same secret, same signature)"""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return False
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return False
+    return bool(data.get('admin_logged_in'))
+
+async def request_participant(request, data=None):
+    """Participant token claims, read like app.request_participant()"""
+    token = request.headers.get(PARTICIPANT_TOKEN_HEADER) or (data or {}).get('token')
+    return read_participant_token(token, await live_event_id())
+
+routes = []
+
+def route(rule, methods):
+    """Register a coroutine under a Flask-style rule, recording the same HTTP metrics as the Flask app"""
+    def decorator(endpoint):
+        async def timed(request):
+            started = time.perf_counter()
+            try:
+                response = await endpoint(request)
+            except BadRequest as e:
+                response = json_response({'success': False, 'message': str(e)}, 400)
+            except PoolTimeout as e:
+                print(f"Database pool exhausted: {e}")
+                response = json_response({'success': False, 'message': 'Server is busy, please try again in a moment'},
+                                         503, headers={'Retry-After': '1'})
+            except Exception:
+                metrics.inc('quiz_http_errors_total', (('route', rule), ('method', request.method)))
+                raise
+
+            labels = (('route', rule), ('method', request.method))
+            metrics.inc('quiz_http_requests_total', labels + (('status', str(response.status_code)),))
+            metrics.observe('quiz_http_request_duration_seconds', time.perf_counter() - started, labels)
+            if response.status_code >= 500:
+                metrics.inc('quiz_http_errors_total', labels)
+            return response
+
+        routes.append(Route(re.sub(r'<(?:\w+:)?(\w+)>', r'{\1}', rule), timed, methods=methods))
+        return endpoint
+    return decorator
+
+# ===========================
+# Participant API Endpoints
+# ===========================
+
+@route('/api/quiz-status/<location>', ['GET'])
+async def get_location_quiz_status(request):
+    statuses = await quiz_statuses()
+    return json_response({'is_open': bool(statuses.get(request.path_params['location'], False))},
+                         headers={'Cache-Control': 'public, max-age=2'})
+
+@route('/api/register', ['POST'])
+async def register(request):
+    data = await read_json(request)
+    sso = data.get('sso', '').strip()
+    name = data.get('name', '').strip()
+    email = data.get('email', '').strip()
+    location = data.get('location')
+
+    error = registration_error(sso, email)
+    if error:
+        return json_response(*error)
+
+    statuses = await quiz_statuses()
+    if not statuses.get(location, False):
+        return json_response({'success': False, 'message': QUIZ_CLOSED_MESSAGE}, 403)
+
+    try:
+        status, existing_location = await db.register(sso, name, email, location)
+    except Exception as e:
+        return json_response({'success': False, 'message': str(e)}, 500)
+
+    if status == 'new':
+        await publish(location, 'participant', {
+            'sso': sso, 'name': name, 'email': email, 'score': 0, 'submitted_at': None
+        })
+    return json_response(*with_participant_token(
+        registration_response(status, existing_location, location, lambda other: bool(statuses.get(other, False))),
+        sso, location
+    ))
+
+@route('/api/questions/<location>', ['GET'])
+async def get_quiz_questions(request):
+    location = request.path_params['location']
+    participant = await request_participant(request)
+    if participant is None or participant['location'] != location:
+        return json_response({'error': PARTICIPANT_TOKEN_MESSAGE}, 401)
+
+    statuses = await quiz_statuses()
+    if not statuses.get(location, False):
+        return json_response({'error': QUIZ_CLOSED_MESSAGE}, 403)
+
+    event_id, sso = participant['event'], participant['sso']
+    if submission_pending(event_id, sso, location):
+        return json_response({'error': 'Quiz already submitted'}, 403)
+
+    if queues.ANSWER_WRITE_BEHIND:
+        await run_sync(answer_buffer.flush, event_id, sso, location)
+    stored = await db.get_participant(sso, location)
+    error = quiz_participant_error(stored)
+    if error:
+        return json_response(*error)
+
+    return json_response({
+        'questions': (await question_set(location))['questions_json'],
+        'existing_answers': stored['answers']
+    })
+
+@route('/api/save-answer', ['POST'])
+async def save_answer(request):
+    data = await read_json(request)
+    participant = await request_participant(request, data)
+    error = participant_token_error(participant)
+    if error:
+        return json_response(*error)
+    event_id, sso, location = participant['event'], participant['sso'], participant['location']
+    answers = {str(data.get('question_id')): data.get('answer')}
+    if not valid_answer(data.get('answer')):
+        return json_response({'success': False, 'message': ANSWER_SHAPE_MESSAGE}, 400)
+
+    if submission_pending(event_id, sso, location):
+        return json_response(*save_status_response('submitted', 1))
+
+    if queues.ANSWER_WRITE_BEHIND:
+        answer_buffer.add(event_id, sso, location, answers)
+        return json_response(*save_status_response('saved', 1))
+
+    status = await db.merge_answers(sso, location, answers)
+    return json_response(*save_status_response(status, 1))
+
+@route('/api/save-answers', ['POST'])
+async def save_answers(request):
+    # Lenient like the Flask view, so navigator.sendBeacon() payloads are accepted too
+    data = await read_json(request, silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    participant = await request_participant(request, data)
+    error = participant_token_error(participant)
+    if error:
+        return json_response(*error)
+    event_id, sso, location = participant['event'], participant['sso'], participant['location']
+
+    try:
+        answers = parse_answers_payload(data)
+    except ValueError as e:
+        return json_response({'success': False, 'message': str(e)}, 400)
+    if not answers:
+        return json_response({'success': True, 'saved': 0})
+
+    if submission_pending(event_id, sso, location):
+        return json_response(*save_status_response('submitted', len(answers)))
+
+    if queues.ANSWER_WRITE_BEHIND:
+        answer_buffer.add(event_id, sso, location, answers)
+        return json_response(*save_status_response('saved', len(answers)))
+
+    status = await db.merge_answers(sso, location, answers)
+    return json_response(*save_status_response(status, len(answers)))
+
+@route('/api/submit', ['POST'])
+async def submit_quiz(request):
+    data = await read_json(request, silent=True)
+    participant = await request_participant(request, data if isinstance(data, dict) else None)
+    error = participant_token_error(participant)
+    if error:
+        return json_response(*error)
+    event_id, sso, location = participant['event'], participant['sso'], participant['location']
+
+    if queues.SUBMIT_QUEUE:
+        job = submission_queue.submit(event_id, sso, location)
+        # Poll the job's event instead of parking a worker thread on it
+        deadline = time.monotonic() + queues.SUBMIT_WAIT_MS / 1000.0
+        while not job.done.is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return json_response(*await run_sync(submission_status, sso, location, job))
+
+    # Make sure buffered answers are in the database before scoring
+    if queues.ANSWER_WRITE_BEHIND:
+        await run_sync(answer_buffer.flush, event_id, sso, location)
+
+    # Resolve the answer key first, then read, score and submit with the row
+    # locked, so an answer saved meanwhile can't slip past the score
+    answer_key = (await question_set(location))['answer_key']
+    rows = await db.submit_bulk(
+        {(event_id, sso, location): None}, lambda key, answers: score_answers(answer_key, answers)
+    )
+    if not rows:
+        return json_response(*await run_sync(submission_status, sso, location))
+
+    await publish(location, 'participant', serialize_participant(rows[0]))
+
+    rank, _ = await run_sync(leaderboards.rank, location, sso)
+    return json_response({'success': True, 'score': rows[0]['score'], 'rank': rank})
+
+# ===========================
+# Admin API Endpoints
+# ===========================
+
+@route('/api/admin/participants/<location>', ['GET'])
+async def get_participants(request):
+    if not admin_logged_in(request):
+        return json_response({'error': 'Unauthorized'}, 401)
+    location = request.path_params['location']
+
+    try:
+        fields, limit, cursor = parse_participant_list_args(request.query_params)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    headers = {}
+    etag = participant_list_etag(location, fields, request.scope['query_string'])
+    if etag:
+        headers = {'ETag': quote_etag(etag, weak=True), 'Cache-Control': 'private, no-cache'}
+        if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+            return Response(status_code=304, headers=headers)
+
+    participants = await db.list_participants(location, participant_list_columns(fields), cursor=cursor, limit=limit)
+    if limit and len(participants) == limit:
+        headers['X-Next-Cursor'] = encode_participant_cursor(participants[-1])
+    return json_response(participant_list_rows(participants, fields), headers=headers)
+
+@route('/api/admin/events/<location>', ['GET'])
+async def participant_events(request):
+    """Server-Sent Events stream of participant changes for a location"""
+    if not admin_logged_in(request):
+        return json_response({'error': 'Unauthorized'}, 401)
+
+    subscriber = AsyncSubscriber(asyncio.get_running_loop())
+    if event_bus.subscribe(request.path_params['location'], q=subscriber, limit=ASGI_SSE_MAX_CLIENTS) is None:
+        # Client falls back to polling
+        return json_response({'error': 'Too many live dashboards, use polling'}, 503)
+
+    async def stream():
+        # Bounded lifetime so dead connections are reaped; EventSource reconnects
+        deadline = time.monotonic() + SSE_STREAM_SECONDS
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event_type, data = await asyncio.wait_for(
+                        subscriber.queue.get(), min(SSE_HEARTBEAT_SECONDS, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    await db.connect()
+    try:
+        yield
+    finally:
+        await db.close()
+
+# Everything not served above falls through to the Flask app. Flask compresses
+# its own responses; the middleware skips anything with a Content-Encoding and
+# the SSE stream.
+middleware = [Middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)] if GZIP_MIN_BYTES else []
+app = Starlette(routes=routes + [Mount('/', app=WSGIMiddleware(flask_app))], middleware=middleware, lifespan=lifespan)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', '5000')))
@@ -0,0 +1,313 @@
+"""Load test for the quiz flow.
+
+Simulates N participants doing the real flow (quiz-status -> register ->
+questions -> save answers -> submit) while admins poll the participants
+list, then reports p50/p95/p99 latency and throughput per endpoint.
+
+Point it at a throwaway database - it registers fake participants, opens the
+quiz for the chosen location and (with --seed) replaces that location's
+questions.
+
+Against a running server:
+    python benchmark.py --url http://127.0.0.1:5000 --participants 150 --seed
+
+Or let it start the app in-process on Waitress (uses DATABASE_URL from .env),
+which makes it easy to compare thread and pool settings:
+    python benchmark.py --serve --threads 16 --pool-max 40 --participants 150 --seed
+
+Without a Postgres server, run against the embedded SQLite backend:
+    DATABASE_URL=sqlite:///bench.db python benchmark.py --serve --participants 150 --seed
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Question bank used with --seed
+SEED_QUESTIONS = [
+    {'question': f'Benchmark single choice {i}', 'type': 'single', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 'A', 'points': 1}
+    for i in range(10)
+] + [
+    {'question': f'Benchmark multiple choice {i}', 'type': 'multiple', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': ['A', 'C'], 'points': 1}
+    for i in range(10)
+] + [
+    {'question': f'Benchmark true/false {i}', 'type': 'truefalse', 'options': None, 'correct_answer': 'True', 'points': 1}
+    for i in range(5)
+] + [
+    {'question': f'Benchmark text {i}', 'type': 'text', 'options': None, 'correct_answer': 'answer', 'points': 1}
+    for i in range(5)
+]
+
+
+class Recorder:
+    """Collects per-endpoint latencies and errors from all worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}     # endpoint -> [seconds]
+        self.errors = {}      # endpoint -> count
+        self.started = None
+        self.finished = None
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        result = {}
+        with self._lock:
+            for endpoint, samples in sorted(self.samples.items()):
+                ordered = sorted(samples)
+                result[endpoint] = {
+                    'requests': len(ordered),
+                    'errors': self.errors.get(endpoint, 0),
+                    'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else None,
+                    'p50_ms': round(percentile(ordered, 50) * 1000, 1),
+                    'p95_ms': round(percentile(ordered, 95) * 1000, 1),
+                    'p99_ms': round(percentile(ordered, 99) * 1000, 1),
+                    'max_ms': round(ordered[-1] * 1000, 1)
+                }
+        return {'elapsed_seconds': round(elapsed, 2), 'endpoints': result}
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Client:
+    """Tiny JSON HTTP client with its own cookie jar (one per simulated user)"""
+
+    def __init__(self, base_url, recorder, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.headers = {}    # sent with every request (the participant token)
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def call(self, endpoint, method, path, payload=None, content_type='application/json', record=True):
+        data = None
+        headers = dict(self.headers)
+        if payload is not None:
+            data = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+            headers['Content-Type'] = content_type
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+
+        start = time.monotonic()
+        status, body = None, None
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                status = response.status
+                body = response.read()
+        except urllib.error.HTTPError as e:
+            status = e.code
+            body = e.read()
+        except Exception as e:
+            body = str(e).encode()
+        elapsed = time.monotonic() - start
+
+        ok = status is not None and status < 400
+        if record:
+            self.recorder.record(endpoint, elapsed, ok)
+        try:
+            parsed = json.loads(body) if body else None
+        except ValueError:
+            parsed = None
+        return status, parsed
+
+
+def make_answer(question):
+    """A plausible answer for a question from /api/questions"""
+    if question['type'] == 'multiple':
+        return random.sample(question['options'], min(question.get('max_selections') or 1, len(question['options'])))
+    if question['type'] == 'single':
+        return random.choice(question['options'])
+    if question['type'] == 'truefalse':
+        return random.choice(['True', 'False'])
+    return random.choice(['answer', 'Answer', 'something else'])
+
+
+def run_participant(args, recorder, sso, start_delay, failures):
+    time.sleep(start_delay)
+    client = Client(args.url, recorder, args.timeout)
+    location = args.location
+
+    client.call('quiz-status', 'GET', f'/api/quiz-status/{location}')
+    status, body = client.call('register', 'POST', '/api/register', {
+        'sso': sso,
+        'name': f'Bench {sso}',
+        'email': f'bench.{sso}@gevernova.com',
+        'location': location
+    })
+    if status != 200 or not body or not body.get('success'):
+        failures.append(f"register {sso}: {status} {body}")
+        return
+    client.headers['X-Participant-Token'] = body['token']
+
+    status, body = client.call('questions', 'GET', f'/api/questions/{location}')
+    if status != 200 or not body:
+        failures.append(f"questions {sso}: {status} {body}")
+        return
+
+    pending = {}
+    for question in body['questions']:
+        time.sleep(random.uniform(0, args.think_ms * 2) / 1000.0)
+        answer = make_answer(question)
+        if args.batch:
+            pending[str(question['id'])] = answer
+            if len(pending) >= args.batch:
+                client.call('save-answers', 'POST', '/api/save-answers', {'answers': pending})
+                pending = {}
+        else:
+            client.call('save-answer', 'POST', '/api/save-answer', {
+                'question_id': question['id'], 'answer': answer
+            })
+    if pending:
+        client.call('save-answers', 'POST', '/api/save-answers', {'answers': pending})
+
+    status, body = client.call('submit', 'POST', '/api/submit', {})
+    if status != 200:
+        failures.append(f"submit {sso}: {status} {body}")
+
+
+def run_admin_poller(args, recorder, stop):
+    client = Client(args.url, recorder, args.timeout)
+    client.call('admin-login', 'POST', '/api/admin/login', {'username': args.admin_user, 'password': args.admin_password}, record=False)
+    while not stop.is_set():
+        client.call('admin-participants', 'GET', f'/api/admin/participants/{args.location}?fields=sso,name,email,score,submitted_at')
+        stop.wait(args.admin_interval)
+
+
+def prepare(args):
+    """Log in as admin, optionally seed questions, and open the quiz"""
+    admin = Client(args.url, Recorder(), args.timeout)
+    status, body = admin.call('admin-login', 'POST', '/api/admin/login', {'username': args.admin_user, 'password': args.admin_password})
+    if status != 200:
+        sys.exit(f"Admin login failed ({status}): {body}")
+
+    if args.seed:
+        status, body = admin.call('seed', 'POST', f'/api/admin/question-bank?location={args.location}&mode=replace',
+                                  {'questions': SEED_QUESTIONS})
+        if status != 200:
+            sys.exit(f"Seeding questions failed ({status}): {body}")
+
+    admin.call('open', 'POST', '/api/admin/quiz-status', {'location': args.location, 'is_open': True})
+    return admin
+
+
+def cleanup(admin, args, ssos):
+    for sso in ssos:
+        admin.call('cleanup', 'DELETE', f'/api/admin/participants/{args.location}/{sso}', record=False)
+
+
+def start_server(args):
+    """Start the app on Waitress in a background thread; returns its base URL"""
+    os.environ['DB_POOL_MAX'] = str(args.pool_max)
+    os.environ['SERVER_THREADS'] = str(args.threads)
+    from waitress import create_server
+    import app as quiz_app
+
+    quiz_app.migrate_database()
+    server = create_server(quiz_app.app, host='127.0.0.1', port=0, threads=args.threads, connection_limit=1000)
+    threading.Thread(target=server.run, daemon=True).start()
+    return f"http://127.0.0.1:{server.effective_port}"
+
+
+def print_report(summary, args):
+    print()
+    print(f"Participants: {args.participants}  Admin pollers: {args.admins}  "
+          f"Elapsed: {summary['elapsed_seconds']}s")
+    header = f"{'endpoint':<20}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    print(header)
+    print('-' * len(header))
+    for endpoint, s in summary['endpoints'].items():
+        print(f"{endpoint:<20}{s['requests']:>9}{s['errors']:>8}{s['throughput_rps']:>9}"
+              f"{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}{s['max_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the quiz flow and report latency per endpoint')
+    parser.add_argument('--url', help='Base URL of a running server')
+    parser.add_argument('--serve', action='store_true', help='Start the app in-process on Waitress instead of using --url')
+    parser.add_argument('--threads', type=int, default=16, help='Waitress threads with --serve (default: 16)')
+    parser.add_argument('--pool-max', type=int, default=100, help='DB_POOL_MAX with --serve (default: 100)')
+    parser.add_argument('--participants', type=int, default=100, help='Simulated participants (default: 100)')
+    parser.add_argument('--admins', type=int, default=2, help='Concurrent admin dashboards polling (default: 2)')
+    parser.add_argument('--admin-interval', type=float, default=5.0, help='Seconds between admin polls (default: 5)')
+    parser.add_argument('--location', default='BLR', help='Quiz location to use (default: BLR)')
+    parser.add_argument('--ramp', type=float, default=5.0, help='Spread participant starts over this many seconds (default: 5)')
+    parser.add_argument('--think-ms', type=float, default=200, help='Average pause between answers in ms (default: 200)')
+    parser.add_argument('--batch', type=int, default=0, help='Use /api/save-answers with this many answers per request')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+    parser.add_argument('--seed', action='store_true', help="Replace the location's questions with a 30-question benchmark set")
+    parser.add_argument('--keep', action='store_true', help='Keep the benchmark participants afterwards')
+    parser.add_argument('--admin-user', default='admin')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--json', help='Also write the summary to this file')
+    args = parser.parse_args()
+
+    if args.serve:
+        args.url = start_server(args)
+        print(f"Serving app on {args.url} (threads={args.threads}, pool max={args.pool_max})")
+    elif not args.url:
+        parser.error('pass --url or --serve')
+
+    admin = prepare(args)
+
+    recorder = Recorder()
+    failures = []
+    run_id = random.randint(100, 999)
+    ssos = [f"{run_id}{i:06d}" for i in range(args.participants)]
+
+    stop = threading.Event()
+    pollers = [threading.Thread(target=run_admin_poller, args=(args, recorder, stop), daemon=True) for _ in range(args.admins)]
+    participants = [
+        threading.Thread(
+            target=run_participant,
+            args=(args, recorder, sso, random.uniform(0, args.ramp), failures),
+            daemon=True
+        )
+        for sso in ssos
+    ]
+
+    recorder.started = time.monotonic()
+    for thread in pollers + participants:
+        thread.start()
+    for thread in participants:
+        thread.join()
+    stop.set()
+    for thread in pollers:
+        thread.join(timeout=args.timeout)
+    recorder.finished = time.monotonic()
+
+    summary = recorder.summary()
+    summary['config'] = {k: v for k, v in vars(args).items() if k not in ('admin_password',)}
+    summary['failed_flows'] = len(failures)
+    print_report(summary, args)
+    if failures:
+        print(f"\n{len(failures)} participant flow(s) failed, first few:")
+        for failure in failures[:5]:
+            print(f"  {failure}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    if not args.keep:
+        cleanup(admin, args, ssos)
+
+
+if __name__ == '__main__':
+    main()
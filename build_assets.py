@@ -0,0 +1,114 @@
+"""Build fingerprinted, minified and precompressed copies of the static assets.
+
+Writes static/dist/<dir>/<name>.<hash>.<ext> for every CSS and JS file under
+static/, with .gz (and, if the Brotli package is installed, .br) variants next
+to it, plus static/dist/manifest.json. The templates link assets through
+asset(), which uses the manifest, so browsers can cache them for a year and
+fetch a new file only when its content changes.
+
+Run after every deploy or change to static/ (the app falls back to the plain
+files for any asset that changed since the last build):
+    python build_assets.py
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+ASSET_EXTENSIONS = ('.css', '.js')
+
+
+def minify_css(source):
+    """Drop comments and insignificant whitespace"""
+    css = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip() + '\n'
+
+
+def minify_js(source):
+    """Drop comment-only lines, indentation and blank lines.
+
+    Deliberately conservative: line breaks are kept (so automatic semicolon
+    insertion is unaffected) and code within a line is never rewritten.
+    """
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def find_assets():
+    """Paths (relative to static/, with forward slashes) of the assets to build"""
+    assets = []
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != DIST_DIR)
+        for filename in sorted(files):
+            if filename.endswith(ASSET_EXTENSIONS):
+                assets.append(os.path.relpath(os.path.join(root, filename), STATIC_DIR).replace(os.sep, '/'))
+    return assets
+
+
+def build_asset(path):
+    """Write the fingerprinted file and its compressed variants; returns the manifest entry"""
+    with open(os.path.join(STATIC_DIR, path), 'rb') as f:
+        source = f.read()
+    base, ext = os.path.splitext(path)
+    content = MINIFIERS[ext](source.decode('utf-8')).encode('utf-8')
+    built = f"{base}.{hashlib.sha256(content).hexdigest()[:10]}{ext}"
+
+    target = os.path.join(DIST_DIR, built)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as f:
+        f.write(content)
+    # mtime=0 keeps the .gz byte-identical across builds
+    with open(target + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(target + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+    return {
+        'file': built,
+        'source_sha256': hashlib.sha256(source).hexdigest(),
+        'bytes': len(source),
+        'minified_bytes': len(content)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args()
+
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    manifest = {path: build_asset(path) for path in find_assets()}
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    for path, entry in manifest.items():
+        print(f"✓ {path} -> dist/{entry['file']} ({entry['bytes']} -> {entry['minified_bytes']} bytes)")
+    if brotli is None:
+        print("⚠ Brotli not installed - only gzip variants were written (pip install Brotli)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Apply the database schema migrations.
+
+Run once per deploy, before the app workers start (workers never touch the
+schema themselves):
+    python migrate.py
+
+List applied and pending migrations without changing anything:
+    python migrate.py --status
+
+Uses DATABASE_URL from .env; concurrent runs wait for each other.
+"""
+import argparse
+import sys
+
+from quiz.storage import load_migrations, migrate_database, storage
+
+
+def print_status():
+    applied = {row['version']: row for row in storage.applied_migrations()}
+    for version, name, _ in load_migrations(storage.name):
+        row = applied.get(version)
+        state = f"applied {row['applied_at']}" if row else 'pending'
+        print(f"{version:04d}_{name:<30} {state}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--status', action='store_true', help='Show applied and pending migrations only')
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            print_status()
+        else:
+            migrate_database()
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 -- Quiz Application Database Schema
 -- PostgreSQL Database Schema for Quiz Application
+-- Idempotent, so databases created before schema_version existed adopt it as version 1
 
 -- Admin Configuration Table
 CREATE TABLE IF NOT EXISTS admin_config (
@@ -62,6 +63,7 @@ CREATE INDEX IF NOT EXISTS idx_questions_location ON questions(location);
 CREATE INDEX IF NOT EXISTS idx_participants_location ON participants(location);
 CREATE INDEX IF NOT EXISTS idx_participants_sso ON participants(sso);
 CREATE INDEX IF NOT EXISTS idx_participants_score ON participants(score DESC, submitted_at ASC);
+CREATE INDEX IF NOT EXISTS idx_participants_location_rank ON participants(location, score DESC, submitted_at ASC, id);
 CREATE INDEX IF NOT EXISTS idx_quiz_status_location ON quiz_status(location);
 
 -- Insert default admin account (password: admin123)
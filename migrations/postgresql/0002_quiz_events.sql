@@ -0,0 +1,75 @@
+-- Quiz events: every participant and SSO registration belongs to one event, so
+-- an SSO can take the quiz again at a later event. participants and sso_tracker
+-- are partitioned by event (one partition pair per event, created when the
+-- event starts), so queries for the live event only read its partition and
+-- indexes, and a finished event can be archived and its partitions detached.
+
+CREATE TABLE quiz_events (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ended_at TIMESTAMP, -- NULL for the live event
+    archived_at TIMESTAMP,
+    archive_file TEXT,
+    archived_participants INTEGER
+);
+
+-- At most one live event
+CREATE UNIQUE INDEX idx_quiz_events_live ON quiz_events ((ended_at IS NULL)) WHERE ended_at IS NULL;
+
+-- Everything recorded so far becomes event 1
+INSERT INTO quiz_events (name) VALUES ('Event 1');
+
+CREATE TEMPORARY TABLE participants_before_events ON COMMIT DROP AS SELECT * FROM participants;
+CREATE TEMPORARY TABLE sso_tracker_before_events ON COMMIT DROP AS SELECT * FROM sso_tracker;
+DROP TABLE participants;
+DROP TABLE sso_tracker;
+
+-- Participants Table (unique per event; ids stay unique across events)
+CREATE TABLE participants (
+    id SERIAL,
+    event_id INTEGER NOT NULL REFERENCES quiz_events(id),
+    sso VARCHAR(9) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    location VARCHAR(100) NOT NULL,
+    answers JSONB DEFAULT '{}', -- JSON object storing answers by question_id
+    score INTEGER DEFAULT 0,
+    submitted_at TIMESTAMP, -- NULL if not submitted yet
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, id),
+    UNIQUE (event_id, sso, location),
+    CONSTRAINT valid_sso CHECK (sso ~ '^\d{9}$'),
+    CONSTRAINT valid_email CHECK (email ~ '^[a-zA-Z0-9._%+-]+@gevernova\.com$')
+) PARTITION BY LIST (event_id);
+
+-- SSO Tracker Table (one location per SSO and email within an event)
+CREATE TABLE sso_tracker (
+    event_id INTEGER NOT NULL REFERENCES quiz_events(id),
+    sso VARCHAR(9) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    location VARCHAR(100) NOT NULL,
+    registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_id, sso),
+    UNIQUE (event_id, email),
+    CONSTRAINT valid_sso_tracker CHECK (sso ~ '^\d{9}$'),
+    CONSTRAINT valid_email_tracker CHECK (email ~ '^[a-zA-Z0-9._%+-]+@gevernova\.com$')
+) PARTITION BY LIST (event_id);
+
+CREATE TABLE participants_e1 PARTITION OF participants FOR VALUES IN (1);
+CREATE TABLE sso_tracker_e1 PARTITION OF sso_tracker FOR VALUES IN (1);
+
+INSERT INTO participants (id, event_id, sso, name, email, location, answers, score, submitted_at, created_at)
+SELECT id, 1, sso, name, email, location, answers, score, submitted_at, created_at
+FROM participants_before_events;
+
+INSERT INTO sso_tracker (event_id, sso, name, email, location, registered_at)
+SELECT 1, sso, name, email, location, registered_at
+FROM sso_tracker_before_events;
+
+SELECT setval(pg_get_serial_sequence('participants', 'id'), COALESCE((SELECT MAX(id) FROM participants), 0) + 1, false);
+
+-- Created on every partition. Lookups by (sso, location) use the unique index;
+-- the old global score index is gone, ranking is always per location.
+CREATE INDEX idx_participants_location_rank ON participants(location, score DESC, submitted_at ASC, id);
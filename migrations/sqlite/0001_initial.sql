@@ -0,0 +1,79 @@
+-- Quiz Application Database Schema
+-- SQLite Database Schema for Quiz Application (DATABASE_URL=sqlite:///quiz.db)
+-- Mirrors migrations/postgresql: JSON columns are TEXT validated with JSON1,
+-- timestamps are 'YYYY-MM-DD HH:MM:SS.ffffff' text so they sort chronologically.
+-- WAL mode is set by every connection, since PRAGMAs can't run inside the
+-- migration transaction.
+
+-- Admin Configuration Table
+CREATE TABLE IF NOT EXISTS admin_config (
+    id INTEGER PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+
+-- Quiz Status Table
+CREATE TABLE IF NOT EXISTS quiz_status (
+    id INTEGER PRIMARY KEY,
+    location TEXT UNIQUE NOT NULL,
+    is_open INTEGER DEFAULT 0,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+
+-- Questions Table
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    location TEXT NOT NULL,
+    question_text TEXT NOT NULL,
+    question_type TEXT NOT NULL, -- 'single', 'multiple', 'truefalse', 'text'
+    options TEXT CHECK (options IS NULL OR json_valid(options)), -- Array of options for MCQ questions
+    correct_answer TEXT NOT NULL CHECK (json_valid(correct_answer)), -- String for single/truefalse, Array for multiple, String for text
+    points INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    CONSTRAINT valid_question_type CHECK (question_type IN ('single', 'multiple', 'truefalse', 'text'))
+);
+
+-- Participants Table
+CREATE TABLE IF NOT EXISTS participants (
+    id INTEGER PRIMARY KEY,
+    sso TEXT NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    location TEXT NOT NULL,
+    answers TEXT DEFAULT '{}' CHECK (answers IS NULL OR json_valid(answers)), -- JSON object storing answers by question_id
+    score INTEGER DEFAULT 0,
+    submitted_at TEXT, -- NULL if not submitted yet
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    UNIQUE(sso, location),
+    CONSTRAINT valid_sso CHECK (sso GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]'),
+    CONSTRAINT valid_email CHECK (email GLOB '?*@gevernova.com')
+);
+
+-- Global SSO Tracker Table (prevents one SSO from taking multiple location quizzes)
+CREATE TABLE IF NOT EXISTS sso_tracker (
+    sso TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    location TEXT NOT NULL,
+    registered_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    CONSTRAINT valid_sso_tracker CHECK (sso GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]'),
+    CONSTRAINT valid_email_tracker CHECK (email GLOB '?*@gevernova.com')
+);
+
+-- Indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_questions_location ON questions(location);
+CREATE INDEX IF NOT EXISTS idx_participants_sso ON participants(sso);
+CREATE INDEX IF NOT EXISTS idx_participants_location_rank ON participants(location, score DESC, submitted_at ASC, id);
+
+-- Insert default admin account (password: admin123)
+INSERT INTO admin_config (username, password)
+VALUES ('admin', 'admin123')
+ON CONFLICT (username) DO NOTHING;
+
+-- Insert default quiz locations
+INSERT INTO quiz_status (location, is_open) VALUES
+    ('BLR', 0),
+    ('HTC', 0),
+    ('Noida', 0)
+ON CONFLICT (location) DO NOTHING;
@@ -0,0 +1,65 @@
+-- Quiz events (mirrors migrations/postgresql/0002_quiz_events.sql): every
+-- participant and SSO registration belongs to one event, so an SSO can take the
+-- quiz again at a later event. SQLite has no partitioning; queries filter on
+-- event_id and archiving an event deletes its rows.
+
+CREATE TABLE quiz_events (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    started_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    ended_at TEXT, -- NULL for the live event
+    archived_at TEXT,
+    archive_file TEXT,
+    archived_participants INTEGER
+);
+
+-- At most one live event
+CREATE UNIQUE INDEX idx_quiz_events_live ON quiz_events ((ended_at IS NULL)) WHERE ended_at IS NULL;
+
+-- Everything recorded so far becomes event 1
+INSERT INTO quiz_events (id, name) VALUES (1, 'Event 1');
+
+-- Constraints can't be altered in place: rebuild both tables with event_id
+CREATE TABLE participants_new (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL REFERENCES quiz_events(id),
+    sso TEXT NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    location TEXT NOT NULL,
+    answers TEXT DEFAULT '{}' CHECK (answers IS NULL OR json_valid(answers)), -- JSON object storing answers by question_id
+    score INTEGER DEFAULT 0,
+    submitted_at TEXT, -- NULL if not submitted yet
+    created_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    UNIQUE(event_id, sso, location),
+    CONSTRAINT valid_sso CHECK (sso GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]'),
+    CONSTRAINT valid_email CHECK (email GLOB '?*@gevernova.com')
+);
+
+CREATE TABLE sso_tracker_new (
+    event_id INTEGER NOT NULL REFERENCES quiz_events(id),
+    sso TEXT NOT NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    location TEXT NOT NULL,
+    registered_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    PRIMARY KEY (event_id, sso),
+    UNIQUE (event_id, email),
+    CONSTRAINT valid_sso_tracker CHECK (sso GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]'),
+    CONSTRAINT valid_email_tracker CHECK (email GLOB '?*@gevernova.com')
+);
+
+INSERT INTO participants_new (id, event_id, sso, name, email, location, answers, score, submitted_at, created_at)
+SELECT id, 1, sso, name, email, location, answers, score, submitted_at, created_at
+FROM participants;
+
+INSERT INTO sso_tracker_new (event_id, sso, name, email, location, registered_at)
+SELECT 1, sso, name, email, location, registered_at
+FROM sso_tracker;
+
+DROP TABLE participants;
+DROP TABLE sso_tracker;
+ALTER TABLE participants_new RENAME TO participants;
+ALTER TABLE sso_tracker_new RENAME TO sso_tracker;
+
+CREATE INDEX idx_participants_location_rank ON participants(event_id, location, score DESC, submitted_at ASC, id);
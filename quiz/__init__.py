@@ -0,0 +1,40 @@
+"""The quiz application, one module per concern.
+
+    encoding         JSON encoding (orjson when installed)
+    metrics          Prometheus metrics registry
+    db               PostgreSQL connection pool, query helpers, prepared statements
+    storage          PostgreSQL / SQLite backends and schema migrations
+    bus              event bus between requests and gunicorn workers
+    caches           question, quiz status and live event caches
+    scoring          answer keys and scoring
+    queues           answer write-behind buffer and submission queue
+    leaderboard      per-location rankings
+    quiz_events      starting and archiving quiz events
+    analytics        per-question statistics
+    question_bank    question import/export
+    web              the Flask app, /metrics, static assets and pages
+    admin_api        admin API routes
+    participant_api  participant API routes and tokens
+
+app.py imports the route modules and serves the Flask app; asgi.py serves the
+same routes on Starlette.
+
+Importing these modules never starts a thread or opens a database connection.
+gunicorn imports the app once and then forks its workers, and neither threads
+nor connections survive a fork intact, so the connection pool, the background
+threads (answer flusher, submission workers, event listener) and SQLite's
+per-thread connections are all created on first use, in the process that uses
+them.
+"""
+import os
+
+from dotenv import load_dotenv
+
+# Settings are read from the environment when the modules are imported
+load_dotenv()
+
+# Where migrations/, templates/, static/ and archives/ live
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Request threads per worker: Waitress in app.py, gunicorn --threads in render.yaml
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '16'))
@@ -0,0 +1,489 @@
+"""Admin API: login, quiz control, participants, live dashboard stream and question management."""
+import base64
+import csv
+import io
+import json
+import queue
+import time
+import zlib
+
+from flask import Response, jsonify, request, session, stream_with_context
+
+from quiz.analytics import get_analytics
+from quiz.bus import SSE_HEARTBEAT_SECONDS, SSE_STREAM_SECONDS, event_bus
+from quiz.caches import get_question_set, invalidate_question_set, live_event, questions_changed
+from quiz.encoding import raw_json
+from quiz.question_bank import (
+    CSV_LIST_SEPARATOR, QUESTION_BANK_CSV_FIELDS, import_questions, parse_question_bank_csv, validate_question
+)
+from quiz.quiz_events import archive_quiz_event, serialize_quiz_event, start_quiz_event
+from quiz.scoring import score_answers
+from quiz.storage import serialize_participant, storage
+from quiz.web import app
+
+@app.route('/api/admin/login', methods=['POST'])
+def admin_login():
+    data = request.json
+    username = data.get('username')
+    password = data.get('password')
+    
+    if storage.check_admin(username, password):
+        session['admin_logged_in'] = True
+        return jsonify({'success': True})
+    return jsonify({'success': False, 'message': 'Invalid credentials'}), 401
+
+@app.route('/api/admin/logout', methods=['POST'])
+def admin_logout():
+    session.pop('admin_logged_in', None)
+    return jsonify({'success': True})
+
+@app.route('/api/admin/check', methods=['GET'])
+def check_admin():
+    return jsonify({'logged_in': session.get('admin_logged_in', False)})
+
+@app.route('/api/admin/quiz-status', methods=['GET'])
+def get_quiz_status():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(storage.get_quiz_statuses())
+
+@app.route('/api/admin/quiz-status', methods=['POST'])
+def update_quiz_status():
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json
+    location = data.get('location')
+    is_open = data.get('is_open')
+    
+    storage.set_quiz_status(location, is_open)
+    event_bus.publish(location, 'quiz_status', {'is_open': bool(is_open)})
+    
+    return jsonify({'success': True})
+
+@app.route('/api/admin/quiz-events', methods=['GET'])
+def get_quiz_events():
+    """Every quiz event, newest first, with its participant count"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify({
+        'live': live_event.id(),
+        'events': [serialize_quiz_event(event) for event in storage.list_quiz_events()]
+    })
+
+@app.route('/api/admin/quiz-events', methods=['POST'])
+def create_quiz_event():
+    """End the live event and start a new one (body: {"name": ...})"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    name = str(data.get('name') or '').strip()
+    if not name:
+        return jsonify({'success': False, 'message': 'Event name is required'}), 400
+    
+    try:
+        event = start_quiz_event(name)
+        return jsonify({'success': True, 'event': serialize_quiz_event(event)})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/quiz-events/<int:event_id>/archive', methods=['POST'])
+def archive_quiz_event_route(event_id):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        return jsonify({'success': True, **archive_quiz_event(event_id)})
+    except LookupError as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+PARTICIPANT_FIELDS = ('sso', 'name', 'email', 'score', 'submitted_at', 'answers')
+PARTICIPANTS_MAX_PAGE = 1000
+
+def encode_participant_cursor(row):
+    """Opaque keyset cursor for the (score DESC, submitted_at ASC, id ASC) ordering"""
+    key = [row['score'], row['submitted_at'].isoformat() if row['submitted_at'] else None, row['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def decode_participant_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    score, submitted_at, participant_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return int(score), submitted_at, int(participant_id)
+
+def parse_participant_list_args(args):
+    """(fields, limit, cursor) from the participants list query string; ValueError carries the client message"""
+    fields = PARTICIPANT_FIELDS
+    if args.get('fields'):
+        fields = tuple(f.strip() for f in args['fields'].split(',') if f.strip())
+        unknown = [f for f in fields if f not in PARTICIPANT_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}" if unknown else 'No fields requested')
+    
+    try:
+        limit = int(args['limit']) if args.get('limit') else None
+        cursor = decode_participant_cursor(args['cursor']) if args.get('cursor') else None
+    except (ValueError, TypeError):
+        raise ValueError('Invalid limit or cursor')
+    if limit is not None:
+        limit = max(1, min(limit, PARTICIPANTS_MAX_PAGE))
+    return fields, limit, cursor
+
+def participant_list_etag(location, fields, query_string):
+    """Weak ETag for a participants list, or None when the view can't be cached"""
+    # Answers change on every save without an event, so only answer-free views are cacheable
+    if 'answers' in fields:
+        return None
+    version = event_bus.version(location)
+    return f"{version}.{zlib.crc32(query_string):08x}" if version else None
+
+def participant_list_columns(fields):
+    """Selected columns: the requested fields plus the keyset cursor columns"""
+    return list(dict.fromkeys(('id', 'score', 'submitted_at') + fields))
+
+def participant_list_rows(participants, fields):
+    """JSON-ready participant rows restricted to the requested fields"""
+    result = []
+    for p in participants:
+        row = {f: p[f] for f in fields}
+        if row.get('submitted_at'):
+            row['submitted_at'] = row['submitted_at'].isoformat()
+        if isinstance(row.get('answers'), str):
+            # Postgres sends answers as JSON text (see participants_page_query)
+            row['answers'] = raw_json(row['answers'])
+        result.append(row)
+    return result
+
+@app.route('/api/admin/participants/<location>', methods=['GET'])
+def get_participants(location):
+    """Participants ordered by score DESC, submitted_at ASC.
+    
+    Optional query parameters:
+      fields  comma-separated projection (default: all, including answers)
+      limit   page size; the next page's cursor is sent in the X-Next-Cursor header
+      cursor  value of X-Next-Cursor from the previous page
+    Responses without answers carry an ETag from the location's change counter,
+    so an unchanged poll is answered with 304 before touching the database.
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        fields, limit, cursor = parse_participant_list_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    etag = participant_list_etag(location, fields, request.query_string)
+    if etag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    participants = storage.list_participants(location, participant_list_columns(fields), cursor=cursor, limit=limit)
+    
+    response = jsonify(participant_list_rows(participants, fields))
+    if limit and len(participants) == limit:
+        response.headers['X-Next-Cursor'] = encode_participant_cursor(participants[-1])
+    if etag:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/api/admin/export/<location>', methods=['GET'])
+def export_participants(location):
+    """Stream a location's results as CSV or NDJSON (?format=csv|ndjson).
+    
+    With ?answers=1, CSV gets one column per question and NDJSON rows include
+    the answers object.
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    include_answers = request.args.get('answers', '').lower() in ('1', 'true', 'yes')
+    question_ids = [entry[0] for entry in get_question_set(location)['answer_key']] if include_answers else []
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['rank', 'sso', 'name', 'email', 'score', 'submitted_at'] +
+                        [f'Q{question_id}' for question_id in question_ids])
+        yield buffer.getvalue()
+        
+        position = 0
+        for rows in storage.stream_participants(location, include_answers=include_answers):
+            buffer.seek(0)
+            buffer.truncate()
+            for p in rows:
+                position += 1
+                row = [
+                    position if p['submitted_at'] else '',
+                    p['sso'], p['name'], p['email'], p['score'],
+                    p['submitted_at'].isoformat() if p['submitted_at'] else ''
+                ]
+                if include_answers:
+                    answers = p['answers'] or {}
+                    for question_id in question_ids:
+                        answer = answers.get(question_id, '')
+                        row.append('; '.join(map(str, answer)) if isinstance(answer, list) else answer)
+                writer.writerow(row)
+            yield buffer.getvalue()
+    
+    def generate_ndjson():
+        for rows in storage.stream_participants(location, include_answers=include_answers):
+            yield ''.join(
+                json.dumps(serialize_participant(p, include_answers=include_answers)) + '\n'
+                for p in rows
+            )
+    
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="results-{location}.{export_format}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/admin/participants/<location>/<sso>', methods=['DELETE'])
+def delete_participant(location, sso):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        # Participant row and sso_tracker entry go together
+        storage.delete_participant(location, sso)
+        
+        event_bus.publish(location, 'deleted', {'sso': sso})
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+def rescore_location(location, batch_size=2000):
+    """Recompute the score of every submitted participant in a location.
+    
+    Only changed scores are written back, in one transaction.
+    """
+    invalidate_question_set(location)
+    answer_key = get_question_set(location)['answer_key']
+    
+    start = time.monotonic()
+    scanned, updated = storage.rescore(
+        location, lambda answers: score_answers(answer_key, answers), batch_size=batch_size
+    )
+    
+    return {
+        'participants': scanned,
+        'updated': updated,
+        'seconds': round(time.monotonic() - start, 3)
+    }
+
+@app.route('/api/admin/rescore/<location>', methods=['POST'])
+def rescore_participants(location):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        result = rescore_location(location)
+        if result['updated']:
+            event_bus.publish(location, 'reload')
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/events/<location>', methods=['GET'])
+def participant_events(location):
+    """Server-Sent Events stream of participant changes for a location"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    q = event_bus.subscribe(location)
+    if q is None:
+        # Client falls back to polling
+        return jsonify({'error': 'Too many live dashboards, use polling'}), 503
+    
+    def stream():
+        # Bounded lifetime so a sync worker is never held forever; EventSource reconnects
+        deadline = time.monotonic() + SSE_STREAM_SECONDS
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event_type, data = q.get(timeout=min(SSE_HEARTBEAT_SECONDS, remaining))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            event_bus.unsubscribe(q)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/admin/analytics/<location>', methods=['GET'])
+def get_location_analytics(location):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(get_analytics(location))
+
+@app.route('/api/admin/question-bank', methods=['GET'])
+def export_question_bank():
+    """Export questions (?location= to limit to one) as JSON or CSV (?format=json|csv)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    export_format = request.args.get('format', 'json')
+    if export_format not in ('json', 'csv'):
+        return jsonify({'error': 'format must be json or csv'}), 400
+    location = request.args.get('location')
+    
+    rows = storage.get_questions(location)
+    questions = [{
+        'location': q['location'],
+        'question': q['question_text'],
+        'type': q['question_type'],
+        'options': q['options'],
+        'correct_answer': q['correct_answer'],
+        'points': q['points']
+    } for q in rows]
+    
+    filename = f"questions-{location or 'all'}.{export_format}"
+    if export_format == 'json':
+        response = jsonify({'questions': questions})
+    else:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=QUESTION_BANK_CSV_FIELDS)
+        writer.writeheader()
+        for q in questions:
+            writer.writerow({
+                **q,
+                'options': CSV_LIST_SEPARATOR.join(map(str, q['options'] or [])),
+                'correct_answer': CSV_LIST_SEPARATOR.join(map(str, q['correct_answer']))
+                                  if isinstance(q['correct_answer'], list) else q['correct_answer']
+            })
+        response = Response(buffer.getvalue(), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@app.route('/api/admin/question-bank', methods=['POST'])
+def import_question_bank():
+    """Bulk-import questions from JSON ({"questions": [...], "mode": "append|replace"}) or CSV.
+    
+    ?location= supplies a default for questions without one, ?mode=replace
+    replaces the existing questions of every imported location.
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    default_location = request.args.get('location')
+    mode = request.args.get('mode', 'append')
+    
+    if request.mimetype == 'text/csv':
+        questions = parse_question_bank_csv(request.get_data(as_text=True), default_location)
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            mode = data.get('mode', mode)
+            questions = data.get('questions')
+        else:
+            questions = data
+        if not isinstance(questions, list):
+            return jsonify({'success': False, 'message': 'Expected a list of questions'}), 400
+        questions = [
+            {**q, 'location': q.get('location') or default_location} if isinstance(q, dict) else q
+            for q in questions
+        ]
+    
+    if mode not in ('append', 'replace'):
+        return jsonify({'success': False, 'message': 'mode must be append or replace'}), 400
+    if not questions:
+        return jsonify({'success': False, 'message': 'No questions to import'}), 400
+    
+    # Validate everything up front so nothing is written on a bad file
+    errors = []
+    for index, q in enumerate(questions):
+        error = validate_question(q) if isinstance(q, dict) else 'must be an object'
+        if error:
+            errors.append({'index': index, 'message': error})
+    if errors:
+        return jsonify({'success': False, 'message': 'Validation failed', 'errors': errors}), 400
+    
+    try:
+        counts = import_questions(questions, replace=(mode == 'replace'))
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    return jsonify({'success': True, 'imported': counts})
+
+@app.route('/api/admin/questions/<location>', methods=['GET'])
+def get_questions(location):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    questions = storage.get_questions(location)
+    
+    result = []
+    for q in questions:
+        result.append({
+            'id': q['id'],
+            'question': q['question_text'],
+            'type': q['question_type'],
+            'options': q['options'],
+            'correct_answer': q['correct_answer'],
+            'points': q['points']
+        })
+    
+    return jsonify(result)
+
+@app.route('/api/admin/questions/<location>', methods=['POST'])
+def add_question(location):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json
+    
+    question_id = storage.add_question(location, data)
+    questions_changed(location)
+    
+    return jsonify({'success': True, 'id': question_id})
+
+@app.route('/api/admin/questions/<location>/<int:question_id>', methods=['PUT'])
+def update_question(location, question_id):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json
+    
+    storage.update_question(location, question_id, data)
+    questions_changed(location)
+    
+    return jsonify({'success': True})
+
+@app.route('/api/admin/questions/<location>/<int:question_id>', methods=['DELETE'])
+def delete_question(location, question_id):
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    storage.delete_question(location, question_id)
+    questions_changed(location)
+    
+    return jsonify({'success': True})
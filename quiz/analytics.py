@@ -0,0 +1,92 @@
+"""Per-question answer statistics for the admin dashboard."""
+import threading
+
+from quiz.bus import event_bus
+from quiz.caches import get_question_set
+from quiz.scoring import SCORE_PER_OPTION, SCORE_TEXT, normalize_text, score_answers
+from quiz.storage import storage
+
+# Submitted answers are grouped by (question, answer value) in SQL, so Python
+# only sees one row per distinct answer no matter how many participants there
+# are. Results are cached until the location's event counter moves (i.e. the
+# next submission, deletion or re-score) or the answer key is reloaded.
+ANALYTICS_TOP_TEXT_ANSWERS = 10
+
+_analytics_cache = {}
+_analytics_cache_lock = threading.Lock()
+
+def compute_analytics(location):
+    """Per-question correct rate and answer distribution, plus score statistics"""
+    question_set = get_question_set(location)
+    data = storage.answer_stats(location)
+    
+    score_rows = data['scores']
+    participants = sum(row['participants'] for row in score_rows)
+    total_score = sum(row['score'] * row['participants'] for row in score_rows)
+    
+    grouped = {}
+    for row in data['answers']:
+        grouped.setdefault(row['question_id'], []).append((row['answer'], row['responses']))
+    
+    questions = []
+    for question, entry in zip(question_set['questions'], question_set['answer_key']):
+        question_id, kind, expected, points = entry
+        max_points = points * len(expected) if kind == SCORE_PER_OPTION else points
+        
+        responses = correct = earned = 0
+        distribution = {}
+        for answer, count in grouped.get(question_id, []):
+            if answer is None:
+                continue
+            responses += count
+            awarded = score_answers((entry,), {question_id: answer})
+            earned += awarded * count
+            if awarded == max_points:
+                correct += count
+            for value in (answer if isinstance(answer, list) else [answer]):
+                key = normalize_text(value) if kind == SCORE_TEXT else str(value)
+                distribution[key] = distribution.get(key, 0) + count
+        
+        if kind == SCORE_TEXT:
+            top = sorted(distribution.items(), key=lambda item: -item[1])[:ANALYTICS_TOP_TEXT_ANSWERS]
+            distribution = dict(top)
+        elif question['options']:
+            # Keep the option order and include options nobody picked
+            distribution = {**{str(option): 0 for option in question['options']}, **distribution}
+        
+        questions.append({
+            'id': question['id'],
+            'question': question['question'],
+            'type': question['type'],
+            'max_points': max_points,
+            'responses': responses,
+            'unanswered': participants - responses,
+            'correct': correct,
+            'correct_rate': round(correct / participants, 4) if participants else None,
+            'average_points': round(earned / participants, 3) if participants else None,
+            'distribution': distribution
+        })
+    
+    return {
+        'location': location,
+        'participants': participants,
+        'average_score': round(total_score / participants, 3) if participants else None,
+        'max_score': sum(q['max_points'] for q in questions),
+        'score_histogram': score_rows,
+        'questions': questions
+    }
+
+def get_analytics(location):
+    """Cached analytics for a location, recomputed after any participant change"""
+    version = event_bus.version(location)
+    answer_key = get_question_set(location)['answer_key']
+    with _analytics_cache_lock:
+        cached = _analytics_cache.get(location)
+        if version and cached and cached[0] == version and cached[1] is answer_key:
+            return cached[2]
+    
+    result = compute_analytics(location)
+    if version:
+        with _analytics_cache_lock:
+            _analytics_cache[location] = (version, answer_key, result)
+    return result
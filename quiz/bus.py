@@ -0,0 +1,191 @@
+"""Event bus from request handlers to the admin dashboard stream, across gunicorn workers."""
+import json
+import os
+import queue
+import secrets
+import select
+import threading
+import time
+
+from quiz import SERVER_THREADS
+from quiz.metrics import metrics
+from quiz.storage import storage
+
+# Participant changes (registrations, submissions, deletions, re-scores) are
+# published to in-process subscribers and, via Postgres NOTIFY, to the other
+# gunicorn workers, which feed the admin dashboard's Server-Sent Events stream.
+# Event types with a registered handler (e.g. quiz status toggles) go to the
+# handler instead of the dashboard stream.
+EVENT_CHANNEL = 'quiz_events'
+EVENT_NOTIFY = os.getenv('EVENT_NOTIFY', 'true').lower() == 'true' and storage.supports_notify
+# Under Flask each open stream holds a request thread for up to
+# SSE_STREAM_SECONDS, so by default only a quarter of SERVER_THREADS stream and
+# further dashboards poll. asgi.py streams from coroutines (ASGI_SSE_MAX_CLIENTS);
+# serve with it when many admins watch live.
+SSE_MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', str(max(SERVER_THREADS // 4, 1))))
+SSE_STREAM_SECONDS = float(os.getenv('SSE_STREAM_SECONDS', '300'))
+SSE_HEARTBEAT_SECONDS = 15
+
+class EventBus:
+    """Fan-out of participant events to SSE subscribers, bridged across workers with LISTEN/NOTIFY"""
+    
+    def __init__(self):
+        self.origin = f"{os.getpid()}-{secrets.token_hex(4)}"
+        self._lock = threading.Lock()
+        self._subscribers = {}    # queue -> location
+        self._listener = None
+        self._listener_pid = None
+        self._listening = False
+        self._epoch = 0           # bumped on every (re)connect of the LISTEN connection
+        self._versions = {}       # location -> number of events seen
+        self._handlers = {}       # event type -> [callback(location, data)]
+        self._observers = []      # [callback(location, event_type, data)]
+        self.dropped = 0
+    
+    def add_handler(self, event_type, callback):
+        """Route an event type to callback(location, data) in every worker"""
+        self._handlers.setdefault(event_type, []).append(callback)
+    
+    def add_observer(self, callback):
+        """Also pass every dashboard event to callback(location, event_type, data) in every worker"""
+        self._observers.append(callback)
+    
+    def subscribe(self, location, q=None, limit=SSE_MAX_CLIENTS):
+        """Register a subscriber queue for a location, or None if the client limit is reached.
+        
+        `q` may be any object with a non-blocking put_nowait() (default: a bounded queue.Queue).
+        """
+        with self._lock:
+            if len(self._subscribers) >= limit:
+                return None
+            q = q if q is not None else queue.Queue(maxsize=1000)
+            self._subscribers[q] = location
+        if EVENT_NOTIFY:
+            self._ensure_listener()
+        return q
+    
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(q, None)
+    
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+    
+    def metric_samples(self):
+        """Dashboard stream subscribers and dropped backlogs for /metrics"""
+        return [
+            ('quiz_sse_subscribers', 'gauge', (), self.subscriber_count()),
+            ('quiz_sse_dropped_total', 'counter', (), self.dropped)
+        ]
+    
+    def publish(self, location, event_type, data=None):
+        """Deliver an event locally and, best effort, to the other workers"""
+        self._deliver(location, event_type, data)
+        if EVENT_NOTIFY:
+            payload = json.dumps({'origin': self.origin, 'location': location, 'type': event_type, 'data': data})
+            try:
+                storage.notify(EVENT_CHANNEL, payload)
+            except Exception as e:
+                print(f"Event notify failed: {e}")
+    
+    def version(self, location):
+        """Change counter for a location, or None while cross-worker changes can't be tracked.
+        
+        With EVENT_NOTIFY the counter is only trustworthy while the LISTEN
+        connection is up, so the epoch changes whenever it reconnects.
+        """
+        epoch = self.epoch()
+        if epoch is None:
+            return None
+        with self._lock:
+            return f"{self.origin}.{epoch}.{self._versions.get(location, 0)}"
+    
+    def epoch(self):
+        """Listener connection epoch, or None while other workers' events can't be received.
+        
+        Without EVENT_NOTIFY that is always: caches keyed on the epoch must then
+        expire on their own (see notified_cache_fresh and LEADERBOARD_FALLBACK_TTL).
+        """
+        if not EVENT_NOTIFY:
+            return None
+        self._ensure_listener()
+        with self._lock:
+            return self._epoch if self._listening else None
+    
+    def _deliver(self, location, event_type, data):
+        handlers = self._handlers.get(event_type)
+        if handlers:
+            for callback in handlers:
+                try:
+                    callback(location, data)
+                except Exception as e:
+                    print(f"Event handler error ({event_type}): {e}")
+            return
+        
+        for callback in self._observers:
+            try:
+                callback(location, event_type, data)
+            except Exception as e:
+                print(f"Event observer error ({event_type}): {e}")
+        
+        with self._lock:
+            self._versions[location] = self._versions.get(location, 0) + 1
+            targets = [q for q, loc in self._subscribers.items() if loc == location]
+        for q in targets:
+            try:
+                q.put_nowait((event_type, data))
+            except queue.Full:
+                # A stuck client gets a full reload instead of an unbounded backlog
+                self.dropped += 1
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait(('reload', None))
+    
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+            self._listener.start()
+    
+    def _listen(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = storage.open_listener(EVENT_CHANNEL)
+                with self._lock:
+                    self._epoch += 1
+                    self._listening = True
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], 30) != ([], [], []):
+                        conn.poll()
+                        while conn.notifies:
+                            self._on_notify(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Event listener error: {e}")
+            finally:
+                with self._lock:
+                    self._listening = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+    
+    def _on_notify(self, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        if event.get('origin') == self.origin:
+            return
+        self._deliver(event.get('location'), event.get('type'), event.get('data'))
+
+event_bus = EventBus()
+metrics.add_collector(event_bus.metric_samples)
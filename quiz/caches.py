@@ -0,0 +1,220 @@
+"""Per-worker caches: question sets, quiz open/closed status and the live quiz event."""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from quiz.bus import EVENT_NOTIFY, event_bus
+from quiz.encoding import encode_json, raw_json
+from quiz.scoring import compile_answer
+from quiz.storage import storage
+
+# ===========================
+# Question Cache
+# ===========================
+
+# Question sets only change when an admin edits them, so each worker keeps the
+# participant view and the answer key per location in memory. Edits publish a
+# questions event that drops the entry in every worker; the TTL bounds how long
+# other workers can lag while EVENT_NOTIFY is off or the LISTEN connection is down.
+QUESTION_CACHE_TTL = float(os.getenv('QUESTION_CACHE_TTL', '30'))
+QUESTION_CACHE_MAX_LOCATIONS = int(os.getenv('QUESTION_CACHE_MAX_LOCATIONS', '32'))
+
+_question_cache = OrderedDict()
+_question_cache_lock = threading.Lock()
+
+def load_question_set(location):
+    """Load the participant view and answer key for a location from the database"""
+    rows = storage.get_questions(location)
+    
+    questions = []
+    answer_key = []
+    for q in rows:
+        question_data = {
+            'id': q['id'],
+            'question': q['question_text'],
+            'type': q['question_type'],
+            'options': q['options'],
+            'points': q['points']
+        }
+        
+        # For multiple choice, include the number of correct answers (but not the actual answers)
+        if q['question_type'] == 'multiple' and q['correct_answer']:
+            if isinstance(q['correct_answer'], list):
+                question_data['max_selections'] = len(q['correct_answer'])
+            else:
+                question_data['max_selections'] = 1
+        
+        questions.append(question_data)
+        answer_key.append(compile_answer(q))
+    
+    return {
+        'questions': questions,
+        # Serialized once per load; every participant gets the same bytes
+        'questions_json': raw_json(encode_json(questions).decode('utf-8')),
+        'answer_key': tuple(answer_key)
+    }
+
+def peek_question_set(location):
+    """The cached question set for a location, or None on a miss (never touches the database)"""
+    with _question_cache_lock:
+        entry = _question_cache.get(location)
+        if entry and entry['expires_at'] > time.monotonic():
+            _question_cache.move_to_end(location)
+            return entry['data']
+    return None
+
+def get_question_set(location):
+    """Get the cached question set for a location, loading it on a miss or expiry"""
+    now = time.monotonic()
+    with _question_cache_lock:
+        entry = _question_cache.get(location)
+        if entry and entry['expires_at'] > now:
+            _question_cache.move_to_end(location)
+            return entry['data']
+        version = entry['version'] if entry else 0
+    
+    data = load_question_set(location)
+    
+    with _question_cache_lock:
+        current = _question_cache.get(location)
+        # Skip storing if an admin edit invalidated the entry while we were loading
+        if current is None or current['version'] == version:
+            _question_cache[location] = {
+                'data': data,
+                'version': version,
+                'expires_at': time.monotonic() + QUESTION_CACHE_TTL
+            }
+            _question_cache.move_to_end(location)
+            while len(_question_cache) > QUESTION_CACHE_MAX_LOCATIONS:
+                _question_cache.popitem(last=False)
+    return data
+
+def invalidate_question_set(location):
+    """Drop this worker's cached question set for a location"""
+    with _question_cache_lock:
+        entry = _question_cache.get(location)
+        version = entry['version'] + 1 if entry else 1
+        # Keep a tombstone so in-flight loads see the version bump
+        _question_cache[location] = {'data': None, 'version': version, 'expires_at': 0}
+        _question_cache.move_to_end(location)
+        while len(_question_cache) > QUESTION_CACHE_MAX_LOCATIONS:
+            _question_cache.popitem(last=False)
+
+def questions_changed(location):
+    """Drop the location's cached question set in every worker after an admin edit"""
+    event_bus.publish(location, 'questions')
+
+event_bus.add_handler('questions', lambda location, data: invalidate_question_set(location))
+
+# ===========================
+# Quiz Status Cache
+# ===========================
+
+# The open/closed map is read on every participant landing but only changes
+# when an admin toggles it, so it is served from memory. Toggles are pushed to
+# every worker through the event bus; while the LISTEN connection is down (or
+# EVENT_NOTIFY is off) entries fall back to a short TTL.
+QUIZ_STATUS_TTL = float(os.getenv('QUIZ_STATUS_TTL', '300'))
+QUIZ_STATUS_FALLBACK_TTL = float(os.getenv('QUIZ_STATUS_FALLBACK_TTL', '5'))
+
+def notified_cache_fresh(loaded_at, loaded_epoch, epoch):
+    """Whether an entry loaded at `loaded_at` under event bus `loaded_epoch` can still be served"""
+    age = time.monotonic() - loaded_at
+    if EVENT_NOTIFY and epoch is not None and epoch == loaded_epoch:
+        return age < QUIZ_STATUS_TTL
+    return age < QUIZ_STATUS_FALLBACK_TTL
+
+class QuizStatusCache:
+    """In-memory location -> is_open map kept current by quiz_status events"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statuses = None
+        self._loaded_at = 0.0
+        self._epoch = None
+        self._generation = 0      # bumped by every toggle, so a racing load isn't trusted
+    
+    def _is_fresh(self, epoch):
+        return notified_cache_fresh(self._loaded_at, self._epoch, epoch)
+    
+    def peek(self):
+        """The in-memory map if it is still fresh, else None (never touches the database)"""
+        epoch = event_bus.epoch()
+        with self._lock:
+            if self._statuses is not None and self._is_fresh(epoch):
+                return self._statuses
+        return None
+    
+    def get_all(self):
+        """location -> is_open for every known location"""
+        epoch = event_bus.epoch()
+        with self._lock:
+            if self._statuses is not None and self._is_fresh(epoch):
+                return self._statuses
+            generation = self._generation
+        
+        statuses = storage.get_quiz_statuses()
+        with self._lock:
+            self._statuses = statuses
+            # A toggle landed mid-load: use the result once, but reload next time
+            self._loaded_at = time.monotonic() if generation == self._generation else 0.0
+            self._epoch = epoch
+            return self._statuses
+    
+    def is_open(self, location):
+        return bool(self.get_all().get(location, False))
+    
+    def set(self, location, is_open):
+        """Apply a toggle (from this worker or a quiz_status event from another)"""
+        with self._lock:
+            self._generation += 1
+            if self._statuses is not None:
+                self._statuses = {**self._statuses, location: bool(is_open)}
+
+quiz_status_cache = QuizStatusCache()
+event_bus.add_handler('quiz_status', lambda location, data: quiz_status_cache.set(location, data['is_open']))
+
+class LiveEventCache:
+    """Id of the live quiz event, kept current by live_event events"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._event_id = None
+        self._loaded_at = 0.0
+        self._epoch = None
+        self._generation = 0      # bumped by every new event, so a racing load isn't trusted
+    
+    def peek(self):
+        """The live event id if it is still fresh, else None (never touches the database)"""
+        epoch = event_bus.epoch()
+        with self._lock:
+            if self._event_id is not None and notified_cache_fresh(self._loaded_at, self._epoch, epoch):
+                return self._event_id
+        return None
+    
+    def id(self):
+        epoch = event_bus.epoch()
+        with self._lock:
+            if self._event_id is not None and notified_cache_fresh(self._loaded_at, self._epoch, epoch):
+                return self._event_id
+            generation = self._generation
+        
+        event = storage.live_quiz_event()
+        with self._lock:
+            self._event_id = event['id']
+            self._loaded_at = time.monotonic() if generation == self._generation else 0.0
+            self._epoch = epoch
+            return self._event_id
+    
+    def set(self, event_id):
+        """Apply a new live event (from this worker or a live_event event from another)"""
+        with self._lock:
+            self._generation += 1
+            if self._event_id is not None:
+                self._event_id = event_id
+
+live_event = LiveEventCache()
+event_bus.add_handler('live_event', lambda location, data: live_event.set(data['id']))
+# Participant queries in storage are scoped to the live event through this
+storage.live_event_id = live_event.id
@@ -0,0 +1,509 @@
+"""PostgreSQL connection pool, query helpers and prepared statements."""
+import functools
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import PoolError
+
+from quiz.metrics import caller_label, metrics, record_query
+
+# Database connection pool
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '5'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '100'))  # Handle 100+ concurrent database operations
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', '30'))
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Connection that remembers which registered statements it has PREPAREd"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class PoolTimeout(PoolError):
+    """Raised when no connection becomes free within the checkout timeout (or SQLite stays locked)"""
+
+class ConnectionPool:
+    """Thread-safe connection pool that blocks (with a timeout) when exhausted.
+    
+    Idle connections are handed out LIFO so the hot ones stay warm. A connection
+    that sat idle longer than `healthcheck_idle` is pinged before use, and one
+    older than `max_lifetime` is replaced, so server restarts and stale sockets
+    don't surface as request errors.
+    
+    Nothing is opened up front: the first checkout connects on demand and
+    starts a background warm-up to `minconn` idle connections.
+    """
+    
+    # Upper bounds (seconds) of the checkout wait-time histogram buckets
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+    
+    def __init__(self, dsn, minconn, maxconn, timeout, healthcheck_idle, max_lifetime):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.max_lifetime = max_lifetime
+        
+        self._cond = threading.Condition()
+        self._idle = []        # [(conn, returned_at)]
+        self._created = {}     # id(conn) -> created_at
+        self._size = 0         # open connections, idle + in use
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+        self._warming = False
+        
+        self._checkouts = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._failed_checks = 0
+        self._wait_buckets = [0] * len(self.WAIT_BUCKETS)
+        self._wait_sum = 0.0
+        self._checkout_sum = 0.0
+        self._checkout_max = 0.0
+    
+    def _warm_up(self):
+        """Open idle connections up to minconn (runs once, in the background)"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception as e:
+                print(f"Connection pool warm-up stopped: {e}")
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                if self._closed:
+                    self._size -= 1
+                    self._discard(conn)
+                    return
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+    
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=PreparedConnection)
+        self._created[id(conn)] = time.monotonic()
+        return conn
+    
+    def _discard(self, conn):
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+    def _is_healthy(self, conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+    
+    def getconn(self):
+        """Check out a connection, waiting up to `timeout` seconds for one to free up"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn = None
+        with self._cond:
+            if not self._warming:
+                self._warming = True
+                threading.Thread(target=self._warm_up, name='pool-warm-up', daemon=True).start()
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"no database connection available after {self.timeout:.1f}s "
+                        f"({self._in_use} in use, {self._waiters} waiting)"
+                    )
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._wait_sum += waited
+            for i, bound in enumerate(self.WAIT_BUCKETS):
+                if waited <= bound:
+                    self._wait_buckets[i] += 1
+                    break
+        
+        # Connect / health-check outside the lock so other threads aren't blocked
+        recycled = failed_check = False
+        try:
+            if conn is not None:
+                now = time.monotonic()
+                if conn.closed or now - self._created.get(id(conn), now) > self.max_lifetime:
+                    self._discard(conn)
+                    conn = None
+                    recycled = True
+                elif now - returned_at > self.healthcheck_idle and not self._is_healthy(conn):
+                    self._discard(conn)
+                    conn = None
+                    failed_check = True
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        
+        elapsed = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._recycled += recycled
+            self._failed_checks += failed_check
+            self._checkout_sum += elapsed
+            self._checkout_max = max(self._checkout_max, elapsed)
+        return conn
+    
+    def putconn(self, conn, close=False):
+        """Return a connection; broken or mid-transaction connections are cleaned up or dropped"""
+        if not close and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+        
+        with self._cond:
+            self._in_use -= 1
+            if close or conn.closed or self._closed:
+                self._size -= 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+    
+    def closeall(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+    
+    def stats(self):
+        """Snapshot of pool counters"""
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'size': self._size,
+                'max_size': self.maxconn,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiters': self._waiters,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'failed_health_checks': self._failed_checks,
+                'wait_seconds_sum': self._wait_sum,
+                'wait_histogram': {
+                    ('+Inf' if bound == float('inf') else str(bound)): count
+                    for bound, count in zip(self.WAIT_BUCKETS, self._wait_buckets)
+                },
+                'checkout_seconds_avg': self._checkout_sum / checkouts if checkouts else 0.0,
+                'checkout_seconds_max': self._checkout_max
+            }
+
+db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Initialize database connection pool"""
+    global db_pool
+    if db_pool is None:
+        with _db_pool_lock:
+            if db_pool is None:
+                database_url = os.getenv('DATABASE_URL')
+                if not database_url:
+                    raise ValueError("DATABASE_URL not found in environment variables. Please create a .env file.")
+                
+                db_pool = ConnectionPool(
+                    dsn=database_url,
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME
+                )
+    return db_pool
+
+def pool_metric_samples():
+    """Pool gauges, counters and checkout wait histogram (plus the prepared-statement switch) for /metrics"""
+    if db_pool is None:
+        return []
+    pool = db_pool.stats()
+    samples = [
+        ('quiz_db_pool_connections', 'gauge', (), pool['size']),
+        ('quiz_db_pool_connections_in_use', 'gauge', (), pool['in_use']),
+        ('quiz_db_pool_connections_idle', 'gauge', (), pool['idle']),
+        ('quiz_db_pool_connections_max', 'gauge', (), pool['max_size']),
+        ('quiz_db_pool_waiters', 'gauge', (), pool['waiters']),
+        ('quiz_db_pool_checkouts_total', 'counter', (), pool['checkouts']),
+        ('quiz_db_pool_timeouts_total', 'counter', (), pool['timeouts']),
+        ('quiz_db_pool_recycled_total', 'counter', (), pool['recycled']),
+        ('quiz_db_pool_failed_health_checks_total', 'counter', (), pool['failed_health_checks']),
+        ('quiz_db_pool_checkout_seconds_max', 'gauge', (), pool['checkout_seconds_max']),
+        ('quiz_db_prepared_statements', 'gauge', (), int(DB_PREPARED_STATEMENTS))
+    ]
+    cumulative = 0
+    for bound, count in pool['wait_histogram'].items():
+        cumulative += count
+        samples.append(('quiz_db_pool_wait_seconds_bucket', 'histogram', (('le', bound),), cumulative))
+    samples.append(('quiz_db_pool_wait_seconds_sum', 'histogram', (), pool['wait_seconds_sum']))
+    samples.append(('quiz_db_pool_wait_seconds_count', 'histogram', (), cumulative))
+    return samples
+
+metrics.add_collector(pool_metric_samples)
+
+def get_db_connection():
+    """Get a connection from the pool"""
+    pool = get_db_pool()
+    return pool.getconn()
+
+def return_db_connection(conn, close=False):
+    """Return a connection to the pool (close=True drops a broken connection)"""
+    pool = get_db_pool()
+    pool.putconn(conn, close=close)
+
+def execute_query(query, params=None, fetch=True, fetchone=False, label=None, prepared=None):
+    """Execute a database query with connection pooling
+    
+    `label` names the query in metrics and the slow-query log (defaults to the
+    calling function's name). With `prepared` (a PreparedStatement for `query`)
+    the statement is run with EXECUTE instead of being sent as text.
+    """
+    label = label or caller_label()
+    conn = None
+    broken = False
+    failed = False
+    rows = 0
+    start = time.perf_counter()
+    checked_out = None
+    try:
+        conn = get_db_connection()
+        checked_out = time.perf_counter()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if prepared is not None:
+                prepared.run(conn, cur, params)
+            else:
+                cur.execute(query, params)
+            
+            if fetch:
+                result = cur.fetchone() if fetchone else cur.fetchall()
+                rows = (1 if result else 0) if fetchone else len(result)
+                conn.commit()
+                return result
+            else:
+                rows = max(cur.rowcount, 0)
+                conn.commit()
+                return None
+    except Exception as e:
+        failed = True
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if conn and not broken:
+            conn.rollback()
+        print(f"Database error: {e}")
+        raise e
+    finally:
+        if conn:
+            return_db_connection(conn, close=broken)
+        record_query(label, query, start, checked_out, rows, failed)
+
+@contextmanager
+def db_transaction(label='transaction'):
+    """Check out a connection for a multi-statement transaction; commits on success"""
+    conn = None
+    broken = False
+    failed = False
+    start = time.perf_counter()
+    checked_out = None
+    try:
+        conn = get_db_connection()
+        checked_out = time.perf_counter()
+        yield conn
+        conn.commit()
+    except Exception as e:
+        failed = True
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if conn and not broken:
+            conn.rollback()
+        print(f"Database error: {e}")
+        raise e
+    finally:
+        if conn:
+            return_db_connection(conn, close=broken)
+        record_query(label, label, start, checked_out, 0, failed)
+
+def execute_values_query(query, argslist, template=None, page_size=1000, label=None):
+    """Execute a multi-row VALUES statement (psycopg2 execute_values) in one transaction"""
+    label = label or caller_label()
+    conn = None
+    broken = False
+    failed = False
+    rowcount = 0
+    start = time.perf_counter()
+    checked_out = None
+    try:
+        conn = get_db_connection()
+        checked_out = time.perf_counter()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            execute_values(cur, query, argslist, template=template, page_size=page_size)
+            rowcount = cur.rowcount
+        conn.commit()
+        return rowcount
+    except Exception as e:
+        failed = True
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if conn and not broken:
+            conn.rollback()
+        print(f"Database error: {e}")
+        raise e
+    finally:
+        if conn:
+            return_db_connection(conn, close=broken)
+        record_query(label, query, start, checked_out, max(rowcount, 0), failed)
+
+def stream_query(query, params=None, batch_size=1000, label='stream'):
+    """Yield result rows in batches through a server-side (named) cursor.
+    
+    Only one batch is held in memory at a time. The pooled connection is kept
+    until the generator is exhausted or closed.
+    """
+    conn = None
+    broken = False
+    failed = False
+    rows = 0
+    start = time.perf_counter()
+    checked_out = None
+    try:
+        conn = get_db_connection()
+        checked_out = time.perf_counter()
+        with conn.cursor(name=f'stream_{secrets.token_hex(4)}', cursor_factory=RealDictCursor) as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                rows += len(batch)
+                yield batch
+        conn.commit()
+    except Exception as e:
+        failed = True
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if conn and not broken:
+            conn.rollback()
+        print(f"Database error: {e}")
+        raise e
+    finally:
+        if conn:
+            return_db_connection(conn, close=broken)
+        record_query(label, query, start, checked_out, rows, failed)
+
+
+# Each backend's fixed SQL lives in a QueryRegistry under a name, which is also
+# its label in metrics. Statements run through the registry are PREPAREd the
+# first time a pooled connection uses them and EXECUTEd by name afterwards, so
+# Postgres parses and plans them once per connection. This is opt-in with
+# DB_PREPARED_STATEMENTS=true (tests/test_postgres_queries.py checks every
+# statement against a real server); leave it off behind a transaction-mode
+# pooler (e.g. PgBouncer), which does not keep per-session prepared statements.
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'false').lower() == 'true'
+
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s')
+
+@functools.lru_cache(maxsize=256)
+def numbered_placeholders(query):
+    """Rewrite psycopg2 %s / %(name)s placeholders as $1..$n; returns (query, parameter keys in order)"""
+    keys = []
+    
+    def number(match):
+        # Named parameters may repeat; positional ones are keyed by their index
+        key = match.group(1) if match.group(1) is not None else len(keys)
+        if key not in keys:
+            keys.append(key)
+        return f"${keys.index(key) + 1}"
+    
+    return _PLACEHOLDER.sub(number, query), tuple(keys)
+
+class PreparedStatement:
+    """A registered statement with its PREPARE and EXECUTE forms"""
+    
+    def __init__(self, name, query):
+        self.name = name
+        self.query = query
+        self.numbered, self.keys = numbered_placeholders(query)
+        self.prepare_sql = f"PREPARE q_{name} AS {self.numbered}"
+        self.execute_sql = f"EXECUTE q_{name}" + (f" ({', '.join(['%s'] * len(self.keys))})" if self.keys else '')
+    
+    def args(self, params):
+        """Parameter values in $n order from a dict (named) or sequence (positional)"""
+        return [params[key] for key in self.keys]
+    
+    def run(self, conn, cur, params):
+        """EXECUTE on a pooled connection, PREPAREing it there first"""
+        if self.name not in conn.prepared:
+            cur.execute(self.prepare_sql)
+            conn.prepared.add(self.name)
+            metrics.inc('quiz_db_prepares_total', (('query', self.name),))
+        cur.execute(self.execute_sql, self.args(params or ()))
+
+class QueryRegistry:
+    """Named SQL statements of a backend"""
+    
+    def __init__(self, statements):
+        self._statements = {name: PreparedStatement(name, query) for name, query in statements.items()}
+    
+    def __getitem__(self, name):
+        return self._statements[name]
+    
+    def __iter__(self):
+        return iter(self._statements)
+    
+    def execute(self, name, params=None, fetch=True, fetchone=False):
+        """execute_query() for a registered statement, prepared unless DB_PREPARED_STATEMENTS is off"""
+        statement = self._statements[name]
+        return execute_query(
+            statement.query, params, fetch=fetch, fetchone=fetchone, label=name,
+            prepared=statement if DB_PREPARED_STATEMENTS else None
+        )
+    
+    def run(self, conn, cur, name, params=None):
+        """Run a registered statement on a cursor inside db_transaction()"""
+        statement = self._statements[name]
+        if DB_PREPARED_STATEMENTS:
+            statement.run(conn, cur, params)
+        else:
+            cur.execute(statement.query, params)
@@ -0,0 +1,43 @@
+"""JSON encoding for responses, caches and archives."""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# API responses are encoded with orjson when it's installed (same output as
+# Flask's default provider: sorted keys, HTTP dates). JSON that is already
+# serialized - the cached question list, answers that Postgres hands over as
+# text - is embedded with raw_json() instead of being decoded and re-encoded.
+ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+def encode_json(obj):
+    """obj as UTF-8 JSON bytes, the same as a Flask response body (no app needed)"""
+    if orjson is None:
+        return json.dumps(obj, default=DefaultJSONProvider.default, sort_keys=True).encode('utf-8')
+    return orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, falling back to the standard library"""
+    
+    def encode(self, obj):
+        """obj as compact UTF-8 JSON bytes"""
+        return encode_json(obj)
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj) + b'\n', mimetype=self.mimetype)
+
+def raw_json(text):
+    """Embed already-serialized JSON in a response as-is (decoded when orjson is missing)"""
+    if orjson is None:
+        return json.loads(text)
+    return orjson.Fragment(text)
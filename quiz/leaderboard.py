@@ -0,0 +1,223 @@
+"""Per-location leaderboards kept in memory by each worker."""
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+from quiz.bus import event_bus
+from quiz.metrics import metrics
+from quiz.storage import storage
+
+# Each worker keeps the submitted participants of a location in ranking order
+# (score DESC, submitted_at ASC) in an indexable skip list, loaded from the
+# database on first use and then kept current from the participant events of
+# every worker (submissions, deletions; re-scores reload it). Top-K and rank
+# lookups therefore cost O(log n + K) instead of a sort per request. While
+# cross-worker events can't be trusted (EVENT_NOTIFY off or the LISTEN
+# connection down) a board is only reused for LEADERBOARD_FALLBACK_TTL seconds.
+LEADERBOARD_MAX_TOP = 100
+LEADERBOARD_FALLBACK_TTL = float(os.getenv('LEADERBOARD_FALLBACK_TTL', '5'))
+
+class RankedList:
+    """Sorted list with O(log n) insert, remove and rank (an indexable skip list)"""
+    
+    MAX_LEVELS = 32
+    
+    class _Node:
+        __slots__ = ('value', 'next', 'width')
+        
+        def __init__(self, value, levels):
+            self.value = value
+            self.next = [None] * levels
+            self.width = [1] * levels    # positions skipped by each forward link
+    
+    def __init__(self):
+        self._head = self._Node(None, self.MAX_LEVELS)
+        self._size = 0
+        self._random = random.Random()
+    
+    def __len__(self):
+        return self._size
+    
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+    
+    def _chain(self, value):
+        """Last node before `value` on every level, with its position"""
+        chain = [None] * self.MAX_LEVELS
+        positions = [0] * self.MAX_LEVELS
+        node = self._head
+        position = 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].value < value:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+    
+    def insert(self, value):
+        chain, positions = self._chain(value)
+        levels = 1
+        while levels < self.MAX_LEVELS and self._random.random() < 0.5:
+            levels += 1
+        
+        node = self._Node(value, levels)
+        position = positions[0] + 1
+        for level in range(self.MAX_LEVELS):
+            prev = chain[level]
+            if level < levels:
+                node.next[level] = prev.next[level]
+                prev.next[level] = node
+                node.width[level] = prev.width[level] - (position - 1 - positions[level])
+                prev.width[level] = position - positions[level]
+            else:
+                prev.width[level] += 1
+        self._size += 1
+    
+    def remove(self, value):
+        chain, _ = self._chain(value)
+        node = chain[0].next[0]
+        if node is None or node.value != value:
+            raise KeyError(value)
+        
+        for level in range(self.MAX_LEVELS):
+            prev = chain[level]
+            if prev.next[level] is node:
+                prev.width[level] += node.width[level] - 1
+                prev.next[level] = node.next[level]
+            else:
+                prev.width[level] -= 1
+        self._size -= 1
+    
+    def rank(self, value):
+        """1-based position of `value`, or None if it isn't in the list"""
+        node = self._head
+        position = 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].value <= value:
+                position += node.width[level]
+                node = node.next[level]
+        return position if node is not self._head and node.value == value else None
+    
+    def top(self, k):
+        """The first k values"""
+        values = []
+        node = self._head.next[0]
+        while node is not None and len(values) < k:
+            values.append(node.value)
+            node = node.next[0]
+        return values
+
+class Leaderboard:
+    """Submitted participants of one location in ranking order"""
+    
+    def __init__(self):
+        self._ranking = RankedList()
+        self._entries = {}    # sso -> (ranking key, public entry)
+    
+    def __len__(self):
+        return len(self._ranking)
+    
+    def update(self, participant):
+        """Insert, move or (when not submitted) drop a participant"""
+        self.remove(participant['sso'])
+        submitted_at = participant['submitted_at']
+        if submitted_at is None:
+            return
+        if isinstance(submitted_at, str):
+            submitted_at = datetime.fromisoformat(submitted_at)
+        
+        # Same order as the admin list; sso stands in for the id tie-breaker
+        key = (-participant['score'], submitted_at, participant['sso'])
+        self._ranking.insert(key)
+        self._entries[participant['sso']] = (key, {
+            'name': participant['name'],
+            'score': participant['score'],
+            'submitted_at': submitted_at.isoformat()
+        })
+    
+    def remove(self, sso):
+        current = self._entries.pop(sso, None)
+        if current is not None:
+            self._ranking.remove(current[0])
+    
+    def rank(self, sso):
+        current = self._entries.get(sso)
+        return self._ranking.rank(current[0]) if current is not None else None
+    
+    def entry(self, sso):
+        current = self._entries.get(sso)
+        return current[1] if current is not None else None
+    
+    def top(self, k):
+        return [
+            {'rank': rank, **self._entries[key[2]][1]}
+            for rank, key in enumerate(self._ranking.top(k), start=1)
+        ]
+
+class Leaderboards:
+    """Per-location leaderboards of this worker, kept current from participant events"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {}    # location -> (Leaderboard, event bus epoch at load, monotonic load time)
+        self._loads = 0
+    
+    def _load(self, location):
+        board = Leaderboard()
+        for batch in storage.stream_participants(location):
+            for participant in batch:
+                board.update(participant)
+        self._loads += 1
+        return board
+    
+    def _board(self, location):
+        # Caller holds the lock, so events wait until a load has finished
+        epoch = event_bus.epoch()
+        current = self._boards.get(location)
+        if current is None or current[1] != epoch or (
+                epoch is None and time.monotonic() - current[2] >= LEADERBOARD_FALLBACK_TTL):
+            current = self._boards[location] = (self._load(location), epoch, time.monotonic())
+        return current[0]
+    
+    def top(self, location, k):
+        with self._lock:
+            board = self._board(location)
+            return board.top(k), len(board)
+    
+    def rank(self, location, sso):
+        """(rank, entry) of a participant, or (None, None) if they haven't submitted"""
+        with self._lock:
+            board = self._board(location)
+            return board.rank(sso), board.entry(sso)
+    
+    def on_event(self, location, event_type, data):
+        with self._lock:
+            current = self._boards.get(location)
+            if current is None:
+                return
+            if event_type == 'participant':
+                current[0].update(data)
+            elif event_type == 'deleted':
+                current[0].remove(data['sso'])
+            elif event_type == 'reload':
+                del self._boards[location]
+    
+    def metric_samples(self):
+        """Board size per location and board loads for /metrics"""
+        with self._lock:
+            samples = [
+                ('quiz_leaderboard_entries', 'gauge', (('location', location),), len(board))
+                for location, (board, *_) in sorted(self._boards.items())
+            ]
+            samples.append(('quiz_leaderboard_loads_total', 'counter', (), self._loads))
+        return samples
+
+leaderboards = Leaderboards()
+event_bus.add_observer(leaderboards.on_event)
+metrics.add_collector(leaderboards.metric_samples)
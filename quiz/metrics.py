@@ -0,0 +1,127 @@
+"""Per-process Prometheus metrics: counters, histograms and component collectors."""
+import os
+import sys
+import threading
+import time
+
+from flask import g, has_request_context
+
+# Per-process metrics in Prometheus text format. Under gunicorn each worker
+# keeps its own numbers; the `pid` label on /metrics tells them apart.
+# Components with their own counters (pool, buffers, queues, caches) register a
+# collector that is sampled on every scrape instead of exposing a stats endpoint.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '500'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+class Metrics:
+    """Minimal thread-safe registry of counters, histograms and collectors"""
+    
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}      # (name, labels) -> value
+        self._histograms = {}    # (name, labels) -> [bucket counts..., sum, count]
+        self._collectors = []    # callables -> [(name, kind, labels, value)]
+    
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * (len(self.BUCKETS) + 2)
+            for i, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            hist[-2] += value
+            hist[-1] += 1
+    
+    def add_collector(self, collect):
+        """Sample collect() -> [(name, kind, labels, value)] on every render"""
+        with self._lock:
+            self._collectors.append(collect)
+    
+    def render(self, base_labels=()):
+        """Prometheus text exposition of everything recorded so far"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(hist)) for key, hist in self._histograms.items())
+            collectors = list(self._collectors)
+        
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(base_labels + labels)} {value}")
+        for (name, labels), hist in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            labels = base_labels + labels
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS, hist):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {hist[-1]}")
+            lines.append(f"{name}_sum{format_labels(labels)} {hist[-2]}")
+            lines.append(f"{name}_count{format_labels(labels)} {hist[-1]}")
+        for collect in collectors:
+            for name, kind, labels, value in collect():
+                # Histogram samples arrive as <family>_bucket/_sum/_count
+                family = name.rsplit('_', 1)[0] if kind == 'histogram' else name
+                if family not in typed:
+                    lines.append(f"# TYPE {family} {kind}")
+                    typed.add(family)
+                lines.append(f"{name}{format_labels(base_labels + labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+metrics = Metrics()
+
+def stat_samples(prefix, stats, counters=(), labels=()):
+    """Collector samples for the numeric values of a stats() snapshot; keys in counters become *_total"""
+    samples = []
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        elif not isinstance(value, (int, float)):
+            continue
+        if key in counters:
+            samples.append((f'{prefix}_{key}_total', 'counter', labels, value))
+        else:
+            samples.append((f'{prefix}_{key}', 'gauge', labels, value))
+    return samples
+
+def caller_label(depth=2):
+    """Name of the function that called the query helper, used as the default query label"""
+    return sys._getframe(depth).f_code.co_name
+
+def record_query(label, query, start, checked_out, rows, failed):
+    """Record timing for one database call (pool wait and execution separately)"""
+    end = time.perf_counter()
+    pool_wait = (checked_out or end) - start
+    elapsed = end - (checked_out or end)
+    labels = (('query', label),)
+    
+    metrics.observe('quiz_db_query_duration_seconds', elapsed, labels)
+    metrics.inc('quiz_db_rows_total', labels, rows)
+    if failed:
+        metrics.inc('quiz_db_errors_total', labels)
+    if has_request_context():
+        g.db_seconds = g.get('db_seconds', 0.0) + elapsed
+        g.pool_wait_seconds = g.get('pool_wait_seconds', 0.0) + pool_wait
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        print(f"Slow query [{label}] {elapsed * 1000:.1f}ms (pool wait {pool_wait * 1000:.1f}ms): {' '.join(query.split())[:300]}")
@@ -0,0 +1,345 @@
+"""Participant API: registration, tokens, questions, answer saves, submission and leaderboard."""
+import os
+import re
+
+from flask import jsonify, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from quiz import queues
+from quiz.bus import event_bus
+from quiz.caches import get_question_set, live_event, quiz_status_cache
+from quiz.leaderboard import LEADERBOARD_MAX_TOP, leaderboards
+from quiz.queues import answer_buffer, submission_pending, submission_queue
+from quiz.scoring import score_answers, valid_answer
+from quiz.storage import serialize_participant, storage
+from quiz.web import app
+
+QUIZ_CLOSED_MESSAGE = 'Quiz is currently closed for this location. Please contact admin.'
+ANSWER_SHAPE_MESSAGE = 'Each answer must be text, a number, true/false, null or a list of texts and numbers'
+
+# register() hands out a signed token naming the participant's sso, location
+# and quiz event. The question, save and submit endpoints identify the caller
+# from it with an HMAC check instead of trusting an sso from the request; the
+# token says who is asking, never whether they may still answer: questions
+# re-read the participant row, and saves and submits go to conditional
+# statements that refuse unknown and submitted participants.
+# Tokens from an earlier event stop working once a new event starts.
+# Set SECRET_KEY when running several workers so they all accept the same tokens.
+PARTICIPANT_TOKEN_MAX_AGE = int(os.getenv('PARTICIPANT_TOKEN_MAX_AGE', str(12 * 3600)))
+PARTICIPANT_TOKEN_HEADER = 'X-Participant-Token'
+PARTICIPANT_TOKEN_MESSAGE = 'Your quiz session has expired, please register again'
+
+participant_tokens = URLSafeTimedSerializer(app.secret_key, salt='participant-token')
+
+def issue_participant_token(sso, location):
+    """Signed, timestamped token for a participant registered in the live event"""
+    return participant_tokens.dumps({'sso': sso, 'location': location, 'event': live_event.id()})
+
+def read_participant_token(token, event_id):
+    """{'sso', 'location', 'event'} from a valid token for event_id; None if missing, forged or expired"""
+    if not token:
+        return None
+    try:
+        claims = participant_tokens.loads(token, max_age=PARTICIPANT_TOKEN_MAX_AGE)
+    except BadSignature:    # SignatureExpired is a BadSignature too
+        return None
+    if not isinstance(claims, dict) or claims.get('event') != event_id:
+        return None
+    return claims
+
+def request_participant(data=None):
+    """Token claims for the current request (header, or a body `token` for sendBeacon)"""
+    token = request.headers.get(PARTICIPANT_TOKEN_HEADER) or (data or {}).get('token')
+    return read_participant_token(token, live_event.id())
+
+# The helpers below return (payload, status) so the ASGI server (asgi.py)
+# answers exactly like these Flask views.
+
+def registration_error(sso, email):
+    """(payload, status) for malformed registration details, or None"""
+    # Validate SSO (exactly 9 digits)
+    if not re.match(r'^\d{9}$', sso):
+        return {
+            'success': False,
+            'message': 'SSO must be exactly 9 digits'
+        }, 400
+    
+    # Validate email (must end with @gevernova.com)
+    if not re.match(r'^[a-zA-Z0-9._%+-]+@gevernova\.com$', email):
+        return {
+            'success': False,
+            'message': 'Email must be a valid GE Vernova email address (@gevernova.com)'
+        }, 400
+    return None
+
+def registration_response(status, existing_location, location, is_open):
+    """(payload, status) for a storage.register() outcome; is_open(location) checks resumes"""
+    if status == 'new':
+        return {'success': True, 'can_resume': False}, 200
+    
+    if status == 'sso_conflict':
+        return {
+            'success': False,
+            'message': 'This SSO is already registered with different details. SSO, Email, and Name must match your previous registration.'
+        }, 400
+    
+    if status == 'email_conflict':
+        return {
+            'success': False,
+            'message': 'This Email is already registered with different details. SSO, Email, and Name must match your previous registration.'
+        }, 400
+    
+    if status == 'submitted':
+        return {
+            'success': False,
+            'message': f'You have already completed the quiz for {existing_location}. You cannot take another quiz.'
+        }, 400
+    
+    if status == 'resume':
+        if existing_location != location and not is_open(existing_location):
+            return {'success': False, 'message': QUIZ_CLOSED_MESSAGE}, 403
+        return {
+            'success': True,
+            'can_resume': True,
+            'location': existing_location,
+            'message': f'Welcome back! Resuming your quiz for {existing_location}...'
+        }, 200
+    
+    return {'success': False, 'message': 'Registration is busy, please try again'}, 503
+
+def participant_token_error(claims):
+    """(payload, status) for a request without a valid participant token, or None"""
+    if claims is None:
+        return {'success': False, 'message': PARTICIPANT_TOKEN_MESSAGE}, 401
+    return None
+
+def with_participant_token(response, sso, location):
+    """Add the participant token to a successful registration_response()"""
+    payload, code = response
+    if payload['success']:
+        payload['token'] = issue_participant_token(sso, payload.get('location', location))
+    return payload, code
+
+def quiz_participant_error(participant):
+    """(payload, status) when a participant can't load questions, or None"""
+    if not participant:
+        return {'error': 'Not registered'}, 403
+    
+    # Check if already submitted
+    if participant['submitted_at']:
+        return {'error': 'Quiz already submitted'}, 403
+    return None
+
+def parse_answers_payload(data):
+    """{question_id: answer} from a save-answers body; ValueError carries the client message"""
+    answers = data.get('answers')
+    if not isinstance(answers, dict):
+        raise ValueError('answers must be an object of question_id -> answer')
+    if not all(valid_answer(answer) for answer in answers.values()):
+        raise ValueError(ANSWER_SHAPE_MESSAGE)
+    return {str(question_id): answer for question_id, answer in answers.items()}
+
+@app.route('/api/quiz-status/<location>', methods=['GET'])
+def get_location_quiz_status(location):
+    response = jsonify({'is_open': quiz_status_cache.is_open(location)})
+    response.headers['Cache-Control'] = 'public, max-age=2'
+    return response
+
+@app.route('/api/register', methods=['POST'])
+def register():
+    data = request.json
+    sso = data.get('sso', '').strip()
+    name = data.get('name', '').strip()
+    email = data.get('email', '').strip()
+    location = data.get('location')
+    
+    error = registration_error(sso, email)
+    if error:
+        return error
+    
+    if not quiz_status_cache.is_open(location):
+        return jsonify({'success': False, 'message': QUIZ_CLOSED_MESSAGE}), 403
+    
+    try:
+        status, existing_location = storage.register(sso, name, email, location)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    if status == 'new':
+        event_bus.publish(location, 'participant', {
+            'sso': sso, 'name': name, 'email': email, 'score': 0, 'submitted_at': None
+        })
+    return with_participant_token(
+        registration_response(status, existing_location, location, quiz_status_cache.is_open),
+        sso, location
+    )
+
+@app.route('/api/questions/<location>', methods=['GET'])
+def get_quiz_questions(location):
+    participant = request_participant()
+    if participant is None or participant['location'] != location:
+        return jsonify({'error': PARTICIPANT_TOKEN_MESSAGE}), 401
+    
+    if not quiz_status_cache.is_open(location):
+        return jsonify({'error': QUIZ_CLOSED_MESSAGE}), 403
+    
+    event_id, sso = participant['event'], participant['sso']
+    if submission_pending(event_id, sso, location):
+        return jsonify({'error': 'Quiz already submitted'}), 403
+    
+    # The token doesn't say whether the quiz was submitted or what was saved
+    # since it was issued (a reload), so always read the participant row,
+    # after any answers still buffered for it
+    if queues.ANSWER_WRITE_BEHIND:
+        answer_buffer.flush(event_id, sso, location)
+    stored = storage.get_participant(sso, location)
+    error = quiz_participant_error(stored)
+    if error:
+        return error
+    
+    # Get questions (without correct answers) from the in-process cache
+    result = {
+        'questions': get_question_set(location)['questions_json'],
+        'existing_answers': stored['answers']
+    }
+    
+    return jsonify(result)
+
+def save_status_response(status, saved_count):
+    """(payload, status) for a storage.merge_answers() status"""
+    if status == 'not_registered':
+        return {'success': False, 'message': 'Not registered'}, 403
+    if status == 'submitted':
+        return {'success': False, 'message': 'Quiz already submitted'}, 403
+    return {'success': True, 'saved': saved_count}, 200
+
+@app.route('/api/save-answer', methods=['POST'])
+def save_answer():
+    data = request.json
+    participant = request_participant(data)
+    error = participant_token_error(participant)
+    if error:
+        return error
+    event_id, sso, location = participant['event'], participant['sso'], participant['location']
+    question_id = str(data.get('question_id'))
+    answer = data.get('answer')
+    if not valid_answer(answer):
+        return jsonify({'success': False, 'message': ANSWER_SHAPE_MESSAGE}), 400
+    
+    if submission_pending(event_id, sso, location):
+        return save_status_response('submitted', 1)
+    
+    if queues.ANSWER_WRITE_BEHIND:
+        answer_buffer.add(event_id, sso, location, {question_id: answer})
+        return save_status_response('saved', 1)
+    
+    status = storage.merge_answers(sso, location, {question_id: answer})
+    return save_status_response(status, 1)
+
+@app.route('/api/save-answers', methods=['POST'])
+def save_answers():
+    """Batch variant of save-answer: applies a {question_id: answer} map in one statement"""
+    # force=True so navigator.sendBeacon() payloads are accepted too
+    data = request.get_json(force=True, silent=True) or {}
+    participant = request_participant(data)
+    error = participant_token_error(participant)
+    if error:
+        return error
+    event_id, sso, location = participant['event'], participant['sso'], participant['location']
+    
+    try:
+        answers = parse_answers_payload(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if not answers:
+        return jsonify({'success': True, 'saved': 0})
+    
+    if submission_pending(event_id, sso, location):
+        return save_status_response('submitted', len(answers))
+    
+    if queues.ANSWER_WRITE_BEHIND:
+        answer_buffer.add(event_id, sso, location, answers)
+        return save_status_response('saved', len(answers))
+    
+    status = storage.merge_answers(sso, location, answers)
+    return save_status_response(status, len(answers))
+
+def submission_status(sso, location, job=None):
+    """(payload, status) for a queued submission, falling back to the stored participant"""
+    if job is not None and not job.done.is_set():
+        return {'success': True, 'queued': True}, 202
+    if job is not None and job.status == 'scored':
+        return {'success': True, 'score': job.row['score'], 'rank': leaderboards.rank(location, sso)[0]}, 200
+    if job is not None and job.status == 'failed':
+        return {'success': False, 'message': 'Submission could not be saved, please try again'}, 503
+    
+    # Skipped or no longer queued here: the database has the outcome
+    participant = storage.get_participant(sso, location)
+    if not participant:
+        return {'success': False, 'message': 'Not registered'}, 403
+    if participant['submitted_at'] is None:
+        return {'success': False, 'message': 'Quiz not submitted'}, 404
+    return {'success': True, 'score': participant['score'], 'rank': leaderboards.rank(location, sso)[0]}, 200
+
+@app.route('/api/submit', methods=['POST'])
+def submit_quiz():
+    participant = request_participant(request.get_json(silent=True))
+    error = participant_token_error(participant)
+    if error:
+        return error
+    event_id, sso, location = participant['event'], participant['sso'], participant['location']
+    
+    if queues.SUBMIT_QUEUE:
+        job = submission_queue.submit(event_id, sso, location)
+        job.done.wait(queues.SUBMIT_WAIT_MS / 1000.0)
+        payload, status = submission_status(sso, location, job)
+        return jsonify(payload), status
+    
+    # Make sure buffered answers are in the database before scoring
+    if queues.ANSWER_WRITE_BEHIND:
+        answer_buffer.flush(event_id, sso, location)
+    
+    # Resolve the answer key before the transaction: a cache miss would
+    # otherwise need a second pooled connection while the row lock is held
+    answer_key = get_question_set(location)['answer_key']
+    
+    # Read the answers, score them and store the result (stamped with the
+    # database's clock) in one transaction; nothing comes back for unknown or
+    # already submitted participants
+    rows = storage.submit_bulk(
+        {(event_id, sso, location): None}, lambda key, answers: score_answers(answer_key, answers)
+    )
+    if not rows:
+        payload, status = submission_status(sso, location)
+        return jsonify(payload), status
+    
+    event_bus.publish(location, 'participant', serialize_participant(rows[0]))
+    return jsonify({'success': True, 'score': rows[0]['score'], 'rank': leaderboards.rank(location, sso)[0]})
+
+@app.route('/api/leaderboard/<location>', methods=['GET'])
+def get_leaderboard(location):
+    """Top submitted participants (?top=, default 20) and, for a participant token, that participant's rank"""
+    try:
+        top = min(max(int(request.args.get('top', 20)), 0), LEADERBOARD_MAX_TOP)
+    except ValueError:
+        return jsonify({'error': 'top must be an integer'}), 400
+    
+    entries, ranked = leaderboards.top(location, top)
+    result = {'location': location, 'participants': ranked, 'top': entries}
+    
+    participant = request_participant()
+    if participant and participant['location'] == location:
+        rank, entry = leaderboards.rank(location, participant['sso'])
+        result['you'] = {'rank': rank, **entry} if entry else None
+    return jsonify(result)
+
+@app.route('/api/submit-status', methods=['GET'])
+def get_submit_status():
+    """Poll target for a submission answered with 202 (queued)"""
+    participant = request_participant()
+    error = participant_token_error(participant)
+    if error:
+        return error
+    event_id, sso, location = participant['event'], participant['sso'], participant['location']
+    payload, status = submission_status(sso, location, submission_queue.pending(event_id, sso, location))
+    return jsonify(payload), status
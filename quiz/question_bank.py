@@ -0,0 +1,82 @@
+"""Question bank import: CSV parsing, validation and bulk insert."""
+import csv
+import io
+
+from quiz.caches import questions_changed
+from quiz.storage import storage
+
+# Must match the valid_question_type constraint in migrations/*/0001_initial.sql
+QUESTION_TYPES = ('single', 'multiple', 'truefalse', 'text')
+QUESTION_BANK_CSV_FIELDS = ('location', 'question', 'type', 'options', 'correct_answer', 'points')
+CSV_LIST_SEPARATOR = '|'
+
+def parse_question_bank_csv(text, default_location=None):
+    """Parse a CSV question bank; options and multiple-choice answers are '|'-separated"""
+    questions = []
+    for row in csv.DictReader(io.StringIO(text)):
+        question_type = (row.get('type') or '').strip()
+        options = [o.strip() for o in (row.get('options') or '').split(CSV_LIST_SEPARATOR) if o.strip()]
+        correct_answer = (row.get('correct_answer') or '').strip()
+        if question_type == 'multiple':
+            correct_answer = [a.strip() for a in correct_answer.split(CSV_LIST_SEPARATOR) if a.strip()]
+        questions.append({
+            'location': (row.get('location') or '').strip() or default_location,
+            'question': (row.get('question') or '').strip(),
+            'type': question_type,
+            'options': options or None,
+            'correct_answer': correct_answer,
+            'points': (row.get('points') or '').strip() or 1
+        })
+    return questions
+
+def validate_question(q):
+    """Return an error message for an invalid question dict, or None"""
+    if not q.get('location'):
+        return 'location is required'
+    if not isinstance(q.get('question'), str) or not q['question'].strip():
+        return 'question text is required'
+    question_type = q.get('type')
+    if question_type not in QUESTION_TYPES:
+        return f"type must be one of {', '.join(QUESTION_TYPES)}"
+    try:
+        if int(q.get('points', 1)) < 1:
+            return 'points must be at least 1'
+    except (TypeError, ValueError):
+        return 'points must be a number'
+    
+    options = q.get('options')
+    correct_answer = q.get('correct_answer')
+    if question_type in ('single', 'multiple'):
+        if not isinstance(options, list) or len(options) < 2:
+            return 'at least 2 options are required'
+        if question_type == 'single' and correct_answer not in options:
+            return 'correct_answer must be one of the options'
+        if question_type == 'multiple':
+            if not isinstance(correct_answer, list) or not correct_answer:
+                return 'correct_answer must be a non-empty list'
+            if any(answer not in options for answer in correct_answer):
+                return 'every correct_answer must be one of the options'
+    elif question_type == 'truefalse':
+        if correct_answer not in ('True', 'False'):
+            return 'correct_answer must be True or False'
+    elif not isinstance(correct_answer, str) or not correct_answer.strip():
+        return 'correct_answer is required'
+    return None
+
+def import_questions(questions, replace=False):
+    """Insert a validated question bank in one transaction (a single multi-row INSERT on Postgres).
+    
+    With replace=True the existing questions of every location in the bank are
+    deleted first, in the same transaction. Returns {location: inserted_count}.
+    """
+    locations = sorted({q['location'] for q in questions})
+    storage.import_questions(questions, replace_locations=locations if replace else None)
+    
+    # Once per location, not once per question
+    for location in locations:
+        questions_changed(location)
+    
+    counts = {location: 0 for location in locations}
+    for q in questions:
+        counts[q['location']] += 1
+    return counts
@@ -0,0 +1,367 @@
+"""Answer write-behind buffer and submission queue."""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from quiz.bus import event_bus
+from quiz.caches import get_question_set, live_event
+from quiz.metrics import metrics, stat_samples
+from quiz.scoring import score_answers
+from quiz.storage import serialize_participant, storage
+
+# Optional mode: answer saves are acknowledged once they are in memory and a
+# background thread writes them out in bulk. Saves are then not checked against
+# registration/submission at request time; the flush statement simply skips
+# rows that are unknown or already submitted.
+ANSWER_WRITE_BEHIND = os.getenv('ANSWER_WRITE_BEHIND', 'false').lower() == 'true'
+ANSWER_FLUSH_INTERVAL_MS = int(os.getenv('ANSWER_FLUSH_INTERVAL_MS', '500'))
+ANSWER_FLUSH_MAX_ENTRIES = int(os.getenv('ANSWER_FLUSH_MAX_ENTRIES', '500'))
+
+class AnswerBuffer:
+    """Per-participant in-memory answer buffer flushed in bulk (one multi-row UPDATE on Postgres)"""
+    
+    def __init__(self, interval_ms, max_entries):
+        self.interval = interval_ms / 1000.0
+        self.max_entries = max_entries
+        
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time, so a forced flush waits for in-flight writes
+        self._wake = threading.Event()
+        self._pending = {}    # (event_id, sso, location) -> {question_id: answer}
+        self._entries = 0
+        self._thread = None
+        self._stopping = False
+        
+        self._flushes = 0
+        self._flushed_entries = 0
+        self._flush_errors = 0
+        self._flush_seconds_sum = 0.0
+        self._flush_seconds_max = 0.0
+        self._last_flush_seconds = 0.0
+    
+    def add(self, event_id, sso, location, answers):
+        """Buffer answers for a participant of an event; newer answers overwrite older ones per question"""
+        with self._lock:
+            self._ensure_started()
+            bucket = self._pending.setdefault((event_id, sso, location), {})
+            before = len(bucket)
+            bucket.update(answers)
+            self._entries += len(bucket) - before
+            if self._entries >= self.max_entries:
+                self._wake.set()
+    
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='answer-flusher', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Answer buffer flush failed: {e}")
+    
+    def _take(self, key=None):
+        with self._lock:
+            if key is None:
+                batch, self._pending = self._pending, {}
+            else:
+                bucket = self._pending.pop(key, None)
+                batch = {key: bucket} if bucket else {}
+            self._entries -= sum(len(bucket) for bucket in batch.values())
+            return batch
+    
+    def _restore(self, batch):
+        # Put a failed batch back without overwriting answers that arrived since
+        with self._lock:
+            for key, answers in batch.items():
+                bucket = self._pending.setdefault(key, {})
+                before = len(bucket)
+                for question_id, answer in answers.items():
+                    bucket.setdefault(question_id, answer)
+                self._entries += len(bucket) - before
+    
+    def flush(self, event_id=None, sso=None, location=None):
+        """Write buffered answers (all participants, or just one) to the database"""
+        with self._flush_lock:
+            batch = self._take((event_id, sso, location) if sso is not None else None)
+            if not batch:
+                return 0
+            
+            start = time.monotonic()
+            try:
+                storage.merge_answers_bulk(batch)
+            except Exception:
+                self._restore(batch)
+                with self._lock:
+                    self._flush_errors += 1
+                raise
+            
+            elapsed = time.monotonic() - start
+            entries = sum(len(answers) for answers in batch.values())
+            with self._lock:
+                self._flushes += 1
+                self._flushed_entries += entries
+                self._flush_seconds_sum += elapsed
+                self._flush_seconds_max = max(self._flush_seconds_max, elapsed)
+                self._last_flush_seconds = elapsed
+            return entries
+    
+    def stop(self):
+        """Stop the flusher and drain whatever is still buffered"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"✗ Could not drain answer buffer on shutdown: {e}")
+    
+    def stats(self):
+        """Snapshot of buffer depth and flush counters"""
+        with self._lock:
+            return {
+                'enabled': ANSWER_WRITE_BEHIND,
+                'pending_participants': len(self._pending),
+                'pending_entries': self._entries,
+                'flushes': self._flushes,
+                'flushed_entries': self._flushed_entries,
+                'flush_errors': self._flush_errors,
+                'flush_seconds_avg': self._flush_seconds_sum / self._flushes if self._flushes else 0.0,
+                'flush_seconds_max': self._flush_seconds_max,
+                'last_flush_seconds': self._last_flush_seconds
+            }
+
+answer_buffer = AnswerBuffer(ANSWER_FLUSH_INTERVAL_MS, ANSWER_FLUSH_MAX_ENTRIES)
+atexit.register(answer_buffer.stop)
+metrics.add_collector(lambda: stat_samples(
+    'quiz_answer_buffer', answer_buffer.stats(), counters=('flushes', 'flushed_entries', 'flush_errors')
+))
+
+# ===========================
+# Submission Queue
+# ===========================
+
+# With SUBMIT_QUEUE on, /api/submit only timestamps the submission and queues
+# it; a few worker threads score queued submissions in batches (one bulk UPDATE
+# per batch), so a room-wide "submit now" no longer needs a pooled connection
+# per request. The request waits up to SUBMIT_WAIT_MS for its score, otherwise
+# it answers 202 and the page polls /api/submit-status. The timestamp taken at
+# request time is what gets stored, so ranking ties still go to whoever
+# submitted first.
+SUBMIT_QUEUE = os.getenv('SUBMIT_QUEUE', 'false').lower() == 'true'
+SUBMIT_QUEUE_WORKERS = int(os.getenv('SUBMIT_QUEUE_WORKERS', '2'))
+SUBMIT_BATCH_SIZE = int(os.getenv('SUBMIT_BATCH_SIZE', '200'))
+SUBMIT_BATCH_WAIT_MS = float(os.getenv('SUBMIT_BATCH_WAIT_MS', '50'))
+SUBMIT_WAIT_MS = float(os.getenv('SUBMIT_WAIT_MS', '2000'))
+SUBMIT_MAX_ATTEMPTS = 3
+
+class Submission:
+    """A queued submission, ranked by when the request arrived"""
+    
+    def __init__(self, event_id, sso, location):
+        self.key = (event_id, sso, location)
+        self.event_id = event_id
+        self.sso = sso
+        self.location = location
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+        self.status = 'queued'    # then 'scored', 'skipped' (unknown or already submitted) or 'failed'
+        self.row = None           # updated participant row once scored
+        self.done = threading.Event()
+
+class SubmissionQueue:
+    """Queued submissions scored and persisted in batches by worker threads"""
+    
+    def __init__(self, workers, batch_size, batch_wait_ms):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000.0
+        
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = {}    # (event_id, sso, location) -> Submission
+        self._threads = []
+        
+        self._batches = 0
+        self._scored = 0
+        self._skipped = 0
+        self._failed = 0
+        self._batch_errors = 0
+        self._batch_seconds_sum = 0.0
+        self._batch_seconds_max = 0.0
+    
+    def submit(self, event_id, sso, location):
+        """Queue a participant's submission, or return the one already queued"""
+        with self._lock:
+            self._ensure_started()
+            job = self._pending.get((event_id, sso, location))
+            if job is None:
+                job = self._pending[(event_id, sso, location)] = Submission(event_id, sso, location)
+                self._queue.put(job)
+            return job
+    
+    def pending(self, event_id, sso, location):
+        """The participant's queued, not yet persisted submission (or None)"""
+        with self._lock:
+            return self._pending.get((event_id, sso, location))
+    
+    def wait_idle(self, timeout):
+        """Wait up to timeout seconds for every queued submission to be persisted; True if none is left"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+    
+    def _ensure_started(self):
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'submit-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def _next_batch(self):
+        """Block for one submission, then collect more for up to batch_wait"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0.001)))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            jobs = [job for job in batch if job is not None]
+            if jobs:
+                try:
+                    self.process(jobs)
+                except Exception as e:
+                    print(f"Submission batch failed: {e}")
+            if len(jobs) < len(batch):    # stop() sentinel
+                return
+    
+    def process(self, jobs):
+        """Score and persist a batch; a failed batch is requeued up to SUBMIT_MAX_ATTEMPTS times.
+        
+        A submission that can't be scored fails on its own; the rest of the batch is still written.
+        """
+        start = time.monotonic()
+        unscored = {}    # key -> scoring error
+        
+        def score(key, answers):
+            try:
+                return score_answers(answer_keys[key[2]], answers)
+            except Exception as e:
+                unscored[key] = e
+                return None
+        
+        try:
+            # Buffered answers must reach the database before they are scored
+            if ANSWER_WRITE_BEHIND:
+                answer_buffer.flush()
+            answer_keys = {location: get_question_set(location)['answer_key'] for location in {job.location for job in jobs}}
+            # The database stamps each submission with its own clock, backdated by the time spent queued
+            queued = time.monotonic()
+            rows = storage.submit_bulk({job.key: queued - job.queued_at for job in jobs}, score)
+        except Exception:
+            with self._lock:
+                self._batch_errors += 1
+            for job in jobs:
+                job.attempts += 1
+                if job.attempts < SUBMIT_MAX_ATTEMPTS:
+                    self._queue.put(job)
+                else:
+                    self._finish(job, 'failed')
+            time.sleep(0.5)
+            raise
+        
+        updated = {(row['event_id'], row['sso'], row['location']): row for row in rows}
+        live_event_id = live_event.id()
+        for job in jobs:
+            if job.key in unscored:
+                print(f"Could not score submission {job.sso}@{job.location}: {unscored[job.key]}")
+                self._finish(job, 'failed')
+                continue
+            row = updated.get(job.key)
+            # A submission for an event that has since ended doesn't belong on the live dashboards
+            if row and job.event_id == live_event_id:
+                event_bus.publish(job.location, 'participant', serialize_participant(row))
+            self._finish(job, 'scored' if row else 'skipped', row)
+        
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._batches += 1
+            self._batch_seconds_sum += elapsed
+            self._batch_seconds_max = max(self._batch_seconds_max, elapsed)
+    
+    def _finish(self, job, status, row=None):
+        job.status = status
+        job.row = row
+        with self._lock:
+            if self._pending.get(job.key) is job:
+                del self._pending[job.key]
+            if status == 'scored':
+                self._scored += 1
+            elif status == 'skipped':
+                self._skipped += 1
+            else:
+                self._failed += 1
+        job.done.set()
+    
+    def stop(self):
+        """Stop the workers and persist whatever is still queued"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=10)
+        jobs = []
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                jobs.append(job)
+        if jobs:
+            try:
+                self.process(jobs)
+            except Exception as e:
+                print(f"✗ Could not persist {len(jobs)} queued submissions on shutdown: {e}")
+    
+    def stats(self):
+        """Snapshot of queue depth and batch counters"""
+        with self._lock:
+            return {
+                'enabled': SUBMIT_QUEUE,
+                'pending': len(self._pending),
+                'batches': self._batches,
+                'scored': self._scored,
+                'skipped': self._skipped,
+                'failed': self._failed,
+                'batch_errors': self._batch_errors,
+                'batch_seconds_avg': self._batch_seconds_sum / self._batches if self._batches else 0.0,
+                'batch_seconds_max': self._batch_seconds_max
+            }
+
+submission_queue = SubmissionQueue(SUBMIT_QUEUE_WORKERS, SUBMIT_BATCH_SIZE, SUBMIT_BATCH_WAIT_MS)
+atexit.register(submission_queue.stop)
+metrics.add_collector(lambda: stat_samples(
+    'quiz_submit_queue', submission_queue.stats(), counters=('batches', 'scored', 'skipped', 'failed', 'batch_errors')
+))
+
+def submission_pending(event_id, sso, location):
+    """True while the participant's submission waits in this worker's queue (answers are frozen)"""
+    return SUBMIT_QUEUE and submission_queue.pending(event_id, sso, location) is not None
@@ -0,0 +1,86 @@
+"""Starting and archiving quiz events."""
+import gzip
+import os
+from datetime import datetime
+
+from quiz import PROJECT_DIR, queues
+from quiz.bus import event_bus
+from quiz.caches import live_event, quiz_status_cache
+from quiz.encoding import encode_json
+from quiz.queues import answer_buffer, submission_queue
+from quiz.storage import serialize_participant, storage
+
+# Participants and SSO registrations belong to a quiz event, so the same SSO
+# can take the quiz again at a later event. Every participant query names the
+# live event, which on Postgres prunes it to that event's partitions (and their
+# small indexes). Starting a new event ends the live one; a finished event can
+# then be archived to a gzipped NDJSON file in QUIZ_EVENT_ARCHIVE_DIR, after
+# which its partitions are detached (SQLite deletes its rows instead). The
+# live event id is cached and pushed to every worker like the quiz status map.
+# Buffered answers and queued submissions remember the event they were made
+# in, so the ones still in flight when an event ends are written to it.
+QUIZ_EVENT_ARCHIVE_DIR = os.getenv('QUIZ_EVENT_ARCHIVE_DIR', os.path.join(PROJECT_DIR, 'archives'))
+QUIZ_EVENT_DRAIN_SECONDS = 10    # how long starting an event waits for queued submissions
+
+def serialize_quiz_event(event):
+    """JSON-ready dict for a quiz_events row"""
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in event.items()
+    }
+
+def start_quiz_event(name):
+    """End the live event and start a new one; returns the new event.
+    
+    Raises ValueError if this worker's queued submissions aren't persisted in time.
+    """
+    # Persist what this worker still holds for the ending event first, so its
+    # results are complete once the switch is visible
+    if queues.ANSWER_WRITE_BEHIND:
+        answer_buffer.flush()
+    if queues.SUBMIT_QUEUE and not submission_queue.wait_idle(QUIZ_EVENT_DRAIN_SECONDS):
+        raise ValueError('Submissions are still being scored, please try again in a moment')
+    event = storage.start_quiz_event(name)
+    
+    live_event.set(event['id'])
+    event_bus.publish(None, 'live_event', {'id': event['id']})
+    # Dashboards and leaderboards start over
+    for location in quiz_status_cache.get_all():
+        event_bus.publish(location, 'reload')
+    return event
+
+def archive_quiz_event(event_id):
+    """Write a finished event's participants to a gzipped NDJSON file, then release them from the database.
+    
+    One JSON object per line, in location and ranking order. The file is
+    complete on disk before the database lets go of the rows.
+    """
+    event = storage.get_quiz_event(event_id)
+    if event is None:
+        raise LookupError(f"Unknown event {event_id}")
+    if event['ended_at'] is None:
+        raise ValueError('The live event can\'t be archived; start a new event first')
+    if event['archived_at'] is not None:
+        raise ValueError(f"Event {event_id} was already archived to {event['archive_file']}")
+    
+    os.makedirs(QUIZ_EVENT_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(QUIZ_EVENT_ARCHIVE_DIR, f"event_{event_id:04d}.ndjson.gz")
+    participants = 0
+    with open(path + '.tmp', 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9) as f:
+            for batch in storage.stream_event_participants(event_id):
+                for p in batch:
+                    record = {
+                        **serialize_participant(p, include_answers=True),
+                        'event_id': p['event_id'],
+                        'location': p['location'],
+                        'created_at': p['created_at'].isoformat() if p['created_at'] else None
+                    }
+                    f.write(encode_json(record) + b'\n')
+                    participants += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(path + '.tmp', path)
+    
+    storage.archive_quiz_event(event_id, path, participants)
+    return {'event_id': event_id, 'file': path, 'participants': participants, 'bytes': os.path.getsize(path)}
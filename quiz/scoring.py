@@ -0,0 +1,65 @@
+"""Compiled answer keys and scoring."""
+# Answer-key entry kinds
+SCORE_PER_OPTION = 'per_option'   # multiple choice: points for each correct option selected
+SCORE_EXACT_SET = 'exact_set'     # other list answers: full points for the exact same selection
+SCORE_EXACT = 'exact'             # single choice / true-false: direct comparison
+SCORE_TEXT = 'text'               # free text: comparison after normalizing case and whitespace
+
+def is_option(value):
+    """True for the values a list answer may hold: text and numbers"""
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+def valid_answer(answer):
+    """True for the answer shapes participants can send: a scalar, null or a list of options"""
+    if isinstance(answer, list):
+        return all(is_option(option) for option in answer)
+    return answer is None or isinstance(answer, (str, int, float))
+
+def option_order(option):
+    """Sort key that orders numbers before text instead of failing on a mixed list"""
+    return (isinstance(option, str), option)
+
+def normalize_text(value):
+    """Normalize a free-text answer so case and spacing differences still match"""
+    return ' '.join(str(value).split()).casefold()
+
+def compile_answer(question):
+    """Compile one question row into a (question_id, kind, expected, points) entry"""
+    question_id = str(question['id'])
+    correct_answer = question['correct_answer']
+    points = question['points']
+    
+    if isinstance(correct_answer, list):
+        if question['question_type'] == 'multiple':
+            return (question_id, SCORE_PER_OPTION, frozenset(correct_answer), points)
+        return (question_id, SCORE_EXACT_SET, tuple(sorted(correct_answer, key=option_order)), points)
+    if question['question_type'] == 'text' and isinstance(correct_answer, str):
+        return (question_id, SCORE_TEXT, normalize_text(correct_answer), points)
+    return (question_id, SCORE_EXACT, correct_answer, points)
+
+def score_answers(answer_key, answers):
+    """Score an answers dict against a compiled answer key (no database access).
+    
+    Answers of the wrong shape (e.g. objects inside a list) score nothing instead of raising.
+    """
+    total_score = 0
+    for question_id, kind, expected, points in answer_key:
+        user_answer = answers.get(question_id)
+        if user_answer is None:
+            continue
+        
+        if kind == SCORE_PER_OPTION:
+            # Award points for each correct option selected
+            if isinstance(user_answer, list):
+                total_score += len(expected.intersection(filter(is_option, user_answer))) * points
+        elif kind == SCORE_EXACT_SET:
+            if (isinstance(user_answer, list) and all(is_option(option) for option in user_answer)
+                    and tuple(sorted(user_answer, key=option_order)) == expected):
+                total_score += points
+        elif kind == SCORE_TEXT:
+            if isinstance(user_answer, str) and normalize_text(user_answer) == expected:
+                total_score += points
+        elif user_answer == expected:
+            total_score += points
+    
+    return total_score
@@ -0,0 +1,1133 @@
+"""PostgreSQL and SQLite storage backends and schema migrations."""
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import psycopg2
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+from quiz import PROJECT_DIR
+from quiz.db import (
+    PoolTimeout, QueryRegistry, db_transaction, execute_query, execute_values_query, get_db_pool, stream_query
+)
+from quiz.metrics import caller_label, metrics, record_query
+
+# Route handlers talk to `storage`, never to a driver directly. PostgreSQL is
+# the default; DATABASE_URL=sqlite:///path/to/quiz.db selects the embedded
+# SQLite backend for single-site events, local runs and benchmarks without a
+# database server. Rows come back as dicts with JSON columns decoded and
+# timestamps as datetimes on both backends.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+def participant_keyset_filter(cursor, placeholder='%s'):
+    """WHERE fragment and params continuing (score DESC, submitted_at ASC NULLS LAST, id ASC) after a cursor"""
+    score, submitted_at, participant_id = cursor
+    if submitted_at is None:
+        # NULL submitted_at sorts last within a score
+        sql = "(score < %s OR (score = %s AND submitted_at IS NULL AND id > %s))"
+        params = [score, score, participant_id]
+    else:
+        sql = (
+            "(score < %s OR (score = %s AND (submitted_at > %s OR submitted_at IS NULL "
+            "OR (submitted_at = %s AND id > %s))))"
+        )
+        params = [score, score, submitted_at, submitted_at, participant_id]
+    return sql.replace('%s', placeholder), params
+
+class PostgresStorage:
+    """PostgreSQL backend on the shared connection pool"""
+    
+    name = 'postgresql'
+    supports_notify = True
+    
+    # pg_advisory_xact_lock key serializing migration runs across processes
+    MIGRATION_LOCK_KEY = zlib.crc32(b'quiz_migrations')
+    
+    # Fixed statements by name. Those run via queries.execute()/queries.run()
+    # are prepared per connection; the VALUES %s bulk templates and the
+    # server-side cursor scan are sent as text.
+    queries = QueryRegistry({
+        'migration_lock': "SELECT pg_advisory_xact_lock(%(key)s)",
+        'create_schema_version': """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        'schema_versions': "SELECT version, name, applied_at FROM schema_version ORDER BY version",
+        'record_migration': "INSERT INTO schema_version (version, name) VALUES (%(version)s, %(name)s)",
+        'event_notify': "SELECT pg_notify(%(channel)s, %(payload)s)",
+        'check_admin': "SELECT * FROM admin_config WHERE username = %(username)s AND password = %(password)s",
+        'get_quiz_statuses': "SELECT location, is_open FROM quiz_status ORDER BY location",
+        'set_quiz_status': """
+        INSERT INTO quiz_status (location, is_open, updated_at) 
+        VALUES (%(location)s, %(is_open)s, CURRENT_TIMESTAMP)
+        ON CONFLICT (location) 
+        DO UPDATE SET is_open = %(is_open)s, updated_at = CURRENT_TIMESTAMP
+        """,
+        'get_questions': """
+        SELECT id, location, question_text, question_type, options, correct_answer, points
+        FROM questions 
+        WHERE location = %(location)s
+        ORDER BY location, id
+        """,
+        'get_all_questions': """
+        SELECT id, location, question_text, question_type, options, correct_answer, points
+        FROM questions 
+        ORDER BY location, id
+        """,
+        'add_question': """
+        INSERT INTO questions (location, question_text, question_type, options, correct_answer, points)
+        VALUES (%(location)s, %(question_text)s, %(question_type)s, %(options)s, %(correct_answer)s, %(points)s)
+        RETURNING id
+        """,
+        'update_question': """
+        UPDATE questions 
+        SET question_text = %(question_text)s, question_type = %(question_type)s, options = %(options)s,
+            correct_answer = %(correct_answer)s, points = %(points)s
+        WHERE id = %(id)s AND location = %(location)s
+        """,
+        'delete_question': "DELETE FROM questions WHERE id = %(id)s AND location = %(location)s",
+        'delete_location_questions': "DELETE FROM questions WHERE location = ANY(%(locations)s)",
+        'import_questions': "INSERT INTO questions (location, question_text, question_type, options, correct_answer, points) VALUES %s",
+        
+        'live_quiz_event': "SELECT id, name, started_at FROM quiz_events WHERE ended_at IS NULL",
+        'get_quiz_event': "SELECT * FROM quiz_events WHERE id = %(id)s",
+        'list_quiz_events': """
+        SELECT e.id, e.name, e.started_at, e.ended_at, e.archived_at, e.archive_file,
+               COALESCE(e.archived_participants, (SELECT COUNT(*) FROM participants p WHERE p.event_id = e.id)) AS participants
+        FROM quiz_events e
+        ORDER BY e.id DESC
+        """,
+        'end_quiz_event': "UPDATE quiz_events SET ended_at = CURRENT_TIMESTAMP WHERE ended_at IS NULL",
+        'start_quiz_event': "INSERT INTO quiz_events (name) VALUES (%(name)s) RETURNING id, name, started_at",
+        'archive_quiz_event': """
+        UPDATE quiz_events
+        SET archived_at = CURRENT_TIMESTAMP, archive_file = %(archive_file)s, archived_participants = %(participants)s
+        WHERE id = %(id)s
+        """,
+        
+        # Participant statements below always name the live event, so Postgres
+        # prunes them to that event's partitions.
+        
+        # Lookups, conflict checks and both inserts run as one statement, so the
+        # tracker and participant rows are created atomically in one round trip
+        'register': """
+        WITH existing AS (
+            SELECT sso, name, email, location
+            FROM sso_tracker
+            WHERE event_id = %(event_id)s AND (sso = %(sso)s OR email = %(email)s)
+        ),
+        tracker AS (
+            INSERT INTO sso_tracker (event_id, sso, name, email, location)
+            SELECT %(event_id)s, %(sso)s, %(name)s, %(email)s, %(location)s
+            WHERE NOT EXISTS (SELECT 1 FROM existing)
+            ON CONFLICT DO NOTHING
+            RETURNING location
+        ),
+        participant AS (
+            INSERT INTO participants (event_id, sso, name, email, location, answers, score)
+            SELECT %(event_id)s, %(sso)s, %(name)s, %(email)s, location, '{}'::jsonb, 0
+            FROM tracker
+            ON CONFLICT (event_id, sso, location) DO NOTHING
+        )
+        SELECT
+            CASE
+                WHEN EXISTS (SELECT 1 FROM tracker) THEN 'new'
+                WHEN EXISTS (
+                    SELECT 1 FROM existing
+                    WHERE sso = %(sso)s AND (email <> %(email)s OR name <> %(name)s)
+                ) THEN 'sso_conflict'
+                WHEN EXISTS (
+                    SELECT 1 FROM existing
+                    WHERE email = %(email)s AND (sso <> %(sso)s OR name <> %(name)s)
+                ) THEN 'email_conflict'
+                WHEN e.sso IS NULL THEN 'retry'
+                WHEN p.submitted_at IS NOT NULL THEN 'submitted'
+                ELSE 'resume'
+            END AS status,
+            e.location AS existing_location
+        FROM (SELECT 1) AS one
+        LEFT JOIN existing e ON e.sso = %(sso)s
+        LEFT JOIN participants p ON p.event_id = %(event_id)s AND p.sso = e.sso AND p.location = e.location
+        """,
+        'get_participant': """
+        SELECT * FROM participants
+        WHERE event_id = %(event_id)s AND sso = %(sso)s AND location = %(location)s
+        """,
+        
+        # Only the given keys are written, and the same round trip reports whether
+        # the participant is missing or has already submitted
+        'merge_answers': """
+        WITH updated AS (
+            UPDATE participants
+            SET answers = COALESCE(answers, '{}'::jsonb) || %(answers)s::jsonb
+            WHERE event_id = %(event_id)s AND sso = %(sso)s AND location = %(location)s AND submitted_at IS NULL
+            RETURNING 1
+        )
+        SELECT EXISTS (SELECT 1 FROM updated) AS saved,
+               EXISTS (
+                   SELECT 1 FROM participants
+                   WHERE event_id = %(event_id)s AND sso = %(sso)s AND location = %(location)s
+               ) AS registered
+        """,
+        
+        # Answer patches for many participants applied with one multi-row UPDATE.
+        # The VALUES %s templates carry the event in every row (execute_values
+        # allows no other parameter); pruning then happens at execution time.
+        'merge_answers_bulk': """
+        UPDATE participants AS p
+        SET answers = COALESCE(p.answers, '{}'::jsonb) || v.patch
+        FROM (VALUES %s) AS v(event_id, sso, location, patch)
+        WHERE p.event_id = v.event_id AND p.sso = v.sso AND p.location = v.location AND p.submitted_at IS NULL
+        """,
+        'submit': """
+        UPDATE participants 
+        SET score = %(score)s, submitted_at = CURRENT_TIMESTAMP 
+        WHERE event_id = %(event_id)s AND sso = %(sso)s AND location = %(location)s AND submitted_at IS NULL
+        RETURNING sso, name, email, score, submitted_at
+        """,
+        
+        # ASGI direct submits: lock and read one unsubmitted participant, then
+        # write the score with 'submit' in the same transaction
+        'submit_lock': """
+        SELECT answers FROM participants
+        WHERE event_id = %(event_id)s AND sso = %(sso)s AND location = %(location)s AND submitted_at IS NULL
+        FOR UPDATE
+        """,
+        
+        # Lock and read the batch's unsubmitted participants, then write every
+        # score stamped with the database's clock, less the seconds the
+        # submission spent queued (0 for direct submits)
+        'submit_bulk_answers': """
+        SELECT event_id, sso, location, answers
+        FROM participants
+        WHERE (event_id, sso, location) IN (VALUES %s) AND submitted_at IS NULL
+        FOR UPDATE
+        """,
+        'submit_bulk': """
+        UPDATE participants AS p
+        SET score = v.score, submitted_at = CURRENT_TIMESTAMP - make_interval(secs => v.queued_seconds)
+        FROM (VALUES %s) AS v(event_id, sso, location, score, queued_seconds)
+        WHERE p.event_id = v.event_id AND p.sso = v.sso AND p.location = v.location AND p.submitted_at IS NULL
+        RETURNING p.event_id, p.sso, p.location, p.name, p.email, p.score, p.submitted_at
+        """,
+        'delete_participant': """
+        DELETE FROM participants
+        WHERE event_id = %(event_id)s AND location = %(location)s AND sso = %(sso)s
+        """,
+        'delete_sso_tracker': "DELETE FROM sso_tracker WHERE event_id = %(event_id)s AND sso = %(sso)s",
+        'rescore_scan': """
+        SELECT id, answers, score FROM participants
+        WHERE event_id = %s AND location = %s AND submitted_at IS NOT NULL
+        """,
+        'rescore_update': """
+        UPDATE participants AS p SET score = v.score
+        FROM (VALUES %s) AS v(event_id, id, score)
+        WHERE p.event_id = v.event_id AND p.id = v.id
+        """,
+        
+        # Submitted answers grouped by (question, answer value) and scores grouped
+        # by value, returned as one JSON document
+        'answer_stats': """
+        SELECT json_build_object(
+            'answers', (
+                SELECT COALESCE(json_agg(t), '[]'::json)
+                FROM (
+                    SELECT a.key AS question_id, a.value AS answer, COUNT(*) AS responses
+                    FROM participants p, jsonb_each(p.answers) a
+                    WHERE p.event_id = %(event_id)s AND p.location = %(location)s AND p.submitted_at IS NOT NULL
+                    GROUP BY a.key, a.value
+                ) t
+            ),
+            'scores', (
+                SELECT COALESCE(json_agg(s ORDER BY s.score), '[]'::json)
+                FROM (
+                    SELECT score, COUNT(*) AS participants
+                    FROM participants
+                    WHERE event_id = %(event_id)s AND location = %(location)s AND submitted_at IS NOT NULL
+                    GROUP BY score
+                ) s
+            )
+        ) AS analytics
+        """
+    })
+    
+    @staticmethod
+    def participants_page_query(event_id, location, columns, cursor=None, limit=None):
+        """(query, params) for one page of an event's participants in ranking order after a keyset cursor"""
+        where = ["event_id = %s", "location = %s"]
+        params = [event_id, location]
+        if cursor:
+            sql, cursor_params = participant_keyset_filter(cursor)
+            where.append(sql)
+            params += cursor_params
+        
+        # answers as text: the response embeds it verbatim instead of decoding and re-encoding it
+        select = ['answers::text AS answers' if column == 'answers' else column for column in columns]
+        query = f"""
+        SELECT {', '.join(select)}
+        FROM participants 
+        WHERE {' AND '.join(where)}
+        ORDER BY score DESC, submitted_at ASC NULLS LAST, id ASC
+        {'LIMIT %s' if limit else ''}
+        """
+        if limit:
+            params.append(limit)
+        return query, params
+    
+    @staticmethod
+    def merge_status(result):
+        """'saved', 'not_registered' or 'submitted' from a merge_answers row"""
+        if not result['registered']:
+            return 'not_registered'
+        if not result['saved']:
+            return 'submitted'
+        return 'saved'
+    
+    def connect(self):
+        get_db_pool()
+    
+    def migrate(self, migrations):
+        """Apply the pending [(version, name, sql)] migrations; returns the versions applied.
+        
+        Everything runs in one transaction under an advisory lock, so concurrent
+        runs wait for each other and a failed migration leaves no trace.
+        """
+        applied = []
+        with db_transaction(label='migrate') as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                # Text, not prepared: schema_version may not exist yet
+                cur.execute(self.queries['migration_lock'].query, {'key': self.MIGRATION_LOCK_KEY})
+                cur.execute(self.queries['create_schema_version'].query)
+                cur.execute(self.queries['schema_versions'].query)
+                done = {row['version'] for row in cur.fetchall()}
+                for version, name, sql in migrations:
+                    if version in done:
+                        continue
+                    cur.execute(sql)
+                    cur.execute(self.queries['record_migration'].query, {'version': version, 'name': name})
+                    applied.append(version)
+        return applied
+    
+    def applied_migrations(self):
+        """[{version, name, applied_at}] from schema_version (empty before the first run)"""
+        with db_transaction(label='applied_migrations') as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("SELECT to_regclass('schema_version') IS NOT NULL AS present")
+                if not cur.fetchone()['present']:
+                    return []
+                cur.execute(self.queries['schema_versions'].query)
+                return cur.fetchall()
+    
+    def notify(self, channel, payload):
+        self.queries.execute('event_notify', {'channel': channel, 'payload': payload}, fetch=False)
+    
+    def open_listener(self, channel):
+        """Dedicated autocommit connection LISTENing on a channel (outside the pool)"""
+        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {channel}")
+        return conn
+    
+    def check_admin(self, username, password):
+        params = {'username': username, 'password': password}
+        return self.queries.execute('check_admin', params, fetch=True, fetchone=True) is not None
+    
+    def get_quiz_statuses(self):
+        rows = self.queries.execute('get_quiz_statuses', fetch=True)
+        return {row['location']: row['is_open'] for row in rows}
+    
+    def set_quiz_status(self, location, is_open):
+        self.queries.execute('set_quiz_status', {'location': location, 'is_open': is_open}, fetch=False)
+    
+    def get_questions(self, location=None):
+        """Question rows for a location (or every location), in creation order"""
+        if location:
+            return self.queries.execute('get_questions', {'location': location}, fetch=True)
+        return self.queries.execute('get_all_questions', fetch=True)
+    
+    @staticmethod
+    def question_params(location, question):
+        """Named parameters for add_question / update_question"""
+        return {
+            'location': location,
+            'question_text': question['question'],
+            'question_type': question['type'],
+            'options': Json(question.get('options')),
+            'correct_answer': Json(question['correct_answer']),
+            'points': question.get('points', 1)
+        }
+    
+    def add_question(self, location, question):
+        params = self.question_params(location, question)
+        return self.queries.execute('add_question', params, fetch=True, fetchone=True)['id']
+    
+    def update_question(self, location, question_id, question):
+        params = {**self.question_params(location, question), 'id': question_id}
+        self.queries.execute('update_question', params, fetch=False)
+    
+    def delete_question(self, location, question_id):
+        self.queries.execute('delete_question', {'id': question_id, 'location': location}, fetch=False)
+    
+    def import_questions(self, questions, replace_locations=None):
+        """Insert questions with a single multi-row INSERT, optionally clearing locations first"""
+        rows = [
+            (q['location'], q['question'], q['type'], Json(q.get('options')), Json(q['correct_answer']), int(q.get('points', 1)))
+            for q in questions
+        ]
+        with db_transaction(label='import_questions') as conn:
+            with conn.cursor() as cur:
+                if replace_locations:
+                    self.queries.run(conn, cur, 'delete_location_questions', {'locations': list(replace_locations)})
+                execute_values(
+                    cur,
+                    self.queries['import_questions'].query,
+                    rows,
+                    page_size=len(rows) or 1
+                )
+    
+    def live_quiz_event(self):
+        return self.queries.execute('live_quiz_event', fetch=True, fetchone=True)
+    
+    def live_event_id(self):
+        """Id of the live quiz event (quiz.caches replaces this with its cached lookup)"""
+        return self.live_quiz_event()['id']
+    
+    def get_quiz_event(self, event_id):
+        return self.queries.execute('get_quiz_event', {'id': event_id}, fetch=True, fetchone=True)
+    
+    def list_quiz_events(self):
+        return self.queries.execute('list_quiz_events', fetch=True)
+    
+    def start_quiz_event(self, name):
+        """End the live event and start a new one with its own partitions; returns the new event"""
+        with db_transaction(label='start_quiz_event') as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                self.queries.run(conn, cur, 'end_quiz_event')
+                self.queries.run(conn, cur, 'start_quiz_event', {'name': name})
+                event = cur.fetchone()
+                # Partition names can't be parameters; the id is the integer just inserted
+                for table in ('participants', 'sso_tracker'):
+                    cur.execute(f"CREATE TABLE {table}_e{int(event['id'])} PARTITION OF {table} FOR VALUES IN ({int(event['id'])})")
+        return event
+    
+    def stream_event_participants(self, event_id, batch_size=1000):
+        """Yield every participant row of an event, one batch at a time"""
+        query = """
+        SELECT id, event_id, location, sso, name, email, answers, score, submitted_at, created_at
+        FROM participants
+        WHERE event_id = %s
+        ORDER BY location, score DESC, submitted_at ASC NULLS LAST, id ASC
+        """
+        return stream_query(query, (event_id,), batch_size=batch_size, label='stream_event_participants')
+    
+    def archive_quiz_event(self, event_id, archive_file, participants):
+        """Detach an archived event's partitions (kept as participants_e<id> / sso_tracker_e<id>)"""
+        with db_transaction(label='archive_quiz_event') as conn:
+            with conn.cursor() as cur:
+                for table in ('participants', 'sso_tracker'):
+                    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {table}_e{int(event_id)}")
+                self.queries.run(conn, cur, 'archive_quiz_event', {
+                    'id': event_id, 'archive_file': archive_file, 'participants': participants
+                })
+    
+    def register(self, sso, name, email, location):
+        """Register a participant in the live event; returns (status, existing_location)"""
+        params = {'event_id': self.live_event_id(), 'sso': sso, 'name': name, 'email': email, 'location': location}
+        # 'retry' means a concurrent request inserted this SSO/email after our
+        # snapshot was taken; running again sees the committed row
+        for _ in range(3):
+            result = self.queries.execute('register', params, fetch=True, fetchone=True)
+            if result['status'] != 'retry':
+                break
+        return result['status'], result['existing_location']
+    
+    def get_participant(self, sso, location):
+        params = {'event_id': self.live_event_id(), 'sso': sso, 'location': location}
+        return self.queries.execute('get_participant', params, fetch=True, fetchone=True)
+    
+    def merge_answers(self, sso, location, answers):
+        """Merge {question_id: answer} into saved answers; returns 'saved', 'not_registered' or 'submitted'"""
+        result = self.queries.execute(
+            'merge_answers',
+            {'answers': Json(answers), 'event_id': self.live_event_id(), 'sso': sso, 'location': location},
+            fetch=True,
+            fetchone=True
+        )
+        return self.merge_status(result)
+    
+    def merge_answers_bulk(self, batch):
+        """Apply {(event_id, sso, location): answers} patches, skipping unknown and submitted participants"""
+        rows = [(event_id, sso, location, Json(answers)) for (event_id, sso, location), answers in batch.items()]
+        return execute_values_query(
+            self.queries['merge_answers_bulk'].query, rows, template='(%s, %s, %s, %s::jsonb)', label='merge_answers_bulk'
+        )
+    
+    def submit(self, sso, location, score):
+        """Store the final score and submission time; returns the updated row, or None if unknown or already submitted"""
+        params = {'score': score, 'event_id': self.live_event_id(), 'sso': sso, 'location': location}
+        return self.queries.execute('submit', params, fetch=True, fetchone=True)
+    
+    def submit_bulk(self, submissions, score_fn):
+        """Score and submit {(event_id, sso, location): queued_seconds} in one transaction; returns the updated rows.
+        
+        score_fn((event_id, sso, location), answers) gives each score; it runs
+        while the rows are locked, so it must not touch the database (resolve
+        answer keys first). A score of None leaves that participant unsubmitted.
+        submitted_at is the database's current time less queued_seconds (how
+        long the request waited in the submission queue; None or 0 for direct
+        submits). Unknown and already submitted participants are skipped.
+        """
+        with db_transaction(label='submit_bulk') as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                rows = execute_values(
+                    cur, self.queries['submit_bulk_answers'].query, list(submissions),
+                    page_size=len(submissions) or 1, fetch=True
+                )
+                scored = []
+                for row in rows:
+                    key = (row['event_id'], row['sso'], row['location'])
+                    score = score_fn(key, row['answers'] or {})
+                    if score is not None:
+                        scored.append((*key, score, submissions[key] or 0))
+                if not scored:
+                    return []
+                return execute_values(
+                    cur, self.queries['submit_bulk'].query, scored,
+                    template='(%s, %s, %s, %s, %s::float8)', page_size=len(scored), fetch=True
+                )
+    
+    def delete_participant(self, location, sso):
+        with db_transaction(label='delete_participant') as conn:
+            with conn.cursor() as cur:
+                params = {'event_id': self.live_event_id(), 'location': location, 'sso': sso}
+                self.queries.run(conn, cur, 'delete_participant', params)
+                self.queries.run(conn, cur, 'delete_sso_tracker', params)
+    
+    def list_participants(self, location, columns, cursor=None, limit=None):
+        """One page of participants in ranking order, continuing after a keyset cursor"""
+        query, params = self.participants_page_query(self.live_event_id(), location, columns, cursor, limit)
+        return execute_query(query, params, fetch=True)
+    
+    def stream_participants(self, location, include_answers=False, batch_size=1000):
+        """Yield a location's participants in ranking order, one batch at a time"""
+        query = f"""
+        SELECT sso, name, email, score, submitted_at{', answers' if include_answers else ''}
+        FROM participants 
+        WHERE event_id = %s AND location = %s
+        ORDER BY score DESC, submitted_at ASC NULLS LAST, id ASC
+        """
+        return stream_query(query, (self.live_event_id(), location), batch_size=batch_size, label='stream_participants')
+    
+    def rescore(self, location, score_fn, batch_size=2000):
+        """Re-apply score_fn(answers) to every submitted participant; returns (scanned, updated).
+        
+        Participants are streamed through a server-side cursor and only changed
+        scores are written back, in a single bulk UPDATE within the same transaction.
+        """
+        event_id = self.live_event_id()
+        scanned = 0
+        changed = []
+        with db_transaction(label='rescore') as conn:
+            with conn.cursor(name=f'rescore_{secrets.token_hex(4)}', cursor_factory=RealDictCursor) as cur:
+                cur.itersize = batch_size
+                cur.execute(self.queries['rescore_scan'].query, (event_id, location))
+                for row in cur:
+                    scanned += 1
+                    score = score_fn(row['answers'] or {})
+                    if score != row['score']:
+                        changed.append((event_id, row['id'], score))
+            
+            if changed:
+                with conn.cursor() as cur:
+                    execute_values(
+                        cur,
+                        self.queries['rescore_update'].query,
+                        changed,
+                        page_size=len(changed)
+                    )
+        return scanned, len(changed)
+    
+    def answer_stats(self, location):
+        """{'answers': [{question_id, answer, responses}], 'scores': [{score, participants}]} for submitted participants"""
+        params = {'event_id': self.live_event_id(), 'location': location}
+        return self.queries.execute('answer_stats', params, fetch=True, fetchone=True)['analytics']
+
+class SQLiteStorage:
+    """Embedded SQLite backend (WAL mode, JSON1) for a single server process.
+    
+    Each thread keeps its own connection. In WAL mode readers never wait for
+    the writer; write transactions start with BEGIN IMMEDIATE, so concurrent
+    writers queue on the busy timeout instead of failing mid-transaction.
+    There is no cross-process NOTIFY, so run one process (Waitress, or
+    gunicorn with a single threaded worker).
+    """
+    
+    name = 'sqlite'
+    supports_notify = False
+    
+    # Decoded from TEXT by the row factory
+    JSON_COLUMNS = frozenset(('answers', 'options', 'correct_answer'))
+    TIMESTAMP_COLUMNS = frozenset((
+        'submitted_at', 'created_at', 'updated_at', 'registered_at', 'started_at', 'ended_at', 'archived_at'
+    ))
+    
+    def __init__(self, path, busy_timeout_ms):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._busy_timeouts = 0
+    
+    @classmethod
+    def from_url(cls, database_url):
+        """sqlite:///relative/path.db or sqlite:////absolute/path.db"""
+        path = database_url[len('sqlite:///'):] if database_url.startswith('sqlite:///') else ''
+        if not path or path == ':memory:':
+            raise ValueError("SQLite DATABASE_URL must point to a file, e.g. sqlite:///quiz.db")
+        return cls(path, SQLITE_BUSY_TIMEOUT_MS)
+    
+    @classmethod
+    def _row(cls, cursor, values):
+        row = {}
+        for column, value in zip(cursor.description, values):
+            name = column[0]
+            if value is not None:
+                if name in cls.JSON_COLUMNS:
+                    value = json.loads(value)
+                elif name in cls.TIMESTAMP_COLUMNS:
+                    value = datetime.fromisoformat(value)
+            row[name] = value
+        return row
+    
+    @staticmethod
+    def _now(seconds_ago=None):
+        # Fixed-width text, so timestamps compare chronologically as strings
+        return (datetime.now() - timedelta(seconds=seconds_ago or 0)).isoformat(' ', timespec='microseconds')
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # sqlite3 keeps compiled statements per connection; size the cache
+            # so every distinct statement stays prepared
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout_ms / 1000.0, isolation_level=None, cached_statements=256
+            )
+            conn.row_factory = self._row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._lock:
+                self._opened += 1
+        return conn
+    
+    def _translate_error(self, e):
+        """Surface lock timeouts like an exhausted pool (503 + Retry-After)"""
+        if isinstance(e, sqlite3.OperationalError) and 'locked' in str(e):
+            with self._lock:
+                self._busy_timeouts += 1
+            return PoolTimeout(f"database is locked after {self.busy_timeout_ms / 1000.0:.1f}s")
+        return e
+    
+    def _execute(self, query, params=(), fetch=True, fetchone=False, label=None):
+        """Run one statement in autocommit mode, recording it like execute_query()"""
+        label = label or caller_label()
+        failed = False
+        rows = 0
+        start = time.perf_counter()
+        try:
+            cur = self._connection().execute(query, params)
+            if fetch:
+                # Always step to completion: a half-read INSERT ... RETURNING keeps its write open
+                result = cur.fetchall()
+                rows = len(result)
+                return (result[0] if result else None) if fetchone else result
+            rows = max(cur.rowcount, 0)
+            return None
+        except Exception as e:
+            failed = True
+            print(f"Database error: {e}")
+            raise self._translate_error(e) from e
+        finally:
+            record_query(label, query, start, start, rows, failed)
+    
+    @contextmanager
+    def _transaction(self, label):
+        """Write transaction; time spent waiting for the write lock is recorded as pool wait"""
+        conn = self._connection()
+        failed = False
+        start = time.perf_counter()
+        checked_out = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            checked_out = time.perf_counter()
+            yield conn
+            conn.execute("COMMIT")
+        except Exception as e:
+            failed = True
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"Database error: {e}")
+            raise self._translate_error(e) from e
+        finally:
+            record_query(label, label, start, checked_out, 0, failed)
+    
+    def connect(self):
+        self._connection()
+    
+    def metric_samples(self):
+        """Connections opened and lock timeouts for /metrics"""
+        with self._lock:
+            return [
+                ('quiz_sqlite_connections_opened_total', 'counter', (), self._opened),
+                ('quiz_sqlite_busy_timeouts_total', 'counter', (), self._busy_timeouts)
+            ]
+    
+    @staticmethod
+    def _statements(script):
+        """Split a SQL script into statements (executescript() would commit the open transaction)"""
+        statement = ''
+        for line in script.splitlines(keepends=True):
+            statement += line
+            if sqlite3.complete_statement(statement):
+                yield statement
+                statement = ''
+        if statement.strip():
+            yield statement
+    
+    def migrate(self, migrations):
+        # BEGIN IMMEDIATE takes the write lock, which serializes concurrent runs
+        applied = []
+        with self._transaction('migrate') as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+            )
+            """)
+            done = {row['version'] for row in conn.execute("SELECT version FROM schema_version").fetchall()}
+            for version, name, sql in migrations:
+                if version in done:
+                    continue
+                for statement in self._statements(sql):
+                    conn.execute(statement)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+                applied.append(version)
+        return applied
+    
+    def applied_migrations(self):
+        present = self._execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'", fetchone=True
+        )
+        if not present:
+            return []
+        return self._execute("SELECT version, name, applied_at FROM schema_version ORDER BY version")
+    
+    def check_admin(self, username, password):
+        query = "SELECT id FROM admin_config WHERE username = ? AND password = ?"
+        return self._execute(query, (username, password), fetchone=True) is not None
+    
+    def get_quiz_statuses(self):
+        rows = self._execute("SELECT location, is_open FROM quiz_status ORDER BY location")
+        return {row['location']: bool(row['is_open']) for row in rows}
+    
+    def set_quiz_status(self, location, is_open):
+        query = """
+        INSERT INTO quiz_status (location, is_open, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT (location)
+        DO UPDATE SET is_open = excluded.is_open, updated_at = excluded.updated_at
+        """
+        self._execute(query, (location, bool(is_open), self._now()), fetch=False)
+    
+    def get_questions(self, location=None):
+        query = f"""
+        SELECT id, location, question_text, question_type, options, correct_answer, points
+        FROM questions
+        {'WHERE location = ?' if location else ''}
+        ORDER BY location, id
+        """
+        return self._execute(query, (location,) if location else ())
+    
+    @staticmethod
+    def _question_params(question):
+        return (
+            question['question'],
+            question['type'],
+            json.dumps(question.get('options')),
+            json.dumps(question['correct_answer']),
+            question.get('points', 1)
+        )
+    
+    def add_question(self, location, question):
+        query = """
+        INSERT INTO questions (question_text, question_type, options, correct_answer, points, location)
+        VALUES (?, ?, ?, ?, ?, ?)
+        RETURNING id
+        """
+        return self._execute(query, self._question_params(question) + (location,), fetchone=True)['id']
+    
+    def update_question(self, location, question_id, question):
+        query = """
+        UPDATE questions
+        SET question_text = ?, question_type = ?, options = ?, correct_answer = ?, points = ?
+        WHERE id = ? AND location = ?
+        """
+        self._execute(query, self._question_params(question) + (question_id, location), fetch=False)
+    
+    def delete_question(self, location, question_id):
+        self._execute("DELETE FROM questions WHERE id = ? AND location = ?", (question_id, location), fetch=False)
+    
+    def import_questions(self, questions, replace_locations=None):
+        rows = [
+            self._question_params({**q, 'points': int(q.get('points', 1))}) + (q['location'],)
+            for q in questions
+        ]
+        with self._transaction('import_questions') as conn:
+            if replace_locations:
+                conn.executemany("DELETE FROM questions WHERE location = ?", [(location,) for location in replace_locations])
+            conn.executemany(
+                "INSERT INTO questions (question_text, question_type, options, correct_answer, points, location) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def live_quiz_event(self):
+        return self._execute("SELECT id, name, started_at FROM quiz_events WHERE ended_at IS NULL", fetchone=True)
+    
+    def live_event_id(self):
+        """Id of the live quiz event (quiz.caches replaces this with its cached lookup)"""
+        return self.live_quiz_event()['id']
+    
+    def get_quiz_event(self, event_id):
+        return self._execute("SELECT * FROM quiz_events WHERE id = ?", (event_id,), fetchone=True)
+    
+    def list_quiz_events(self):
+        query = """
+        SELECT e.id, e.name, e.started_at, e.ended_at, e.archived_at, e.archive_file,
+               COALESCE(e.archived_participants, (SELECT COUNT(*) FROM participants p WHERE p.event_id = e.id)) AS participants
+        FROM quiz_events e
+        ORDER BY e.id DESC
+        """
+        return self._execute(query)
+    
+    def start_quiz_event(self, name):
+        with self._transaction('start_quiz_event') as conn:
+            now = self._now()
+            conn.execute("UPDATE quiz_events SET ended_at = ? WHERE ended_at IS NULL", (now,))
+            return conn.execute(
+                "INSERT INTO quiz_events (name, started_at) VALUES (?, ?) RETURNING id, name, started_at", (name, now)
+            ).fetchall()[0]
+    
+    def stream_event_participants(self, event_id, batch_size=1000):
+        query = """
+        SELECT id, event_id, location, sso, name, email, answers, score, submitted_at, created_at
+        FROM participants
+        WHERE event_id = ?
+        ORDER BY location, score DESC, submitted_at ASC NULLS LAST, id ASC
+        """
+        cur = self._connection().execute(query, (event_id,))
+        return iter(lambda: cur.fetchmany(batch_size), [])
+    
+    def archive_quiz_event(self, event_id, archive_file, participants):
+        """No partitions to detach: the archived event's rows are deleted"""
+        with self._transaction('archive_quiz_event') as conn:
+            conn.execute("DELETE FROM participants WHERE event_id = ?", (event_id,))
+            conn.execute("DELETE FROM sso_tracker WHERE event_id = ?", (event_id,))
+            conn.execute(
+                "UPDATE quiz_events SET archived_at = ?, archive_file = ?, archived_participants = ? WHERE id = ?",
+                (self._now(), archive_file, participants, event_id)
+            )
+    
+    def register(self, sso, name, email, location):
+        """Same outcomes as the Postgres statement; the write lock makes check-then-insert safe"""
+        event_id = self.live_event_id()
+        with self._transaction('register') as conn:
+            existing = conn.execute(
+                "SELECT sso, name, email, location FROM sso_tracker WHERE event_id = ? AND (sso = ? OR email = ?)",
+                (event_id, sso, email)
+            ).fetchall()
+            if not existing:
+                conn.execute(
+                    "INSERT INTO sso_tracker (event_id, sso, name, email, location, registered_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (event_id, sso, name, email, location, self._now())
+                )
+                conn.execute(
+                    "INSERT INTO participants (event_id, sso, name, email, location, answers, score) "
+                    "VALUES (?, ?, ?, ?, ?, '{}', 0) ON CONFLICT (event_id, sso, location) DO NOTHING",
+                    (event_id, sso, name, email, location)
+                )
+                return 'new', None
+            
+            if any(e['sso'] == sso and (e['email'] != email or e['name'] != name) for e in existing):
+                return 'sso_conflict', None
+            if any(e['email'] == email and (e['sso'] != sso or e['name'] != name) for e in existing):
+                return 'email_conflict', None
+            
+            own = next((e for e in existing if e['sso'] == sso), None)
+            if own is None:
+                return 'retry', None
+            participant = conn.execute(
+                "SELECT submitted_at FROM participants WHERE event_id = ? AND sso = ? AND location = ?",
+                (event_id, sso, own['location'])
+            ).fetchone()
+            if participant and participant['submitted_at']:
+                return 'submitted', own['location']
+            return 'resume', own['location']
+    
+    def get_participant(self, sso, location):
+        query = "SELECT * FROM participants WHERE event_id = ? AND sso = ? AND location = ?"
+        return self._execute(query, (self.live_event_id(), sso, location), fetchone=True)
+    
+    def merge_answers(self, sso, location, answers):
+        event_id = self.live_event_id()
+        with self._transaction('merge_answers') as conn:
+            row = conn.execute(
+                "SELECT id, answers, submitted_at FROM participants WHERE event_id = ? AND sso = ? AND location = ?",
+                (event_id, sso, location)
+            ).fetchone()
+            if row is None:
+                return 'not_registered'
+            if row['submitted_at']:
+                return 'submitted'
+            conn.execute(
+                "UPDATE participants SET answers = ? WHERE id = ?",
+                (json.dumps({**(row['answers'] or {}), **answers}), row['id'])
+            )
+            return 'saved'
+    
+    def merge_answers_bulk(self, batch):
+        updated = 0
+        with self._transaction('merge_answers_bulk') as conn:
+            for (event_id, sso, location), answers in batch.items():
+                row = conn.execute(
+                    "SELECT id, answers FROM participants "
+                    "WHERE event_id = ? AND sso = ? AND location = ? AND submitted_at IS NULL",
+                    (event_id, sso, location)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE participants SET answers = ? WHERE id = ?",
+                        (json.dumps({**(row['answers'] or {}), **answers}), row['id'])
+                    )
+                    updated += 1
+        return updated
+    
+    def submit(self, sso, location, score):
+        query = """
+        UPDATE participants
+        SET score = ?, submitted_at = ?
+        WHERE event_id = ? AND sso = ? AND location = ? AND submitted_at IS NULL
+        RETURNING sso, name, email, score, submitted_at
+        """
+        with self._transaction('submit') as conn:
+            rows = conn.execute(query, (score, self._now(), self.live_event_id(), sso, location)).fetchall()
+            return rows[0] if rows else None
+    
+    def submit_bulk(self, submissions, score_fn):
+        updated = []
+        with self._transaction('submit_bulk') as conn:
+            for key, queued_seconds in submissions.items():
+                rows = conn.execute(
+                    "SELECT id, answers FROM participants "
+                    "WHERE event_id = ? AND sso = ? AND location = ? AND submitted_at IS NULL",
+                    key
+                ).fetchall()
+                if not rows:
+                    continue
+                score = score_fn(key, rows[0]['answers'] or {})
+                if score is None:
+                    continue
+                updated += conn.execute(
+                    """
+                    UPDATE participants
+                    SET score = ?, submitted_at = ?
+                    WHERE id = ?
+                    RETURNING event_id, sso, location, name, email, score, submitted_at
+                    """,
+                    (score, self._now(queued_seconds), rows[0]['id'])
+                ).fetchall()
+        return updated
+    
+    def delete_participant(self, location, sso):
+        event_id = self.live_event_id()
+        with self._transaction('delete_participant') as conn:
+            conn.execute("DELETE FROM participants WHERE event_id = ? AND location = ? AND sso = ?", (event_id, location, sso))
+            conn.execute("DELETE FROM sso_tracker WHERE event_id = ? AND sso = ?", (event_id, sso))
+    
+    def list_participants(self, location, columns, cursor=None, limit=None):
+        where = ["event_id = ?", "location = ?"]
+        params = [self.live_event_id(), location]
+        if cursor:
+            score, submitted_at, participant_id = cursor
+            if submitted_at is not None:
+                # Cursor timestamps are ISO strings; compare in the stored text format
+                submitted_at = datetime.fromisoformat(submitted_at).isoformat(' ', timespec='microseconds')
+            sql, cursor_params = participant_keyset_filter((score, submitted_at, participant_id), '?')
+            where.append(sql)
+            params += cursor_params
+        
+        query = f"""
+        SELECT {', '.join(columns)}
+        FROM participants
+        WHERE {' AND '.join(where)}
+        ORDER BY score DESC, submitted_at ASC NULLS LAST, id ASC
+        {'LIMIT ?' if limit else ''}
+        """
+        if limit:
+            params.append(limit)
+        return self._execute(query, params)
+    
+    def stream_participants(self, location, include_answers=False, batch_size=1000):
+        query = f"""
+        SELECT sso, name, email, score, submitted_at{', answers' if include_answers else ''}
+        FROM participants
+        WHERE event_id = ? AND location = ?
+        ORDER BY score DESC, submitted_at ASC NULLS LAST, id ASC
+        """
+        failed = False
+        rows = 0
+        start = time.perf_counter()
+        try:
+            cur = self._connection().execute(query, (self.live_event_id(), location))
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                rows += len(batch)
+                yield batch
+        except Exception as e:
+            failed = True
+            print(f"Database error: {e}")
+            raise
+        finally:
+            record_query('stream_participants', query, start, start, rows, failed)
+    
+    def rescore(self, location, score_fn, batch_size=2000):
+        scanned = 0
+        changed = []
+        with self._transaction('rescore') as conn:
+            cur = conn.execute(
+                "SELECT id, answers, score FROM participants WHERE event_id = ? AND location = ? AND submitted_at IS NOT NULL",
+                (self.live_event_id(), location)
+            )
+            for batch in iter(lambda: cur.fetchmany(batch_size), []):
+                for row in batch:
+                    scanned += 1
+                    score = score_fn(row['answers'] or {})
+                    if score != row['score']:
+                        changed.append((score, row['id']))
+            if changed:
+                conn.executemany("UPDATE participants SET score = ? WHERE id = ?", changed)
+        return scanned, len(changed)
+    
+    def answer_stats(self, location):
+        event_id = self.live_event_id()
+        # json_each reports arrays/objects as JSON text and scalars as SQL values
+        answers = self._execute(
+            """
+            SELECT a.key AS question_id, a.type AS kind, a.value AS value, COUNT(*) AS responses
+            FROM participants p, json_each(p.answers) a
+            WHERE p.event_id = ? AND p.location = ? AND p.submitted_at IS NOT NULL
+            GROUP BY a.key, a.type, a.value
+            """,
+            (event_id, location),
+            label='answer_stats'
+        )
+        scores = self._execute(
+            """
+            SELECT score, COUNT(*) AS participants
+            FROM participants
+            WHERE event_id = ? AND location = ? AND submitted_at IS NOT NULL
+            GROUP BY score
+            ORDER BY score
+            """,
+            (event_id, location),
+            label='answer_stats'
+        )
+        decoded = {'true': True, 'false': False, 'null': None}
+        return {
+            'answers': [{
+                'question_id': row['question_id'],
+                'answer': (json.loads(row['value']) if row['kind'] in ('array', 'object')
+                           else decoded.get(row['kind'], row['value'])),
+                'responses': row['responses']
+            } for row in answers],
+            'scores': scores
+        }
+
+def create_storage(database_url):
+    """Pick the backend from the DATABASE_URL scheme"""
+    if database_url and database_url.startswith('sqlite:'):
+        return SQLiteStorage.from_url(database_url)
+    return PostgresStorage()
+
+storage = create_storage(os.getenv('DATABASE_URL'))
+if storage.name == 'sqlite':
+    metrics.add_collector(storage.metric_samples)
+
+# ===========================
+# Schema Migrations
+# ===========================
+
+# Ordered migrations per backend live in migrations/<backend>/NNNN_name.sql and
+# are recorded in the schema_version table. They run from `python migrate.py`
+# (e.g. once per deploy, before the workers start) or from `python app.py`,
+# never when a worker imports the app, so a worker's startup needs no database
+# round trips.
+MIGRATIONS_DIR = os.path.join(PROJECT_DIR, 'migrations')
+_MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+def load_migrations(backend):
+    """[(version, name, sql)] for a backend, in version order"""
+    directory = os.path.join(MIGRATIONS_DIR, backend)
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), 'r') as f:
+            migrations.append((int(match.group(1)), match.group(2), f.read()))
+    migrations.sort()
+    
+    versions = [version for version, _, _ in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"duplicate migration versions in {directory}")
+    return migrations
+
+def migrate_database():
+    """Apply pending migrations to the configured database; returns the versions applied"""
+    applied = storage.migrate(load_migrations(storage.name))
+    if applied:
+        print(f"✓ Applied migrations: {', '.join(f'{version:04d}' for version in applied)}")
+    else:
+        print("✓ Database schema up to date")
+    return applied
+
+def serialize_participant(p, include_answers=False):
+    """JSON-ready dict for a participant row"""
+    result = {
+        'sso': p['sso'],
+        'name': p['name'],
+        'email': p['email'],
+        'score': p['score'],
+        'submitted_at': p['submitted_at'].isoformat() if p['submitted_at'] else None
+    }
+    if include_answers:
+        result['answers'] = p['answers']
+    return result
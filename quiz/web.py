@@ -0,0 +1,160 @@
+"""The Flask app: compression, request metrics, /metrics, static assets and pages."""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import secrets
+import time
+
+from flask import Flask, Response, g, jsonify, render_template, request, send_from_directory
+from flask_cors import CORS
+
+from quiz import PROJECT_DIR
+from quiz.db import PoolTimeout
+from quiz.encoding import FastJSONProvider
+from quiz.metrics import METRICS_TOKEN, metrics
+
+# Buffered responses of GZIP_MIN_BYTES or more are gzipped (0 disables).
+GZIP_MIN_BYTES = int(os.getenv('GZIP_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+GZIP_MIMETYPES = frozenset((
+    'application/json', 'application/x-ndjson', 'text/html', 'text/plain', 'text/csv', 'text/css', 'text/javascript'
+))
+
+app = Flask(__name__, root_path=PROJECT_DIR)
+app.json = FastJSONProvider(app)
+app.secret_key = os.getenv('SECRET_KEY', secrets.token_hex(32))
+CORS(app)
+
+@app.after_request
+def compress_response(response):
+    """gzip sizeable buffered responses for clients that accept it"""
+    if (not GZIP_MIN_BYTES
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in GZIP_MIMETYPES
+            or request.accept_encodings.quality('gzip') <= 0):
+        return response
+    
+    data = response.get_data()
+    if len(data) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    # Streamed responses (SSE, exports) are timed until the first byte only
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    labels = (('route', route), ('method', request.method))
+    metrics.inc('quiz_http_requests_total', labels + (('status', str(response.status_code)),))
+    metrics.observe('quiz_http_request_duration_seconds', time.perf_counter() - started, labels)
+    metrics.observe('quiz_http_request_db_seconds', g.get('db_seconds', 0.0), labels)
+    metrics.observe('quiz_http_request_pool_wait_seconds', g.get('pool_wait_seconds', 0.0), labels)
+    if response.status_code >= 500:
+        metrics.inc('quiz_http_errors_total', labels)
+    return response
+
+@app.errorhandler(PoolTimeout)
+def handle_pool_timeout(e):
+    print(f"Database pool exhausted: {e}")
+    response = jsonify({'success': False, 'message': 'Server is busy, please try again in a moment'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint (set METRICS_TOKEN to require a bearer token)"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    
+    return Response(metrics.render((('pid', str(os.getpid())),)), mimetype='text/plain; version=0.0.4')
+
+# ===========================
+# Static Assets
+# ===========================
+
+# build_assets.py writes fingerprinted, minified copies of the CSS/JS (plus .gz
+# and .br variants) to static/dist with a manifest. Templates link assets with
+# asset(), so browsers cache the fingerprinted files for a year and only ask
+# again when the content (and with it the URL) changes. Assets edited after
+# the last build fall back to the plain /static files.
+STATIC_DIST_DIR = os.path.join(app.static_folder, 'dist')
+STATIC_DIST_MAX_AGE = 365 * 24 * 3600
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+def load_asset_manifest():
+    """static path -> fingerprinted dist path, for assets unchanged since the build"""
+    try:
+        with open(os.path.join(STATIC_DIST_DIR, 'manifest.json'), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    assets = {}
+    for path, entry in manifest.items():
+        try:
+            with open(os.path.join(app.static_folder, path), 'rb') as f:
+                current = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            continue
+        if current == entry['source_sha256']:
+            assets[path] = entry['file']
+        else:
+            print(f"⚠ static/{path} changed since build_assets.py ran - serving it unbuilt")
+    return assets
+
+_asset_manifest = load_asset_manifest()
+
+def asset_url(path):
+    """URL of a static asset, fingerprinted when it has been built"""
+    built = _asset_manifest.get(path)
+    return f"/static/dist/{built}" if built else f"/static/{path}"
+
+@app.context_processor
+def template_helpers():
+    return {'asset': asset_url}
+
+@app.route('/static/dist/<path:filename>')
+def built_asset(filename):
+    """Fingerprinted asset, precompressed per Accept-Encoding and cacheable forever"""
+    served = filename
+    encoding = None
+    for name, suffix in STATIC_ENCODINGS:
+        if request.accept_encodings.quality(name) > 0 and os.path.isfile(os.path.join(STATIC_DIST_DIR, filename + suffix)):
+            served, encoding = filename + suffix, name
+            break
+    
+    response = send_from_directory(
+        STATIC_DIST_DIR, served, mimetype=mimetypes.guess_type(filename)[0], max_age=STATIC_DIST_MAX_AGE
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = f'public, max-age={STATIC_DIST_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+@app.route('/admin')
+def admin():
+    return render_template('admin.html')
+
+@app.route('/participant')
+def participant():
+    return render_template('participant.html')
@@ -57,6 +57,7 @@ document.getElementById('logout-btn').addEventListener('click', async () => {
     try {
         await fetch('/api/admin/logout', { method: 'POST' });
         adminLoggedIn = false;
+        disconnectParticipantEvents();
         showScreen('login-screen');
     } catch (error) {
         console.error('Logout error:', error);
@@ -75,6 +76,16 @@ function showDashboard() {
     showScreen('dashboard-screen');
 }
 
+// Escape text from participants (names, free-text answers) before it goes into innerHTML
+function escapeHtml(value) {
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
 // Tab Management
 document.querySelectorAll('.tab-btn').forEach(btn => {
     btn.addEventListener('click', () => {
@@ -89,16 +100,32 @@ document.querySelectorAll('.tab-btn').forEach(btn => {
         document.getElementById(tabName + '-tab').classList.add('active');
         
         // Load data for the tab
+        if (tabName !== 'participants') {
+            disconnectParticipantEvents();
+        }
         if (tabName === 'participants') {
             loadParticipants();
         } else if (tabName === 'questions') {
             loadQuestions();
+        } else if (tabName === 'analytics') {
+            loadAnalytics();
         } else if (tabName === 'quiz-control') {
             loadQuizStatus();
+            loadQuizEvents();
         }
     });
 });
 
+// The dashboard table doesn't show answers, so don't download them
+const PARTICIPANT_LIST_FIELDS = 'sso,name,email,score,submitted_at';
+
+// Participants state, kept in sync by the live event stream when available
+let participantsData = [];
+let participantEvents = null;
+let participantEventsLocation = null;
+let participantEventsOpened = false;
+let liveUpdates = false;
+
 // Load Participants
 async function loadParticipants() {
     const tbody = document.getElementById('participants-tbody');
@@ -106,49 +133,133 @@ async function loadParticipants() {
     currentLocation = location;
     
     try {
-        const response = await fetch(`/api/admin/participants/${location}`);
-        const participants = await response.json();
-        
-        if (participants.length === 0) {
-            tbody.innerHTML = '<tr><td colspan="7" class="no-data">No participants yet</td></tr>';
-            return;
-        }
-        
-        // Sort by score (desc) then by submitted_at (asc)
-        participants.sort((a, b) => {
-            if (b.score !== a.score) {
-                return b.score - a.score;
-            }
-            if (a.submitted_at && b.submitted_at) {
-                return new Date(a.submitted_at) - new Date(b.submitted_at);
-            }
-            return 0;
-        });
-        
-        tbody.innerHTML = participants.map((p, index) => {
-            const submittedAt = p.submitted_at ? new Date(p.submitted_at).toLocaleString() : 'In Progress';
-            const rank = p.submitted_at ? index + 1 : '-';
-            
-            return `
-                <tr>
-                    <td>${rank}</td>
-                    <td>${p.sso}</td>
-                    <td>${p.name}</td>
-                    <td>${p.email}</td>
-                    <td><strong>${p.score}</strong></td>
-                    <td class="hide-mobile">${submittedAt}</td>
-                    <td>
-                        <button class="btn-delete" onclick="deleteParticipant('${p.sso}')" title="Delete">
-                            🗑️
-                        </button>
-                    </td>
-                </tr>
-            `;
-        }).join('');
+        const response = await fetch(`/api/admin/participants/${location}?fields=${PARTICIPANT_LIST_FIELDS}`);
+        participantsData = await response.json();
+        renderParticipants();
     } catch (error) {
         tbody.innerHTML = '<tr><td colspan="7" class="error">Error loading participants</td></tr>';
         console.error(error);
     }
+    
+    connectParticipantEvents(location);
+}
+
+// Render Participants
+function renderParticipants() {
+    const tbody = document.getElementById('participants-tbody');
+    const participants = participantsData;
+    
+    if (participants.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="7" class="no-data">No participants yet</td></tr>';
+        return;
+    }
+    
+    // Sort by score (desc) then by submitted_at (asc)
+    participants.sort((a, b) => {
+        if (b.score !== a.score) {
+            return b.score - a.score;
+        }
+        if (a.submitted_at && b.submitted_at) {
+            return new Date(a.submitted_at) - new Date(b.submitted_at);
+        }
+        return 0;
+    });
+    
+    tbody.innerHTML = participants.map((p, index) => {
+        const submittedAt = p.submitted_at ? new Date(p.submitted_at).toLocaleString() : 'In Progress';
+        const rank = p.submitted_at ? index + 1 : '-';
+        
+        return `
+            <tr>
+                <td>${rank}</td>
+                <td>${escapeHtml(p.sso)}</td>
+                <td>${escapeHtml(p.name)}</td>
+                <td>${escapeHtml(p.email)}</td>
+                <td><strong>${p.score}</strong></td>
+                <td class="hide-mobile">${submittedAt}</td>
+                <td>
+                    <button class="btn-delete" onclick="deleteParticipant('${p.sso}')" title="Delete">
+                        🗑️
+                    </button>
+                </td>
+            </tr>
+        `;
+    }).join('');
+}
+
+// Live Participant Updates (Server-Sent Events)
+// Applies registration/submission/deletion deltas pushed by the server; the
+// 5 second polling below only runs while the stream is unavailable.
+function connectParticipantEvents(location) {
+    if (!window.EventSource) {
+        return;
+    }
+    if (participantEvents && participantEventsLocation === location) {
+        return;
+    }
+    disconnectParticipantEvents();
+    
+    participantEvents = new EventSource(`/api/admin/events/${location}`);
+    participantEventsLocation = location;
+    
+    participantEvents.onopen = () => {
+        liveUpdates = true;
+        // After a reconnect, catch up on anything missed while disconnected
+        if (participantEventsOpened) {
+            refreshParticipantsData();
+        }
+        participantEventsOpened = true;
+    };
+    
+    participantEvents.addEventListener('participant', (e) => {
+        const update = JSON.parse(e.data);
+        const index = participantsData.findIndex(p => p.sso === update.sso);
+        if (index >= 0) {
+            participantsData[index] = Object.assign(participantsData[index], update);
+        } else {
+            participantsData.push(update);
+        }
+        renderParticipants();
+    });
+    
+    participantEvents.addEventListener('deleted', (e) => {
+        const { sso } = JSON.parse(e.data);
+        participantsData = participantsData.filter(p => p.sso !== sso);
+        renderParticipants();
+    });
+    
+    participantEvents.addEventListener('reload', () => {
+        refreshParticipantsData();
+    });
+    
+    participantEvents.onerror = () => {
+        liveUpdates = false;
+        // CLOSED means the browser gave up (e.g. server refused the stream): poll instead
+        if (participantEvents && participantEvents.readyState === EventSource.CLOSED) {
+            participantEvents = null;
+            participantEventsLocation = null;
+        }
+    };
+}
+
+function disconnectParticipantEvents() {
+    if (participantEvents) {
+        participantEvents.close();
+    }
+    participantEvents = null;
+    participantEventsLocation = null;
+    participantEventsOpened = false;
+    liveUpdates = false;
+}
+
+async function refreshParticipantsData() {
+    try {
+        const response = await fetch(`/api/admin/participants/${currentLocation}?fields=${PARTICIPANT_LIST_FIELDS}`);
+        participantsData = await response.json();
+        renderParticipants();
+    } catch (error) {
+        console.error('Error refreshing participants:', error);
+    }
 }
 
 // Delete Participant
@@ -184,16 +295,24 @@ document.getElementById('refresh-participants-btn').addEventListener('click', ()
     loadParticipants();
 });
 
+// Export Results Button (streamed download, so it works for any number of participants)
+document.getElementById('export-participants-btn').addEventListener('click', () => {
+    const location = document.getElementById('location-filter').value;
+    window.location.href = `/api/admin/export/${location}?format=csv&answers=1`;
+});
+
 document.getElementById('questions-location-filter').addEventListener('change', loadQuestions);
 
 // Refresh Quiz Status Button
 document.getElementById('refresh-quiz-status-btn').addEventListener('click', () => {
     loadQuizStatus();
+    loadQuizEvents();
 });
 
-// Auto-refresh participants every 5 seconds when on participants tab
+// Auto-refresh participants every 5 seconds when on participants tab,
+// unless the live event stream is delivering updates
 setInterval(() => {
-    if (adminLoggedIn && document.getElementById('participants-tab').classList.contains('active')) {
+    if (adminLoggedIn && !liveUpdates && document.getElementById('participants-tab').classList.contains('active')) {
         loadParticipants();
     }
 }, 5000);
@@ -537,6 +656,118 @@ async function deleteQuestion(questionId, location) {
     }
 }
 
+// Question Bank Export / Import
+document.getElementById('export-questions-btn').addEventListener('click', () => {
+    const location = document.getElementById('questions-location-filter').value;
+    window.location.href = `/api/admin/question-bank?location=${location}&format=json`;
+});
+
+document.getElementById('import-questions-btn').addEventListener('click', () => {
+    document.getElementById('import-questions-file').click();
+});
+
+document.getElementById('import-questions-file').addEventListener('change', async (e) => {
+    const file = e.target.files[0];
+    e.target.value = '';
+    if (!file) {
+        return;
+    }
+    
+    const location = document.getElementById('questions-location-filter').value;
+    const replace = confirm('Replace the existing questions of every location in this file?\n\nOK = replace, Cancel = add alongside existing questions');
+    const isCsv = file.name.toLowerCase().endsWith('.csv');
+    
+    try {
+        const response = await fetch(`/api/admin/question-bank?location=${location}&mode=${replace ? 'replace' : 'append'}`, {
+            method: 'POST',
+            headers: { 'Content-Type': isCsv ? 'text/csv' : 'application/json' },
+            body: await file.text()
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            const summary = Object.entries(data.imported).map(([loc, count]) => `${loc}: ${count}`).join(', ');
+            alert(`Imported questions (${summary})`);
+            loadQuestions();
+        } else {
+            const details = (data.errors || []).slice(0, 10).map(err => `#${err.index + 1}: ${err.message}`).join('\n');
+            alert('Error importing questions: ' + data.message + (details ? '\n' + details : ''));
+        }
+    } catch (error) {
+        alert('Error importing questions');
+        console.error(error);
+    }
+});
+
+// Re-score Submissions
+document.getElementById('rescore-btn').addEventListener('click', async () => {
+    const location = document.getElementById('questions-location-filter').value;
+    if (!confirm(`Recalculate the scores of all submitted participants for ${location} using the current questions?`)) {
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/admin/rescore/${location}`, { method: 'POST' });
+        const data = await response.json();
+        
+        if (data.success) {
+            alert(`Re-scored ${data.participants} participant(s) in ${data.seconds}s, ${data.updated} score(s) changed.`);
+        } else {
+            alert('Error re-scoring: ' + data.message);
+        }
+    } catch (error) {
+        alert('Error re-scoring');
+        console.error(error);
+    }
+});
+
+// Load Analytics
+async function loadAnalytics() {
+    const location = document.getElementById('analytics-location-filter').value;
+    const tbody = document.getElementById('analytics-tbody');
+    const summary = document.getElementById('analytics-summary');
+    
+    try {
+        const response = await fetch(`/api/admin/analytics/${location}`);
+        const data = await response.json();
+        
+        if (!data.participants) {
+            summary.textContent = '';
+            tbody.innerHTML = '<tr><td colspan="5" class="no-data">No submissions yet</td></tr>';
+            return;
+        }
+        
+        const histogram = data.score_histogram.map(h => `${h.score}: ${h.participants}`).join(', ');
+        summary.innerHTML = `<strong>${escapeHtml(data.participants)}</strong> submissions · average score <strong>${escapeHtml(data.average_score)}</strong> / ${escapeHtml(data.max_score)} · score histogram: ${escapeHtml(histogram)}`;
+        
+        // Hardest questions first
+        const questions = [...data.questions].sort((a, b) => a.correct_rate - b.correct_rate);
+        tbody.innerHTML = questions.map(q => {
+            const index = data.questions.indexOf(q) + 1;
+            const distribution = Object.entries(q.distribution)
+                .map(([answer, count]) => `${escapeHtml(answer)}: ${escapeHtml(count)}`)
+                .join('<br>');
+            
+            return `
+                <tr>
+                    <td>Q${index}</td>
+                    <td>${escapeHtml(q.question)}</td>
+                    <td><strong>${Math.round(q.correct_rate * 100)}%</strong> (${escapeHtml(q.correct)}/${escapeHtml(data.participants)})</td>
+                    <td>${escapeHtml(q.average_points)} / ${escapeHtml(q.max_points)}</td>
+                    <td class="hide-mobile">${distribution}</td>
+                </tr>
+            `;
+        }).join('');
+    } catch (error) {
+        tbody.innerHTML = '<tr><td colspan="5" class="error">Error loading analytics</td></tr>';
+        console.error(error);
+    }
+}
+
+document.getElementById('analytics-location-filter').addEventListener('change', loadAnalytics);
+document.getElementById('refresh-analytics-btn').addEventListener('click', loadAnalytics);
+
 // Load Quiz Status
 async function loadQuizStatus() {
     const container = document.getElementById('quiz-status-controls');
@@ -584,6 +815,93 @@ async function toggleQuizStatus(location, isOpen) {
     }
 }
 
+// Load Quiz Events
+async function loadQuizEvents() {
+    const tbody = document.getElementById('quiz-events-tbody');
+    
+    try {
+        const response = await fetch('/api/admin/quiz-events');
+        const data = await response.json();
+        
+        tbody.innerHTML = data.events.map(e => {
+            const startedAt = new Date(e.started_at).toLocaleString();
+            const endedAt = e.ended_at ? new Date(e.ended_at).toLocaleString() : '<strong>LIVE</strong>';
+            let archive = '-';
+            if (e.archived_at) {
+                archive = `${escapeHtml(e.archive_file)}<br>${new Date(e.archived_at).toLocaleString()}`;
+            } else if (e.ended_at) {
+                archive = `<button class="btn btn-secondary btn-sm" onclick="archiveQuizEvent(${e.id})">📦 Archive</button>`;
+            }
+            
+            return `
+                <tr>
+                    <td>${escapeHtml(e.name)}</td>
+                    <td>${startedAt}</td>
+                    <td>${endedAt}</td>
+                    <td>${e.participants}</td>
+                    <td>${archive}</td>
+                </tr>
+            `;
+        }).join('');
+    } catch (error) {
+        tbody.innerHTML = '<tr><td colspan="5" class="error">Error loading events</td></tr>';
+        console.error(error);
+    }
+}
+
+// Start New Event
+document.getElementById('start-quiz-event-btn').addEventListener('click', async () => {
+    const name = prompt('Name of the new event (the live event ends and participants can register again):');
+    if (!name || !name.trim()) {
+        return;
+    }
+    
+    try {
+        const response = await fetch('/api/admin/quiz-events', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ name: name.trim() })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            loadQuizEvents();
+            loadParticipants();
+        } else {
+            alert('Error starting event: ' + data.message);
+        }
+    } catch (error) {
+        alert('Error starting event');
+        console.error(error);
+    }
+});
+
+// Archive Quiz Event
+async function archiveQuizEvent(eventId) {
+    if (!confirm(`Archive event #${eventId}? Its results are saved to a compressed file on the server and taken out of the participant tables.`)) {
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/admin/quiz-events/${eventId}/archive`, {
+            method: 'POST'
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            alert(`Archived ${data.participants} participant(s) to ${data.file}`);
+            loadQuizEvents();
+        } else {
+            alert('Error archiving event: ' + data.message);
+        }
+    } catch (error) {
+        alert('Error archiving event');
+        console.error(error);
+    }
+}
+
 // Close modal when clicking outside
 window.onclick = function(event) {
     if (event.target == questionModal) {
@@ -4,11 +4,17 @@ let quizData = {
     name: '',
     email: '',
     location: '',
+    token: '',
     questions: [],
     answers: {},
     currentQuestionIndex: 0
 };
 
+// Requests on behalf of the registered participant carry the token from /api/register
+function participantHeaders(headers = {}) {
+    return Object.assign({ 'X-Participant-Token': quizData.token }, headers);
+}
+
 // Screen Management
 function showScreen(screenId) {
     document.querySelectorAll('.screen').forEach(screen => {
@@ -67,6 +73,7 @@ document.getElementById('registration-form').addEventListener('submit', async (e
             quizData.name = name;
             quizData.email = email;
             quizData.location = data.can_resume ? data.location : location;
+            quizData.token = data.token;
             
             if (data.can_resume) {
                 alert(data.message);
@@ -85,7 +92,9 @@ document.getElementById('registration-form').addEventListener('submit', async (e
 // Load Quiz Questions
 async function loadQuiz() {
     try {
-        const response = await fetch(`/api/questions/${quizData.location}?sso=${quizData.sso}`);
+        const response = await fetch(`/api/questions/${quizData.location}`, {
+            headers: participantHeaders()
+        });
         const data = await response.json();
         
         if (data.error) {
@@ -239,9 +248,120 @@ function renderQuestion(index) {
     });
 }
 
+// Answer Save Queue
+// Answers are coalesced per question and sent in one batch after a quiet
+// period (or at most SAVE_MAX_WAIT_MS after the first unsaved change),
+// instead of one request per navigation. The queue is flushed right away
+// before submitting and when the page is hidden or closed.
+const SAVE_DEBOUNCE_MS = 3000;
+const SAVE_MAX_WAIT_MS = 15000;
+const SAVE_RETRY_MS = 5000;
+let pendingAnswers = {};
+let pendingSince = null;
+let saveTimer = null;
+let saveInFlight = null;
+
+function queueAnswerSave(questionId, answer) {
+    pendingAnswers[questionId] = answer;
+    if (pendingSince === null) {
+        pendingSince = Date.now();
+    }
+    const maxWaitLeft = SAVE_MAX_WAIT_MS - (Date.now() - pendingSince);
+    scheduleAnswerFlush(Math.max(0, Math.min(SAVE_DEBOUNCE_MS, maxWaitLeft)));
+}
+
+function scheduleAnswerFlush(delay) {
+    clearTimeout(saveTimer);
+    saveTimer = setTimeout(flushPendingAnswers, delay);
+}
+
+async function flushPendingAnswers() {
+    clearTimeout(saveTimer);
+    saveTimer = null;
+    
+    // Keep batches in order so an older batch can never overwrite a newer one
+    while (saveInFlight) {
+        await saveInFlight;
+    }
+    
+    const batch = pendingAnswers;
+    if (Object.keys(batch).length === 0) {
+        return true;
+    }
+    pendingAnswers = {};
+    pendingSince = null;
+    
+    let saved = false;
+    const request = (async () => {
+        try {
+            const response = await fetch('/api/save-answers', {
+                method: 'POST',
+                headers: participantHeaders({ 'Content-Type': 'application/json' }),
+                body: JSON.stringify({ answers: batch })
+            });
+            
+            if (response.status >= 500) {
+                throw new Error(`Server responded ${response.status}`);
+            }
+            saved = response.ok;
+        } catch (error) {
+            console.error('Error saving answers:', error);
+            // Re-queue the batch without clobbering answers changed meanwhile
+            pendingAnswers = Object.assign({}, batch, pendingAnswers);
+            pendingSince = pendingSince || Date.now();
+            scheduleAnswerFlush(SAVE_RETRY_MS);
+        }
+    })();
+    
+    saveInFlight = request;
+    try {
+        await request;
+    } finally {
+        if (saveInFlight === request) {
+            saveInFlight = null;
+        }
+    }
+    return saved;
+}
+
+// Last-chance delivery when the tab is hidden or closed; sendBeacon survives unload
+function beaconPendingAnswers() {
+    if (!quizData.token || Object.keys(pendingAnswers).length === 0) {
+        return;
+    }
+    
+    // sendBeacon can't set headers, so the token travels in the body
+    const payload = JSON.stringify({
+        token: quizData.token,
+        answers: pendingAnswers
+    });
+    
+    if (navigator.sendBeacon && navigator.sendBeacon('/api/save-answers', new Blob([payload], { type: 'application/json' }))) {
+        pendingAnswers = {};
+        pendingSince = null;
+        clearTimeout(saveTimer);
+        saveTimer = null;
+    }
+}
+
+window.addEventListener('beforeunload', () => {
+    saveCurrentAnswer();
+    beaconPendingAnswers();
+});
+
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+        saveCurrentAnswer();
+        beaconPendingAnswers();
+    }
+});
+
 // Save Current Answer
-async function saveCurrentAnswer() {
+function saveCurrentAnswer() {
     const question = quizData.questions[quizData.currentQuestionIndex];
+    if (!question || !document.getElementById('quiz-screen').classList.contains('active')) {
+        return;
+    }
     let answer = null;
     
     if (question.type === 'multiple') {
@@ -255,22 +375,9 @@ async function saveCurrentAnswer() {
     }
     
     if (answer !== null && (Array.isArray(answer) ? answer.length > 0 : answer !== '')) {
-        quizData.answers[question.id] = answer;
-        
-        // Save to server
-        try {
-            await fetch('/api/save-answer', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    sso: quizData.sso,
-                    location: quizData.location,
-                    question_id: question.id,
-                    answer: answer
-                })
-            });
-        } catch (error) {
-            console.error('Error saving answer:', error);
+        if (JSON.stringify(quizData.answers[question.id]) !== JSON.stringify(answer)) {
+            quizData.answers[question.id] = answer;
+            queueAnswerSave(question.id, answer);
         }
         
         updateQuestionNavigation();
@@ -311,24 +418,49 @@ document.getElementById('submit-quiz-btn').addEventListener('click', () => {
     submitQuiz();
 });
 
+function postSubmit() {
+    return fetch('/api/submit', {
+        method: 'POST',
+        headers: participantHeaders({ 'Content-Type': 'application/json' }),
+        body: '{}'
+    });
+}
+
+// A queued submission answers 202; poll until the score is ready
+async function waitForScore(response) {
+    let data = await response.json();
+    
+    while (data.queued) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        
+        const status = await fetch('/api/submit-status', { headers: participantHeaders() });
+        // 404: the submission was lost (e.g. server restart) - send it again
+        data = await (status.status === 404 ? await postSubmit() : status).json();
+    }
+    return data;
+}
+
 // Confirm Submit
 document.getElementById('confirm-submit-btn').addEventListener('click', async () => {
     try {
-        const response = await fetch('/api/submit', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                sso: quizData.sso,
-                location: quizData.location
-            })
-        });
+        // Make sure every queued answer reached the server before scoring
+        if (!await flushPendingAnswers()) {
+            alert('Could not save your latest answers. Please check your connection and try again.');
+            return;
+        }
         
-        const data = await response.json();
+        const data = await waitForScore(await postSubmit());
         
         if (data.success) {
             // Display score
             document.getElementById('final-score').textContent = data.score;
             
+            const rank = document.getElementById('final-rank');
+            if (data.rank) {
+                rank.textContent = `Current rank: #${data.rank}`;
+                rank.hidden = false;
+            }
+            
             showScreen('success-screen');
         } else {
             alert('Error submitting quiz: ' + data.message);
@@ -0,0 +1,84 @@
+"""Shared fixtures: the app runs against a throwaway database.
+
+The suite uses a temporary SQLite file by default. Set TEST_DATABASE_URL to a
+PostgreSQL database to run it on Postgres instead - everything in that
+database's public schema is dropped first, so never point it at real data.
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+TEST_DIR = tempfile.mkdtemp(prefix='quiz-tests-')
+
+# The quiz modules read their configuration at import time
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL or f"sqlite:///{os.path.join(TEST_DIR, 'quiz.db')}"
+os.environ['SECRET_KEY'] = 'test-secret-key'
+os.environ['QUIZ_EVENT_ARCHIVE_DIR'] = os.path.join(TEST_DIR, 'archives')
+os.environ.setdefault('EVENT_NOTIFY', 'false')
+
+from app import app  # noqa: E402
+from quiz.participant_api import PARTICIPANT_TOKEN_HEADER  # noqa: E402
+from quiz.storage import migrate_database, storage  # noqa: E402
+
+def reset_postgres(database_url):
+    """Drop everything in the public schema of a test database"""
+    import psycopg2
+    conn = psycopg2.connect(database_url)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("DROP SCHEMA public CASCADE")
+            cur.execute("CREATE SCHEMA public")
+    finally:
+        conn.close()
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    """Migrated database for the whole run"""
+    if TEST_DATABASE_URL:
+        reset_postgres(TEST_DATABASE_URL)
+    migrate_database()
+    yield storage
+
+@pytest.fixture
+def admin():
+    """Test client with an admin session"""
+    client = app.test_client()
+    response = client.post('/api/admin/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.get_json()['success']
+    return client
+
+def create_location(admin):
+    """A fresh, open location with two questions, so tests don't share participants or caches"""
+    name = f"T{uuid.uuid4().hex[:8]}"
+    questions = [
+        {'question': 'Capital of France?', 'type': 'single', 'options': ['Paris', 'Rome'],
+         'correct_answer': 'Paris', 'points': 2},
+        {'question': 'Name the planet we live on', 'type': 'text', 'options': None,
+         'correct_answer': 'Earth', 'points': 3},
+    ]
+    for question in questions:
+        assert admin.post(f'/api/admin/questions/{name}', json=question).get_json()['success']
+    assert admin.post('/api/admin/quiz-status', json={'location': name, 'is_open': True}).get_json()['success']
+    return name
+
+@pytest.fixture
+def location(admin):
+    return create_location(admin)
+
+_sso_counter = iter(range(100000000, 999999999))
+
+def new_participant(location):
+    """Registration body for a participant nobody has used yet"""
+    sso = str(next(_sso_counter))
+    return {'sso': sso, 'name': f'Tester {sso}', 'email': f't{sso}@gevernova.com', 'location': location}
+
+def register(client, details):
+    """Register and return the participant token header"""
+    response = client.post('/api/register', json=details)
+    payload = response.get_json()
+    assert response.status_code == 200, payload
+    return {PARTICIPANT_TOKEN_HEADER: payload['token']}
@@ -0,0 +1,59 @@
+"""Per-question analytics for the admin dashboard."""
+from conftest import app, new_participant, register
+from quiz.bus import event_bus
+
+def take_quiz(location, answers, submit=True):
+    client = app.test_client()
+    headers = register(client, new_participant(location))
+    question_ids = [q['id'] for q in client.get(f'/api/questions/{location}', headers=headers).get_json()['questions']]
+    client.post('/api/save-answers', headers=headers,
+                json={'answers': {str(question_id): answer for question_id, answer in zip(question_ids, answers)}})
+    if submit:
+        client.post('/api/submit', headers=headers)
+
+def test_analytics(location, admin):
+    take_quiz(location, ['Paris', 'Earth'])
+    take_quiz(location, ['Rome', '  EARTH '])
+    take_quiz(location, [None, 'Mars'])
+    take_quiz(location, ['Paris', 'Earth'], submit=False)
+
+    response = admin.get(f'/api/admin/analytics/{location}')
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert stats['participants'] == 3
+    assert stats['average_score'] == round(8 / 3, 3)
+    assert stats['max_score'] == 5
+    assert stats['score_histogram'] == [
+        {'score': 0, 'participants': 1}, {'score': 3, 'participants': 1}, {'score': 5, 'participants': 1}
+    ]
+
+    choice, text = stats['questions']
+    assert choice['question'] == 'Capital of France?' and choice['max_points'] == 2
+    assert (choice['responses'], choice['unanswered'], choice['correct']) == (2, 1, 1)
+    assert choice['correct_rate'] == round(1 / 3, 4) and choice['average_points'] == round(2 / 3, 3)
+    assert choice['distribution'] == {'Paris': 1, 'Rome': 1}
+
+    # Free-text answers are grouped the way they are scored
+    assert (text['responses'], text['unanswered'], text['correct']) == (3, 0, 2)
+    assert text['distribution'] == {'earth': 2, 'mars': 1}
+
+def test_analytics_lists_unpicked_options(location, admin):
+    take_quiz(location, ['Paris', 'Earth'])
+    choice = admin.get(f'/api/admin/analytics/{location}').get_json()['questions'][0]
+    assert list(choice['distribution'].items()) == [('Paris', 1), ('Rome', 0)]
+
+def test_empty_location_analytics(location, admin):
+    stats = admin.get(f'/api/admin/analytics/{location}').get_json()
+    assert stats['participants'] == 0 and stats['average_score'] is None
+    assert all(q['correct_rate'] is None and q['responses'] == 0 for q in stats['questions'])
+
+def test_analytics_refresh_after_a_submission(location, admin, monkeypatch):
+    # Cached results are only kept while the event counter can be trusted
+    monkeypatch.setattr(event_bus, 'epoch', lambda: 1)
+    take_quiz(location, ['Paris', 'Earth'])
+    assert admin.get(f'/api/admin/analytics/{location}').get_json()['participants'] == 1
+    take_quiz(location, ['Rome', 'Earth'])
+    assert admin.get(f'/api/admin/analytics/{location}').get_json()['participants'] == 2
+
+def test_analytics_requires_admin(location):
+    assert app.test_client().get(f'/api/admin/analytics/{location}').status_code == 401
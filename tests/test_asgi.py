@@ -0,0 +1,159 @@
+"""The ASGI server (asgi.py) must answer exactly like the Flask app.
+
+Runs the same participant and admin flow against both and compares every
+response. With TEST_DATABASE_URL set, asgi.py uses asyncpg.
+"""
+import json
+import sqlite3
+
+import pytest
+
+from conftest import TEST_DATABASE_URL, app, create_location, new_participant
+from quiz.participant_api import PARTICIPANT_TOKEN_HEADER
+from quiz.scoring import score_answers
+from quiz.storage import storage
+
+pytest.importorskip('httpx')    # starlette's TestClient
+from starlette.testclient import TestClient  # noqa: E402
+
+import asgi  # noqa: E402
+
+@pytest.fixture(scope='module')
+def asgi_client():
+    with TestClient(asgi.app) as client:
+        yield client
+
+def body(response):
+    return json.loads(response.text)
+
+def login(client):
+    assert body(client.post('/api/admin/login', json={'username': 'admin', 'password': 'admin123'}))['success']
+
+def comparable(value, positions):
+    """value without what differs between two runs: submission times (only
+    whether there is one), tokens, and question ids (replaced by position)"""
+    if isinstance(value, list):
+        return [comparable(item, positions) for item in value]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for key, item in value.items():
+        if key == 'token':
+            continue
+        if key == 'submitted_at':
+            item = item is not None
+        elif key == 'id':
+            item = positions.get(str(item), item)
+        elif key in ('answers', 'existing_answers') and isinstance(item, dict):
+            item = {positions.get(k, k): v for k, v in item.items()}
+        result[key] = comparable(item, positions)
+    return result
+
+def participant_flow(client, location):
+    """[(step, status, payload)] for one participant's way through the quiz, made comparable across runs"""
+    first, second = new_participant(location), new_participant(location)
+    placeholders = {first['sso']: 'SSO1', first['email']: 'EMAIL1', first['name']: 'NAME1',
+                    second['sso']: 'SSO2', second['email']: 'EMAIL2', second['name']: 'NAME2',
+                    location: 'LOC'}
+    positions = {}
+    steps = []
+
+    def step(name, response):
+        text = response.text
+        for value, placeholder in placeholders.items():
+            text = text.replace(value, placeholder)
+        steps.append((name, response.status_code, comparable(json.loads(text), positions)))
+
+    step('quiz-status', client.get(f'/api/quiz-status/{location}'))
+    step('register-bad-sso', client.post('/api/register', json={**first, 'sso': '12'}))
+    step('register-closed', client.post('/api/register', json={**first, 'location': f'{location}-closed'}))
+    response = client.post('/api/register', json=first)
+    headers = {PARTICIPANT_TOKEN_HEADER: body(response)['token']}
+    step('register', response)
+
+    step('questions-no-token', client.get(f'/api/questions/{location}'))
+    question_ids = [q['id'] for q in body(client.get(f'/api/questions/{location}', headers=headers))['questions']]
+    positions.update((str(question_id), f'Q{i}') for i, question_id in enumerate(question_ids))
+    step('questions', client.get(f'/api/questions/{location}', headers=headers))
+    step('save-answer', client.post('/api/save-answer', headers=headers,
+                                    json={'question_id': question_ids[0], 'answer': 'Paris'}))
+    step('save-answers', client.post('/api/save-answers', headers=headers,
+                                     json={'answers': {str(question_ids[1]): ' earth '}}))
+    step('save-answers-bad', client.post('/api/save-answers', headers=headers, json={'answers': ['x']}))
+    step('questions-resumed', client.get(f'/api/questions/{location}', headers=headers))
+    step('register-resume', client.post('/api/register', json=first))
+
+    step('submit', client.post('/api/submit', headers=headers))
+    step('submit-again', client.post('/api/submit', headers=headers))
+    step('questions-submitted', client.get(f'/api/questions/{location}', headers=headers))
+    step('save-after-submit', client.post('/api/save-answer', headers=headers,
+                                          json={'question_id': question_ids[0], 'answer': 'Rome'}))
+    step('register-submitted', client.post('/api/register', json=first))
+
+    second_headers = {PARTICIPANT_TOKEN_HEADER: body(client.post('/api/register', json=second))['token']}
+    step('submit-empty', client.post('/api/submit', headers=second_headers))
+
+    step('admin-participants', client.get(f'/api/admin/participants/{location}'))
+    step('admin-participants-page', client.get(f'/api/admin/participants/{location}?fields=sso,score&limit=1'))
+    step('leaderboard', client.get(f'/api/leaderboard/{location}', headers=headers))
+    return steps
+
+def test_asgi_matches_flask(admin, asgi_client):
+    flask_client = app.test_client()
+    login(flask_client)
+    login(asgi_client)
+
+    flask_steps = participant_flow(flask_client, create_location(admin))
+    asgi_steps = participant_flow(asgi_client, create_location(admin))
+
+    for flask_step, asgi_step in zip(flask_steps, asgi_steps):
+        assert asgi_step == flask_step
+    assert len(asgi_steps) == len(flask_steps)
+
+def test_asgi_rejects_stale_tokens(admin, asgi_client):
+    location = create_location(admin)
+    headers = {PARTICIPANT_TOKEN_HEADER: 'not-a-token'}
+    response = asgi_client.post('/api/save-answer', headers=headers, json={'question_id': 1, 'answer': 'x'})
+    assert response.status_code == 401
+    response = asgi_client.get(f'/api/questions/{location}', headers=headers)
+    assert response.status_code == 401
+
+def row_is_locked(sso, location):
+    """Whether another connection would have to wait to write the participant's row"""
+    if storage.name == 'postgresql':
+        import psycopg2
+        conn = psycopg2.connect(TEST_DATABASE_URL)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM participants WHERE sso = %s AND location = %s FOR UPDATE NOWAIT",
+                            (sso, location))
+            return False
+        except psycopg2.errors.LockNotAvailable:
+            return True
+        finally:
+            conn.close()
+    conn = sqlite3.connect(storage.path, timeout=0)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        return False
+    except sqlite3.OperationalError:
+        return True
+    finally:
+        conn.close()
+
+def test_asgi_scores_with_the_row_locked(admin, asgi_client, monkeypatch):
+    location = create_location(admin)
+    details = new_participant(location)
+    headers = {PARTICIPANT_TOKEN_HEADER: body(asgi_client.post('/api/register', json=details))['token']}
+    question_id = body(asgi_client.get(f'/api/questions/{location}', headers=headers))['questions'][0]['id']
+    asgi_client.post('/api/save-answer', headers=headers, json={'question_id': question_id, 'answer': 'Paris'})
+
+    locked = []
+
+    def scoring(answer_key, answers):
+        locked.append(row_is_locked(details['sso'], location))
+        return score_answers(answer_key, answers)
+    monkeypatch.setattr('asgi.score_answers', scoring)
+    assert body(asgi_client.post('/api/submit', headers=headers))['score'] == 2
+    assert locked == [True]
+    assert not row_is_locked(details['sso'], location)
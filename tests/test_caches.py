@@ -0,0 +1,29 @@
+"""Per-worker caches and the events that keep them current across workers."""
+import json
+
+from quiz.bus import event_bus
+from quiz.caches import get_question_set
+from quiz.storage import storage
+
+def from_other_worker(location, event_type, data=None):
+    """Deliver an event the way a NOTIFY from another gunicorn worker arrives"""
+    event_bus._on_notify(json.dumps({'origin': 'other-worker', 'location': location, 'type': event_type, 'data': data}))
+
+def test_question_edits_reach_every_worker(location, admin, monkeypatch):
+    assert len(get_question_set(location)['questions']) == 2
+
+    # Another worker edits the questions: this worker keeps serving its copy until told
+    storage.add_question(location, {'question': 'Largest ocean?', 'type': 'text', 'options': None,
+                                    'correct_answer': 'Pacific', 'points': 1})
+    assert len(get_question_set(location)['questions']) == 2
+    from_other_worker(location, 'questions')
+    assert len(get_question_set(location)['questions']) == 3
+
+    # Edits made here are announced to the other workers
+    sent = []
+    monkeypatch.setattr('quiz.bus.EVENT_NOTIFY', True)
+    monkeypatch.setattr(storage, 'notify', lambda channel, payload: sent.append(json.loads(payload)), raising=False)
+    question_id = get_question_set(location)['questions'][0]['id']
+    assert admin.delete(f'/api/admin/questions/{location}/{question_id}').get_json()['success']
+    assert [(event['location'], event['type']) for event in sent] == [(location, 'questions')]
+    assert len(get_question_set(location)['questions']) == 2
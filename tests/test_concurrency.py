@@ -0,0 +1,207 @@
+"""The shared-state pieces under concurrent use: connection pool, answer buffer, submission queue."""
+import threading
+import time
+
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+
+from conftest import TEST_DATABASE_URL, app, new_participant, register
+from quiz.caches import live_event
+from quiz.db import ConnectionPool, PoolTimeout
+from quiz.queues import AnswerBuffer, Submission, SubmissionQueue, submission_queue
+from quiz.storage import storage
+
+postgres_only = pytest.mark.skipif(
+    storage.name != 'postgresql', reason='set TEST_DATABASE_URL to run against PostgreSQL'
+)
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool(TEST_DATABASE_URL, minconn=0, maxconn=2, timeout=0.2,
+                               healthcheck_idle=60, max_lifetime=3600)
+    yield pool
+    pool.closeall()
+
+@postgres_only
+def test_pool_blocks_then_times_out(pool):
+    first, second = pool.getconn(), pool.getconn()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - start >= 0.2
+    assert pool.stats()['timeouts'] == 1
+
+    # A connection returned while someone waits goes straight to the waiter
+    pool.timeout = 5
+    handed_over = []
+    waiter = threading.Thread(target=lambda: handed_over.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.1)
+    assert pool.stats()['waiters'] == 1
+    pool.putconn(first)
+    waiter.join()
+    assert handed_over == [first]
+    pool.putconn(second)
+    pool.putconn(first)
+    assert pool.stats()['in_use'] == 0
+
+@postgres_only
+def test_pool_cleans_up_returned_connections(pool):
+    conn = pool.getconn()
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+    pool.putconn(conn)    # mid-transaction: rolled back
+    assert conn.get_transaction_status() == TRANSACTION_STATUS_IDLE
+    assert pool.getconn() is conn
+
+    conn.close()
+    pool.putconn(conn)    # broken: dropped
+    assert pool.stats()['size'] == 0
+    replacement = pool.getconn()
+    assert replacement is not conn and not replacement.closed
+    pool.putconn(replacement)
+
+    pool.max_lifetime = 0
+    assert pool.getconn() is not replacement
+    assert pool.stats()['recycled'] == 1
+
+@postgres_only
+def test_pool_never_exceeds_max_size(pool):
+    pool.maxconn, pool.timeout = 3, 10
+    peak = []
+    lock = threading.Lock()
+
+    def work(i):
+        for _ in range(20):
+            conn = pool.getconn()
+            with lock:
+                peak.append(pool.stats()['in_use'])
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_backend_pid()")
+            pool.putconn(conn)
+    run_threads(work, 12)
+
+    stats = pool.stats()
+    assert max(peak) <= 3 and stats['size'] <= 3
+    assert stats['in_use'] == 0 and stats['checkouts'] == 240 and stats['timeouts'] == 0
+
+    pool.closeall()
+    with pytest.raises(PoolError):
+        pool.getconn()
+
+@pytest.fixture
+def participant(location):
+    client = app.test_client()
+    details = new_participant(location)
+    questions = client.get(f'/api/questions/{location}', headers=register(client, details)).get_json()['questions']
+    return details['sso'], location, [str(q['id']) for q in questions]
+
+def test_answer_buffer_merges_concurrent_saves(participant):
+    sso, location, question_ids = participant
+    buffer = AnswerBuffer(interval_ms=60000, max_entries=10000)
+    key = (live_event.id(), sso, location)
+
+    def save(i):
+        for round_ in range(50):
+            buffer.add(*key, {question_ids[i % 2]: f'{i}-{round_}', f'extra-{i}': round_})
+    run_threads(save, 8)
+
+    assert buffer.stats()['pending_entries'] == 10    # 2 questions + 8 extras
+    assert buffer.flush(*key) == 10
+    answers = storage.get_participant(sso, location)['answers']
+    assert {answers[f'extra-{i}'] for i in range(8)} == {49}
+    assert answers[question_ids[0]].endswith('-49') and answers[question_ids[1]].endswith('-49')
+    assert buffer.stats()['pending_entries'] == 0
+
+def test_answer_buffer_keeps_failed_batches(participant, monkeypatch):
+    sso, location, question_ids = participant
+    buffer = AnswerBuffer(interval_ms=60000, max_entries=10000)
+    key = (live_event.id(), sso, location)
+    buffer.add(*key, {question_ids[0]: 'Rome', question_ids[1]: 'Mars'})
+
+    def fail(batch):
+        buffer.add(*key, {question_ids[0]: 'Paris'})    # arrives while the write is failing
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(storage, 'merge_answers_bulk', fail)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.stats()['flush_errors'] == 1
+    monkeypatch.undo()
+
+    # Restored without overwriting the newer answer
+    assert buffer.flush() == 2
+    assert storage.get_participant(sso, location)['answers'] == {
+        question_ids[0]: 'Paris', question_ids[1]: 'Mars'
+    }
+
+def test_submission_queue_scores_each_participant_once(location):
+    client = app.test_client()
+    event_id = live_event.id()
+    people = [new_participant(location) for _ in range(6)]
+    for details in people:
+        register(client, details)
+    jobs = [[] for _ in people]
+
+    def submit(i):
+        for details, mine in zip(people, jobs):
+            mine.append(submission_queue.submit(event_id, details['sso'], location))
+    run_threads(submit, 4)
+
+    for mine in jobs:
+        assert all(job.done.wait(5) for job in mine)
+        # Submits that raced in while the first was queued share its job;
+        # later ones find the participant already submitted
+        assert {job.status for job in mine} <= {'scored', 'skipped'}
+        assert sum(job.status == 'scored' for job in set(mine)) == 1
+    assert submission_queue.wait_idle(1)
+
+    unknown = submission_queue.submit(event_id, '999999997', location)
+    assert unknown.done.wait(5) and unknown.status == 'skipped'
+    assert client.get(f'/api/leaderboard/{location}').get_json()['participants'] == len(people)
+
+def test_unscorable_submission_fails_alone(location, monkeypatch):
+    client = app.test_client()
+    event_id = live_event.id()
+    people = [new_participant(location) for _ in range(3)]
+    for details in people:
+        register(client, details)
+    storage.merge_answers(people[1]['sso'], location, {'1': 'unscorable'})
+
+    def score_answers(answer_key, answers):
+        if 'unscorable' in answers.values():
+            raise TypeError('unhashable answer')
+        return 1
+    monkeypatch.setattr('quiz.queues.score_answers', score_answers)
+    jobs = [Submission(event_id, details['sso'], location) for details in people]
+    SubmissionQueue(workers=1, batch_size=10, batch_wait_ms=0).process(jobs)
+
+    assert [job.status for job in jobs] == ['scored', 'failed', 'scored']
+    assert storage.get_participant(people[0]['sso'], location)['score'] == 1
+    # Left unsubmitted, so the participant can try again
+    assert storage.get_participant(people[1]['sso'], location)['submitted_at'] is None
+
+def test_queued_submission_keeps_its_arrival_time(location):
+    client = app.test_client()
+    event_id = live_event.id()
+    queued, direct = new_participant(location), new_participant(location)
+    for details in (queued, direct):
+        register(client, details)
+
+    # A submission that waited a minute in the queue ranks ahead of one written directly afterwards
+    job = Submission(event_id, queued['sso'], location)
+    job.queued_at -= 60
+    SubmissionQueue(workers=1, batch_size=10, batch_wait_ms=0).process([job])
+    assert job.status == 'scored'
+    storage.submit_bulk({(event_id, direct['sso'], location): None}, lambda key, answers: 0)
+
+    waited = (storage.get_participant(direct['sso'], location)['submitted_at'] -
+              storage.get_participant(queued['sso'], location)['submitted_at'])
+    assert 59 < waited.total_seconds() < 70
@@ -0,0 +1,23 @@
+"""The admin dashboard's Server-Sent Events stream on the Flask app."""
+from quiz.bus import SSE_MAX_CLIENTS, event_bus
+
+def test_stream_delivers_participant_events(location, admin):
+    response = admin.get(f'/api/admin/events/{location}', buffered=False)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    chunks = response.response
+    assert next(chunks) == b'retry: 2000\n\n'
+
+    event_bus.publish(location, 'participant', {'sso': '123456789', 'score': 2})
+    assert next(chunks) == b'event: participant\ndata: {"sso": "123456789", "score": 2}\n\n'
+    response.close()
+    assert event_bus.subscriber_count() == 0
+
+def test_streams_are_capped(location, admin):
+    # Every stream holds a server thread, so only a few may stay open per worker
+    held = [event_bus.subscribe(location) for _ in range(SSE_MAX_CLIENTS)]
+    try:
+        assert None not in held
+        assert admin.get(f'/api/admin/events/{location}').status_code == 503
+    finally:
+        for q in held:
+            event_bus.unsubscribe(q)
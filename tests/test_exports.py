@@ -0,0 +1,53 @@
+"""Streaming result exports (CSV / NDJSON)."""
+import csv
+import io
+import json
+
+from conftest import app, new_participant, register
+
+def take_quiz(location, answers, submit=True):
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+    question_ids = [q['id'] for q in client.get(f'/api/questions/{location}', headers=headers).get_json()['questions']]
+    client.post('/api/save-answers', headers=headers,
+                json={'answers': {str(question_id): answer for question_id, answer in zip(question_ids, answers)}})
+    if submit:
+        client.post('/api/submit', headers=headers)
+    return details, question_ids
+
+def test_csv_export(location, admin):
+    best, question_ids = take_quiz(location, ['Paris', 'Earth'])
+    second, _ = take_quiz(location, [['Paris', 'Rome'], 'Mars'])
+    pending, _ = take_quiz(location, ['Paris'], submit=False)
+
+    response = admin.get(f'/api/admin/export/{location}?answers=1')
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == f'attachment; filename="results-{location}.csv"'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['rank', 'sso', 'name', 'email', 'score', 'submitted_at'] + [f'Q{i}' for i in question_ids]
+    assert [row[:5] for row in rows[1:]] == [
+        ['1', best['sso'], best['name'], best['email'], '5'],
+        ['2', second['sso'], second['name'], second['email'], '0'],
+        ['', pending['sso'], pending['name'], pending['email'], '0']
+    ]
+    assert rows[1][6:] == ['Paris', 'Earth'] and rows[2][6:] == ['Paris; Rome', 'Mars']
+    assert rows[1][5] and not rows[3][5]
+
+    # Without answers there are no question columns
+    rows = list(csv.reader(io.StringIO(admin.get(f'/api/admin/export/{location}').get_data(as_text=True))))
+    assert {len(row) for row in rows} == {6}
+
+def test_ndjson_export(location, admin):
+    submitted, question_ids = take_quiz(location, ['Paris', 'Earth'])
+    response = admin.get(f'/api/admin/export/{location}?format=ndjson&answers=true')
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(records) == 1
+    assert records[0]['sso'] == submitted['sso'] and records[0]['score'] == 5
+    assert records[0]['answers'] == {str(question_ids[0]): 'Paris', str(question_ids[1]): 'Earth'}
+    assert 'answers' not in json.loads(admin.get(f'/api/admin/export/{location}?format=ndjson').get_data(as_text=True))
+
+def test_export_checks(location, admin):
+    assert app.test_client().get(f'/api/admin/export/{location}').status_code == 401
+    assert admin.get(f'/api/admin/export/{location}?format=xlsx').status_code == 400
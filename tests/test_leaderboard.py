@@ -0,0 +1,67 @@
+"""In-memory leaderboards and how long each worker trusts them."""
+import random
+
+import pytest
+
+from conftest import app, new_participant, register
+from quiz.bus import event_bus
+from quiz.leaderboard import RankedList, leaderboards
+from quiz.storage import storage
+
+def test_board_expires_without_cross_worker_events(location, monkeypatch):
+    details = new_participant(location)
+    register(app.test_client(), details)
+    assert event_bus.epoch() is None    # EVENT_NOTIFY is off in the tests
+    assert leaderboards.top(location, 10) == ([], 0)
+
+    # Another worker's submission: no event reaches this one
+    storage.submit(details['sso'], location, 3)
+    monkeypatch.setattr('quiz.leaderboard.LEADERBOARD_FALLBACK_TTL', 3600)
+    assert leaderboards.top(location, 10) == ([], 0)
+    monkeypatch.setattr('quiz.leaderboard.LEADERBOARD_FALLBACK_TTL', 0)
+    entries, ranked = leaderboards.top(location, 10)
+    assert ranked == 1 and entries[0]['name'] == details['name'] and entries[0]['score'] == 3
+
+def test_board_is_kept_while_events_arrive(location, monkeypatch):
+    monkeypatch.setattr('quiz.leaderboard.LEADERBOARD_FALLBACK_TTL', 0)
+    monkeypatch.setattr(event_bus, 'epoch', lambda: 1)
+    details = new_participant(location)
+    register(app.test_client(), details)
+    assert leaderboards.top(location, 10) == ([], 0)
+
+    storage.submit(details['sso'], location, 3)
+    assert leaderboards.top(location, 10) == ([], 0)
+    event_bus.publish(location, 'participant', storage.get_participant(details['sso'], location))
+    assert leaderboards.top(location, 10)[1] == 1
+
+def test_ranked_list_matches_a_sorted_list():
+    rng = random.Random(7)
+    ranked = RankedList()
+    expected = []
+    # Ranking keys are unique: the sso breaks ties
+    for n in range(2000):
+        if expected and rng.random() < 0.4:
+            value = rng.choice(expected)
+            ranked.remove(value)
+            expected.remove(value)
+        else:
+            value = (-rng.randrange(20), n)
+            ranked.insert(value)
+            expected.append(value)
+        expected.sort()
+    assert len(ranked) == len(expected) and list(ranked) == expected
+    assert ranked.top(10) == expected[:10]
+    for value in rng.sample(expected, 50):
+        assert ranked.rank(value) == expected.index(value) + 1
+
+def test_ranked_list_misses():
+    ranked = RankedList()
+    assert ranked.rank((0, 'a')) is None and ranked.top(5) == []
+    ranked.insert((-3, 'b'))
+    ranked.insert((-5, 'a'))
+    assert ranked.rank((-4, 'c')) is None
+    assert [ranked.rank((-5, 'a')), ranked.rank((-3, 'b'))] == [1, 2]
+    with pytest.raises(KeyError):
+        ranked.remove((-4, 'c'))
+    ranked.remove((-5, 'a'))
+    assert list(ranked) == [(-3, 'b')] and ranked.rank((-3, 'b')) == 1
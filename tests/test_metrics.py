@@ -0,0 +1,40 @@
+"""/metrics: request and query series plus the pool, buffer, queue, leaderboard and event stream collectors."""
+from conftest import app, new_participant, register
+from quiz.storage import storage
+
+def test_components_report_on_metrics(location):
+    client = app.test_client()
+    register(client, new_participant(location))
+    assert client.get(f'/api/leaderboard/{location}').status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    expected = [
+        'quiz_http_requests_total{', 'quiz_db_query_duration_seconds_bucket{',
+        'quiz_answer_buffer_pending_entries{', 'quiz_answer_buffer_flushes_total{',
+        'quiz_submit_queue_pending{', 'quiz_submit_queue_scored_total{',
+        'quiz_sse_subscribers{', 'quiz_sse_dropped_total{',
+        'quiz_leaderboard_entries{', 'quiz_leaderboard_loads_total{'
+    ]
+    if storage.name == 'postgresql':
+        expected += ['quiz_db_pool_connections_in_use{', 'quiz_db_pool_wait_seconds_bucket{', 'quiz_db_prepared_statements{']
+    else:
+        expected += ['quiz_sqlite_connections_opened_total{', 'quiz_sqlite_busy_timeouts_total{']
+    for series in expected:
+        assert series in text, series
+    assert f'location="{location}"' in text
+
+    families = [line.split()[2] for line in text.splitlines() if line.startswith('# TYPE')]
+    assert len(families) == len(set(families))
+
+def test_stats_endpoints_are_gone(admin):
+    for name in ('pool', 'query', 'answer-buffer', 'submit-queue', 'leaderboard'):
+        assert admin.get(f'/api/admin/{name}-stats').status_code == 404
+
+def test_metrics_token(monkeypatch):
+    monkeypatch.setattr('quiz.web.METRICS_TOKEN', 'scrape-token')
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'}).status_code == 200
@@ -0,0 +1,71 @@
+"""Schema migrations: fresh databases, upgrades of existing data, re-runs."""
+import os
+import sqlite3
+
+import pytest
+
+from quiz.storage import SQLiteStorage, load_migrations, migrate_database, storage
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    return SQLiteStorage.from_url(f"sqlite:///{tmp_path / 'migrate.db'}")
+
+def test_configured_database_is_current():
+    versions = [version for version, _, _ in load_migrations(storage.name)]
+    assert [row['version'] for row in storage.applied_migrations()] == versions
+    assert migrate_database() == []
+
+def test_fresh_sqlite_database(sqlite_db):
+    migrations = load_migrations('sqlite')
+    assert sqlite_db.applied_migrations() == []
+    assert sqlite_db.migrate(migrations) == [version for version, _, _ in migrations]
+    assert sqlite_db.migrate(migrations) == []
+    assert [row['name'] for row in sqlite_db.applied_migrations()] == [name for _, name, _ in migrations]
+
+    assert sqlite_db.check_admin('admin', 'admin123')
+    assert sqlite_db.get_quiz_statuses() == {'BLR': False, 'HTC': False, 'Noida': False}
+    assert [event['name'] for event in sqlite_db.list_quiz_events()] == ['Event 1']
+
+def test_sqlite_upgrade_keeps_existing_participants(sqlite_db):
+    migrations = load_migrations('sqlite')
+    sqlite_db.migrate(migrations[:1])
+    conn = sqlite_db._connection()
+    conn.execute(
+        "INSERT INTO participants (sso, name, email, location, answers, score, submitted_at) "
+        "VALUES ('123456789', 'Before', 'before@gevernova.com', 'BLR', '{\"1\": \"Paris\"}', 2, '2024-01-01 10:00:00.000000')"
+    )
+    conn.execute(
+        "INSERT INTO sso_tracker (sso, name, email, location) "
+        "VALUES ('123456789', 'Before', 'before@gevernova.com', 'BLR')"
+    )
+
+    assert sqlite_db.migrate(migrations) == [version for version, _, _ in migrations[1:]]
+    row = conn.execute("SELECT event_id, answers, score FROM participants WHERE sso = '123456789'").fetchone()
+    assert row == {'event_id': 1, 'answers': {'1': 'Paris'}, 'score': 2}
+    assert conn.execute("SELECT event_id FROM sso_tracker WHERE sso = '123456789'").fetchone() == {'event_id': 1}
+
+    # The migrated rows belong to event 1, which can end like any other
+    assert sqlite_db.start_quiz_event('Event 2')['id'] == 2
+    assert [(event['id'], event['participants']) for event in sqlite_db.list_quiz_events()] == [(2, 0), (1, 1)]
+
+def test_duplicate_versions_are_rejected(tmp_path, monkeypatch):
+    backend = tmp_path / 'sqlite'
+    backend.mkdir()
+    (backend / '0001_first.sql').write_text('SELECT 1;')
+    (backend / '0001_again.sql').write_text('SELECT 2;')
+    (backend / 'README.md').write_text('not a migration')
+    monkeypatch.setattr('quiz.storage.MIGRATIONS_DIR', str(tmp_path))
+    with pytest.raises(ValueError):
+        load_migrations('sqlite')
+
+    os.remove(backend / '0001_again.sql')
+    assert load_migrations('sqlite') == [(1, 'first', 'SELECT 1;')]
+
+def test_failed_migration_is_rolled_back(sqlite_db):
+    migrations = load_migrations('sqlite')
+    broken = migrations[:1] + [(99, 'broken', 'CREATE TABLE half_done (id INTEGER);\nSELECT * FROM missing_table;\n')]
+    with pytest.raises(sqlite3.OperationalError):
+        sqlite_db.migrate(broken)
+    assert sqlite_db.applied_migrations() == []
+    tables = sqlite_db._connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    assert 'half_done' not in {table['name'] for table in tables}
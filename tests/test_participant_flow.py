@@ -0,0 +1,244 @@
+"""Register -> questions -> save -> submit, through the Flask app."""
+import json
+import threading
+
+import pytest
+from itsdangerous import URLSafeTimedSerializer
+
+from conftest import app, new_participant, register
+from quiz.caches import live_event
+from quiz.participant_api import PARTICIPANT_TOKEN_HEADER
+from quiz.queues import answer_buffer
+from quiz.storage import storage
+
+@pytest.fixture(params=['direct', 'write_behind', 'submit_queue'])
+def mode(request, monkeypatch):
+    """Run a test with plain saves/submits, the answer write-behind buffer, and the submission queue"""
+    monkeypatch.setattr('quiz.queues.ANSWER_WRITE_BEHIND', request.param == 'write_behind')
+    monkeypatch.setattr('quiz.queues.SUBMIT_QUEUE', request.param == 'submit_queue')
+    yield request.param
+    answer_buffer.flush()
+
+def question_ids(client, location, headers):
+    return [q['id'] for q in client.get(f'/api/questions/{location}', headers=headers).get_json()['questions']]
+
+def test_full_flow(location, mode):
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+
+    response = client.get(f'/api/questions/{location}', headers=headers)
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['existing_answers'] == {}
+    assert [q['question'] for q in payload['questions']] == ['Capital of France?', 'Name the planet we live on']
+    assert all('correct_answer' not in q for q in payload['questions'])
+    first, second = (q['id'] for q in payload['questions'])
+
+    assert client.post('/api/save-answer', headers=headers,
+                       json={'question_id': first, 'answer': 'Rome'}).get_json() == {'success': True, 'saved': 1}
+    assert client.post('/api/save-answers', headers=headers,
+                       json={'answers': {str(first): 'Paris', str(second): '  EARTH '}}).get_json()['saved'] == 2
+
+    # A reload shows what was saved, with the later answer winning
+    response = client.get(f'/api/questions/{location}', headers=headers)
+    assert response.get_json()['existing_answers'] == {str(first): 'Paris', str(second): '  EARTH '}
+
+    response = client.post('/api/submit', headers=headers)
+    if response.status_code == 202:
+        response = client.get('/api/submit-status', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'score': 5, 'rank': 1}
+
+    # Submitted: the same token can no longer reopen or change the quiz
+    assert client.get(f'/api/questions/{location}', headers=headers).status_code == 403
+    response = client.post('/api/save-answer', headers=headers, json={'question_id': first, 'answer': 'Rome'})
+    # The write-behind buffer acknowledges without checking; its flush skips submitted rows
+    assert response.status_code == (200 if mode == 'write_behind' else 403)
+    answer_buffer.flush()
+    assert storage.get_participant(details['sso'], location)['answers'][str(first)] == 'Paris'
+    assert client.post('/api/submit', headers=headers).get_json() == {'success': True, 'score': 5, 'rank': 1}
+
+    response = client.post('/api/register', json=details)
+    assert response.status_code == 400
+    assert 'already completed' in response.get_json()['message']
+
+def test_resume_keeps_answers(location):
+    details = new_participant(location)
+    client = app.test_client()
+    headers = register(client, details)
+    first = question_ids(client, location, headers)[0]
+    client.post('/api/save-answer', headers=headers, json={'question_id': first, 'answer': 'Paris'})
+
+    # Another browser registering with the same details picks up where the first left off
+    other = app.test_client()
+    response = other.post('/api/register', json=details)
+    assert response.get_json()['can_resume'] is True
+    resumed = {PARTICIPANT_TOKEN_HEADER: response.get_json()['token']}
+    assert other.get(f'/api/questions/{location}', headers=resumed).get_json()['existing_answers'] == {str(first): 'Paris'}
+
+def test_registration_conflicts(location):
+    client = app.test_client()
+    details = new_participant(location)
+    register(client, details)
+
+    response = client.post('/api/register', json={**details, 'email': 'someone.else@gevernova.com'})
+    assert response.status_code == 400
+    assert 'SSO is already registered' in response.get_json()['message']
+    response = client.post('/api/register', json={**new_participant(location), 'email': details['email']})
+    assert response.status_code == 400
+    assert 'Email is already registered' in response.get_json()['message']
+
+    assert client.post('/api/register', json={**details, 'sso': '1234'}).status_code == 400
+    assert client.post('/api/register', json={**details, 'email': 'me@example.com'}).status_code == 400
+
+def test_malformed_answers_are_refused(location):
+    client = app.test_client()
+    headers = register(client, new_participant(location))
+    first = question_ids(client, location, headers)[0]
+
+    for answer in ({'x': 1}, [{'x': 1}], [1, ['a']]):
+        response = client.post('/api/save-answers', headers=headers, json={'answers': {str(first): answer}})
+        assert response.status_code == 400
+        response = client.post('/api/save-answer', headers=headers, json={'question_id': first, 'answer': answer})
+        assert response.status_code == 400
+    assert client.post('/api/save-answers', headers=headers,
+                       json={'answers': {str(first): ['Paris', 1]}}).get_json()['saved'] == 1
+    assert client.post('/api/submit', headers=headers).get_json()['score'] == 0
+
+def test_closed_location_refuses_participants(location, admin):
+    client = app.test_client()
+    headers = register(client, new_participant(location))
+    admin.post('/api/admin/quiz-status', json={'location': location, 'is_open': False})
+
+    assert client.post('/api/register', json=new_participant(location)).status_code == 403
+    assert client.get(f'/api/questions/{location}', headers=headers).status_code == 403
+
+def test_token_is_required_and_checked(location):
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+    token = headers[PARTICIPANT_TOKEN_HEADER]
+
+    for bad in ({}, {PARTICIPANT_TOKEN_HEADER: 'forged'}, {PARTICIPANT_TOKEN_HEADER: token[:-2] + 'xx'}):
+        assert client.get(f'/api/questions/{location}', headers=bad).status_code == 401
+        assert client.post('/api/save-answer', headers=bad, json={'question_id': 1, 'answer': 'x'}).status_code == 401
+        assert client.post('/api/submit', headers=bad).status_code == 401
+
+    # A token names one location
+    assert client.get('/api/questions/elsewhere', headers=headers).status_code == 401
+
+    # Tokens signed with another key are forgeries
+    other = URLSafeTimedSerializer('other-key', salt='participant-token').dumps(
+        {'sso': details['sso'], 'location': location, 'event': live_event.id()}
+    )
+    assert client.get(f'/api/questions/{location}', headers={PARTICIPANT_TOKEN_HEADER: other}).status_code == 401
+
+def test_expired_token(location, monkeypatch):
+    client = app.test_client()
+    headers = register(client, new_participant(location))
+    monkeypatch.setattr('quiz.participant_api.PARTICIPANT_TOKEN_MAX_AGE', -1)
+    assert client.get(f'/api/questions/{location}', headers=headers).status_code == 401
+
+def test_beacon_saves_with_body_token(location):
+    client = app.test_client()
+    headers = register(client, new_participant(location))
+    first = question_ids(client, location, headers)[0]
+    response = client.post('/api/save-answers', data=json.dumps({
+        'token': headers[PARTICIPANT_TOKEN_HEADER], 'answers': {str(first): 'Paris'}
+    }), content_type='text/plain')
+    assert response.get_json() == {'success': True, 'saved': 1}
+
+def test_concurrent_submits_score_once(location, mode):
+    client = app.test_client()
+    headers = register(client, new_participant(location))
+    first = question_ids(client, location, headers)[0]
+    client.post('/api/save-answer', headers=headers, json={'question_id': first, 'answer': 'Paris'})
+
+    responses = []
+
+    def submit():
+        response = app.test_client().post('/api/submit', headers=headers)
+        if response.status_code == 202:
+            response = app.test_client().get('/api/submit-status', headers=headers)
+        responses.append(response)
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r.status_code for r in responses] == [200] * 8
+    assert {r.get_json()['score'] for r in responses} == {2}
+    leaderboard = client.get(f'/api/leaderboard/{location}').get_json()
+    assert leaderboard['participants'] == 1
+
+def test_leaderboard_ranks_by_score_then_time(location):
+    results = []
+    for answer in ('Rome', 'Paris', 'Paris'):
+        client = app.test_client()
+        details = new_participant(location)
+        headers = register(client, details)
+        first = question_ids(client, location, headers)[0]
+        client.post('/api/save-answer', headers=headers, json={'question_id': first, 'answer': answer})
+        results.append((details['name'], client.post('/api/submit', headers=headers).get_json()))
+
+    leaderboard = app.test_client().get(f'/api/leaderboard/{location}').get_json()
+    # Equal scores: whoever submitted first ranks higher
+    assert [entry['name'] for entry in leaderboard['top']] == [results[1][0], results[2][0], results[0][0]]
+    assert [entry['score'] for entry in leaderboard['top']] == [2, 2, 0]
+
+def test_admin_sees_participants(location, admin):
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+    client.post('/api/submit', headers=headers)
+
+    rows = admin.get(f'/api/admin/participants/{location}').get_json()
+    assert [(row['sso'], row['score']) for row in rows] == [(details['sso'], 0)]
+    assert app.test_client().get(f'/api/admin/participants/{location}').status_code == 401
+
+    assert admin.delete(f"/api/admin/participants/{location}/{details['sso']}").get_json()['success']
+    assert admin.get(f'/api/admin/participants/{location}').get_json() == []
+
+def test_admin_participant_pages(location, admin):
+    ssos = []
+    for _ in range(3):
+        client = app.test_client()
+        details = new_participant(location)
+        client.post('/api/submit', headers=register(client, details))
+        ssos.append(details['sso'])
+
+    url = f'/api/admin/participants/{location}?fields=sso,score&limit=2'
+    first = admin.get(url)
+    assert [set(row) for row in first.get_json()] == [{'sso', 'score'}] * 2
+    second = admin.get(f"{url}&cursor={first.headers['X-Next-Cursor']}")
+    assert 'X-Next-Cursor' not in second.headers
+    # Equal scores: earliest submission first
+    assert [row['sso'] for row in first.get_json() + second.get_json()] == ssos
+
+    assert admin.get(f'/api/admin/participants/{location}?fields=sso,password').status_code == 400
+    assert admin.get(f'/api/admin/participants/{location}?cursor=not-a-cursor').status_code == 400
+
+def test_admin_participant_list_etag(location, admin, monkeypatch):
+    # The ETag comes from the event counter, which is only trusted with a live epoch
+    monkeypatch.setattr('quiz.bus.event_bus.epoch', lambda: 1)
+    url = f'/api/admin/participants/{location}?fields=sso,score'
+    response = admin.get(url)
+    etag = response.headers['ETag']
+    assert etag.startswith('W/') and response.headers['Cache-Control'] == 'private, no-cache'
+
+    unchanged = admin.get(url, headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304 and unchanged.headers['ETag'] == etag
+    # Another projection is another resource
+    assert admin.get(f'{url},name', headers={'If-None-Match': etag}).status_code == 200
+
+    client = app.test_client()
+    details = new_participant(location)
+    client.post('/api/submit', headers=register(client, details))
+    changed = admin.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert [row['sso'] for row in changed.get_json()] == [details['sso']]
+
+    # Answers change without an event, so views that include them are never cached
+    assert 'ETag' not in admin.get(f'/api/admin/participants/{location}').headers
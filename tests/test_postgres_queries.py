@@ -0,0 +1,85 @@
+"""The PostgreSQL query registry against a real server (set TEST_DATABASE_URL)."""
+import pytest
+
+from conftest import new_participant
+from quiz.caches import live_event
+from quiz.db import PreparedStatement, db_transaction, numbered_placeholders
+from quiz.storage import PostgresStorage, storage
+
+postgres_only = pytest.mark.skipif(
+    storage.name != 'postgresql', reason='set TEST_DATABASE_URL to run against PostgreSQL'
+)
+
+# Multi-row VALUES %s templates (expanded by execute_values) and DDL are sent
+# as text; every other registered statement must survive PREPARE
+SENT_AS_TEXT = {
+    'create_schema_version', 'import_questions', 'merge_answers_bulk',
+    'submit_bulk_answers', 'submit_bulk', 'rescore_update',
+}
+
+def test_numbered_placeholders():
+    query, keys = numbered_placeholders(
+        "SELECT * FROM t WHERE a = %(a)s AND b = %(b)s AND c = %(a)s"
+    )
+    assert query == "SELECT * FROM t WHERE a = $1 AND b = $2 AND c = $1"
+    assert keys == ('a', 'b')
+
+    query, keys = numbered_placeholders("SELECT * FROM t WHERE a = %s AND b = %s")
+    assert query == "SELECT * FROM t WHERE a = $1 AND b = $2"
+    assert keys == (0, 1)
+
+def test_text_statements_are_registered():
+    assert SENT_AS_TEXT <= set(PostgresStorage.queries)
+
+@postgres_only
+@pytest.mark.parametrize('name', sorted(set(PostgresStorage.queries) - SENT_AS_TEXT))
+def test_statement_prepares(name):
+    statement = PostgresStorage.queries[name]
+    with db_transaction(label='test_prepare') as conn:
+        with conn.cursor() as cur:
+            cur.execute(statement.prepare_sql)
+            cur.execute(f"DEALLOCATE q_{name}")
+
+@postgres_only
+@pytest.mark.parametrize('prepared', [True, False], ids=['prepared', 'text'])
+def test_participant_statements_round_trip(location, monkeypatch, prepared):
+    monkeypatch.setattr('quiz.db.DB_PREPARED_STATEMENTS', prepared)
+    executed = []
+    run = PreparedStatement.run
+
+    def record_run(statement, conn, cur, params):
+        executed.append(statement.name)
+        return run(statement, conn, cur, params)
+    monkeypatch.setattr(PreparedStatement, 'run', record_run)
+
+    first, second = new_participant(location), new_participant(location)
+    for details in (first, second):
+        assert storage.register(details['sso'], details['name'], details['email'], location) == ('new', None)
+    assert storage.register(first['sso'], first['name'], first['email'], location) == ('resume', location)
+
+    assert storage.merge_answers(first['sso'], location, {'1': 'Paris'}) == 'saved'
+    assert storage.merge_answers('999999998', location, {'1': 'Paris'}) == 'not_registered'
+    event_id = live_event.id()
+    storage.merge_answers_bulk({(event_id, second['sso'], location): {'1': 'Rome', '2': 'Earth'}})
+    assert storage.get_participant(second['sso'], location)['answers'] == {'1': 'Rome', '2': 'Earth'}
+
+    rows = storage.submit_bulk(
+        {(event_id, first['sso'], location): None}, lambda key, answers: len(answers)
+    )
+    assert [(row['sso'], row['score']) for row in rows] == [(first['sso'], 1)]
+    assert rows[0]['submitted_at'] is not None
+    assert storage.submit(first['sso'], location, 5) is None    # already submitted
+    assert storage.merge_answers(first['sso'], location, {'2': 'Earth'}) == 'submitted'
+    assert storage.submit(second['sso'], location, 2)['score'] == 2
+
+    assert storage.rescore(location, lambda answers: 10 * len(answers)) == (2, 2)
+    page = storage.list_participants(location, ['sso', 'score'], limit=10)
+    assert [(row['sso'], row['score']) for row in page] == [(second['sso'], 20), (first['sso'], 10)]
+    assert storage.answer_stats(location)['scores'] == [
+        {'score': 10, 'participants': 1}, {'score': 20, 'participants': 1}
+    ]
+
+    storage.delete_participant(location, first['sso'])
+    assert storage.get_participant(first['sso'], location) is None
+
+    assert ('get_participant' in executed) == prepared
@@ -0,0 +1,74 @@
+"""Question bank import and export (JSON and CSV)."""
+import csv
+import io
+import uuid
+
+from conftest import app
+from quiz.caches import get_question_set
+
+BANK = [
+    {'question': 'Capital of Italy?', 'type': 'single', 'options': ['Paris', 'Rome'],
+     'correct_answer': 'Rome', 'points': 2},
+    {'question': 'Primary colours?', 'type': 'multiple', 'options': ['Red', 'Green', 'Blue'],
+     'correct_answer': ['Red', 'Blue'], 'points': 1},
+    {'question': 'The sun is a star', 'type': 'truefalse', 'options': ['True', 'False'],
+     'correct_answer': 'True', 'points': 1},
+    {'question': 'Largest ocean?', 'type': 'text', 'options': None, 'correct_answer': 'Pacific', 'points': 3}
+]
+
+def exported(admin, location, export_format='json'):
+    response = admin.get(f'/api/admin/question-bank?location={location}&format={export_format}')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == f'attachment; filename="questions-{location}.{export_format}"'
+    if export_format == 'json':
+        return response.get_json()['questions']
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+def test_json_import_and_export(location, admin):
+    assert len(get_question_set(location)['questions']) == 2
+    response = admin.post(f'/api/admin/question-bank?location={location}', json={'questions': BANK})
+    assert response.get_json() == {'success': True, 'imported': {location: 4}}
+    assert len(exported(admin, location)) == 6
+    # The import reaches the participant view at once
+    assert len(get_question_set(location)['questions']) == 6
+
+    response = admin.post('/api/admin/question-bank', json={
+        'mode': 'replace', 'questions': [{**q, 'location': location} for q in BANK]
+    })
+    assert response.get_json()['imported'] == {location: 4}
+    assert exported(admin, location) == [{**q, 'location': location} for q in BANK]
+
+def test_csv_round_trip(location, admin):
+    admin.post(f'/api/admin/question-bank?location={location}&mode=replace', json=BANK)
+    rows = exported(admin, location, 'csv')
+    assert rows[1] == {'location': location, 'question': 'Primary colours?', 'type': 'multiple',
+                       'options': 'Red|Green|Blue', 'correct_answer': 'Red|Blue', 'points': '1'}
+
+    # The exported file imports into another location unchanged
+    other = f"T{uuid.uuid4().hex[:8]}"
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=rows[0].keys())
+    writer.writeheader()
+    writer.writerows({**row, 'location': ''} for row in rows)
+    response = admin.post(f'/api/admin/question-bank?location={other}', data=buffer.getvalue(), content_type='text/csv')
+    assert response.get_json() == {'success': True, 'imported': {other: 4}}
+    assert exported(admin, other) == [{**q, 'location': other} for q in BANK]
+
+def test_invalid_bank_writes_nothing(location, admin):
+    bad = [BANK[0], {**BANK[1], 'correct_answer': ['Purple']}, {**BANK[3], 'type': 'essay'}, 'nope']
+    response = admin.post(f'/api/admin/question-bank?location={location}', json=bad)
+    assert response.status_code == 400
+    assert [error['index'] for error in response.get_json()['errors']] == [1, 2, 3]
+    assert len(exported(admin, location)) == 2
+
+    assert admin.post(f'/api/admin/question-bank?location={location}&mode=merge', json=BANK).status_code == 400
+    assert admin.post('/api/admin/question-bank', json={'questions': []}).status_code == 400
+    assert admin.get('/api/admin/question-bank?format=xml').status_code == 400
+    assert app.test_client().get('/api/admin/question-bank').status_code == 401
+
+def test_csv_export_of_numeric_options(location, admin):
+    admin.post(f'/api/admin/question-bank?location={location}&mode=replace', json=[
+        {'question': 'Pick the primes', 'type': 'multiple', 'options': [2, 4, 5], 'correct_answer': [2, 5], 'points': 1}
+    ])
+    rows = exported(admin, location, 'csv')
+    assert (rows[0]['options'], rows[0]['correct_answer']) == ('2|4|5', '2|5')
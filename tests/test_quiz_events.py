@@ -0,0 +1,155 @@
+"""Starting and archiving quiz events, including writes still in flight during a switch."""
+import gzip
+import json
+
+import pytest
+
+from conftest import app, new_participant, register
+from quiz.caches import live_event
+from quiz.db import db_transaction
+from quiz.participant_api import PARTICIPANT_TOKEN_HEADER
+from quiz.queues import answer_buffer, submission_queue
+from quiz.storage import storage
+
+def start_event(admin, name='Next event'):
+    response = admin.post('/api/admin/quiz-events', json={'name': name})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['event']['id']
+
+def event_rows(event_id):
+    return {row['sso']: row for batch in storage.stream_event_participants(event_id) for row in batch}
+
+def first_question(client, location, headers):
+    return client.get(f'/api/questions/{location}', headers=headers).get_json()['questions'][0]['id']
+
+def test_new_event_starts_over(location, admin):
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+    client.post('/api/submit', headers=headers)
+    old_event = live_event.id()
+
+    new_event = start_event(admin)
+    assert live_event.id() == new_event != old_event
+
+    # Tokens name their event, so the old one no longer opens the quiz
+    assert client.get(f'/api/questions/{location}', headers=headers).status_code == 401
+    assert client.post('/api/submit', headers=headers).status_code == 401
+
+    # The same SSO takes the quiz again, from scratch
+    response = client.post('/api/register', json=details)
+    assert response.get_json()['can_resume'] is False
+    headers = {PARTICIPANT_TOKEN_HEADER: response.get_json()['token']}
+    assert client.get(f'/api/questions/{location}', headers=headers).get_json()['existing_answers'] == {}
+    assert client.get(f'/api/leaderboard/{location}').get_json()['participants'] == 0
+
+    events = admin.get('/api/admin/quiz-events').get_json()
+    assert events['live'] == new_event
+    counts = {event['id']: event['participants'] for event in events['events']}
+    assert counts[new_event] == 1 and counts[old_event] >= 1
+
+def test_event_requires_admin_and_name(admin):
+    assert app.test_client().post('/api/admin/quiz-events', json={'name': 'x'}).status_code == 401
+    assert app.test_client().get('/api/admin/quiz-events').status_code == 401
+    assert admin.post('/api/admin/quiz-events', json={'name': '  '}).status_code == 400
+
+def test_archive(location, admin):
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+    client.post('/api/save-answer', headers=headers, json={'question_id': first_question(client, location, headers),
+                                                           'answer': 'Paris'})
+    client.post('/api/submit', headers=headers)
+    old_event = live_event.id()
+
+    assert admin.post(f'/api/admin/quiz-events/{old_event}/archive').status_code == 400    # still live
+    assert admin.post('/api/admin/quiz-events/999999/archive').status_code == 404
+    assert app.test_client().post(f'/api/admin/quiz-events/{old_event}/archive').status_code == 401
+
+    start_event(admin)
+    response = admin.post(f'/api/admin/quiz-events/{old_event}/archive')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['participants'] >= 1
+
+    with gzip.open(result['file'], 'rt') as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == result['participants']
+    mine = next(record for record in records if record['sso'] == details['sso'])
+    assert mine['event_id'] == old_event and mine['location'] == location
+    assert mine['score'] == 2 and mine['answers'] and mine['submitted_at']
+
+    # The rows leave the participant tables: deleted on SQLite, detached as
+    # participants_e<id> / sso_tracker_e<id> on Postgres
+    assert event_rows(old_event) == {}
+    if storage.name == 'postgresql':
+        with db_transaction(label='test_archive') as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT sso FROM participants_e{old_event}")
+                assert (details['sso'],) in cur.fetchall()
+                cur.execute("SELECT count(*) FROM pg_inherits WHERE inhrelid = %s::regclass",
+                            (f'participants_e{old_event}',))
+                assert cur.fetchone()[0] == 0
+
+    archived = next(event for event in admin.get('/api/admin/quiz-events').get_json()['events']
+                    if event['id'] == old_event)
+    assert archived['archive_file'] == result['file'] and archived['participants'] == result['participants']
+    assert admin.post(f'/api/admin/quiz-events/{old_event}/archive').status_code == 400    # already archived
+
+def test_buffered_answers_stay_with_their_event(location, monkeypatch):
+    """Answers buffered before another worker switched events are written to the old event"""
+    monkeypatch.setattr('quiz.queues.ANSWER_WRITE_BEHIND', True)
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+    question_id = first_question(client, location, headers)
+    old_event = live_event.id()
+    assert client.post('/api/save-answer', headers=headers,
+                       json={'question_id': question_id, 'answer': 'Paris'}).status_code == 200
+
+    # The switch as another worker makes it: this worker's buffer isn't flushed first
+    new_event = storage.start_quiz_event('Switched elsewhere')['id']
+    live_event.set(new_event)
+    answer_buffer.flush()
+
+    assert event_rows(old_event)[details['sso']]['answers'] == {str(question_id): 'Paris'}
+    assert details['sso'] not in event_rows(new_event)
+
+def test_queued_submissions_stay_with_their_event(location, monkeypatch):
+    monkeypatch.setattr('quiz.queues.SUBMIT_QUEUE', True)
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+    client.post('/api/save-answer', headers=headers, json={'question_id': first_question(client, location, headers),
+                                                           'answer': 'Paris'})
+    old_event = live_event.id()
+
+    new_event = storage.start_quiz_event('Switched elsewhere')['id']
+    live_event.set(new_event)
+    job = submission_queue.submit(old_event, details['sso'], location)
+    assert job.done.wait(5) and job.status == 'scored'
+
+    row = event_rows(old_event)[details['sso']]
+    assert row['score'] == 2 and row['submitted_at'] is not None
+
+def test_switch_waits_for_queued_submissions(admin, monkeypatch):
+    monkeypatch.setattr('quiz.queues.SUBMIT_QUEUE', True)
+    monkeypatch.setattr(submission_queue, 'wait_idle', lambda timeout: False)
+    live = live_event.id()
+    response = admin.post('/api/admin/quiz-events', json={'name': 'Too soon'})
+    assert response.status_code == 409
+    assert live_event.id() == live
+
+    monkeypatch.setattr(submission_queue, 'wait_idle', lambda timeout: True)
+    assert start_event(admin) != live
+
+@pytest.mark.skipif(storage.name != 'postgresql', reason='partitions are Postgres only')
+def test_new_event_gets_partitions(admin):
+    event_id = start_event(admin)
+    with db_transaction(label='test_partitions') as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE c.relname IN (%s, %s)", (f'participants_e{event_id}', f'sso_tracker_e{event_id}')
+            )
+            assert len(cur.fetchall()) == 2
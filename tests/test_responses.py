@@ -0,0 +1,47 @@
+"""JSON encoding and gzip compression of API responses."""
+import gzip
+import json
+from datetime import datetime, timezone
+
+from conftest import app
+from quiz.encoding import encode_json, raw_json
+
+def test_encode_json_matches_flask():
+    obj = {'c': True, 'b': [1, 'two', None], 'a': datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)}
+    encoded = encode_json(obj)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == {'a': 'Wed, 01 May 2024 12:30:00 GMT', 'b': [1, 'two', None], 'c': True}
+    assert encoded.index(b'"a"') < encoded.index(b'"b"') < encoded.index(b'"c"')
+
+def test_raw_json_is_embedded_as_is():
+    with app.test_request_context():
+        response = app.json.response({'answers': raw_json('{"1": ["Paris", 2]}')})
+    assert json.loads(response.get_data()) == {'answers': {'1': ['Paris', 2]}}
+
+def test_large_json_responses_are_gzipped(location, admin, monkeypatch):
+    monkeypatch.setattr('quiz.web.GZIP_MIN_BYTES', 100)
+    url = f'/api/admin/question-bank?location={location}'
+    plain = admin.get(url)
+    assert 'Content-Encoding' not in plain.headers
+
+    response = admin.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == plain.data
+
+def test_small_or_refused_responses_are_not_gzipped(location, admin, monkeypatch):
+    url = f'/api/admin/question-bank?location={location}'
+    monkeypatch.setattr('quiz.web.GZIP_MIN_BYTES', 100000)
+    assert 'Content-Encoding' not in admin.get(url, headers={'Accept-Encoding': 'gzip'}).headers
+
+    monkeypatch.setattr('quiz.web.GZIP_MIN_BYTES', 100)
+    assert 'Content-Encoding' not in admin.get(url, headers={'Accept-Encoding': 'gzip;q=0, br'}).headers
+
+    # 0 turns compression off
+    monkeypatch.setattr('quiz.web.GZIP_MIN_BYTES', 0)
+    assert 'Content-Encoding' not in admin.get(url, headers={'Accept-Encoding': 'gzip'}).headers
+
+def test_streamed_responses_are_not_buffered_for_gzip(location, admin, monkeypatch):
+    monkeypatch.setattr('quiz.web.GZIP_MIN_BYTES', 1)
+    response = admin.get(f'/api/admin/export/{location}', headers={'Accept-Encoding': 'gzip'})
+    assert response.is_streamed and 'Content-Encoding' not in response.headers
@@ -0,0 +1,61 @@
+"""Compiled answer keys, scoring and re-scoring after a question changes."""
+from conftest import app, new_participant, register
+from quiz.admin_api import rescore_location
+from quiz.caches import get_question_set
+from quiz.scoring import compile_answer, score_answers, valid_answer
+
+def answer_key(*questions):
+    return [compile_answer({'id': i, 'points': 2, **question}) for i, question in enumerate(questions, 1)]
+
+def test_each_question_type_scores():
+    key = answer_key(
+        {'question_type': 'multiple', 'correct_answer': ['a', 'b']},
+        {'question_type': 'ordered', 'correct_answer': [3, 1, 2]},
+        {'question_type': 'single', 'correct_answer': 'Paris'},
+        {'question_type': 'text', 'correct_answer': 'Planet  Earth'},
+        {'question_type': 'truefalse', 'correct_answer': True}
+    )
+    assert score_answers(key, {'1': ['a', 'c', 'b'], '2': [1, 2, 3], '3': 'Paris', '4': ' planet earth', '5': True}) == 12
+    assert score_answers(key, {'1': ['c'], '2': [1, 2], '3': 'paris', '4': 'Mars', '5': False}) == 0
+    assert score_answers(key, {}) == 0
+
+def test_malformed_answers_score_nothing():
+    key = answer_key(
+        {'question_type': 'multiple', 'correct_answer': ['a', 'b']},
+        {'question_type': 'ordered', 'correct_answer': ['a', 1]}
+    )
+    assert score_answers(key, {'1': [{'x': 1}], '2': [{'x': 1}, 'a']}) == 0
+    assert score_answers(key, {'1': ['a', ['b']], '2': [1, 'a']}) == 4
+    assert score_answers(key, {'1': {'a': 1}, '2': 'a'}) == 0
+
+def test_valid_answer_shapes():
+    for answer in ('Paris', 3, 2.5, True, None, [], ['a', 1, 2.5]):
+        assert valid_answer(answer), answer
+    for answer in ({'x': 1}, [{'x': 1}], [1, 'a', None], [True], [['a']]):
+        assert not valid_answer(answer), answer
+
+def submit_answer(location, answer):
+    client = app.test_client()
+    details = new_participant(location)
+    headers = register(client, details)
+    if answer is not None:
+        question_id = client.get(f'/api/questions/{location}', headers=headers).get_json()['questions'][0]['id']
+        client.post('/api/save-answer', headers=headers, json={'question_id': question_id, 'answer': answer})
+    client.post('/api/submit', headers=headers)
+    return details['name']
+
+def test_rescore_after_changing_the_answer(location, admin):
+    names = [submit_answer(location, answer) for answer in ('Paris', 'Rome', None)]
+    question = get_question_set(location)['questions'][0]
+    assert admin.put(f"/api/admin/questions/{location}/{question['id']}", json={
+        **question, 'correct_answer': 'Rome'
+    }).get_json()['success']
+
+    assert app.test_client().post(f'/api/admin/rescore/{location}').status_code == 401
+    result = admin.post(f'/api/admin/rescore/{location}').get_json()
+    assert result['success'] and (result['participants'], result['updated']) == (3, 2)
+    top = app.test_client().get(f'/api/leaderboard/{location}').get_json()['top']
+    assert [(entry['name'], entry['score']) for entry in top] == [(names[1], 2), (names[0], 0), (names[2], 0)]
+
+    # Nothing changed since: every row is read, none is written (also across small batches)
+    assert rescore_location(location, batch_size=1)['updated'] == 0
@@ -0,0 +1,76 @@
+"""Fingerprinted, precompressed static assets (build_assets.py and /static/dist)."""
+import gzip
+import os
+
+import build_assets
+import quiz.web
+from conftest import app
+
+CSS = "/* theme */\nbody {\n    color: red;\n    margin: 0;\n}\n"
+
+def build(tmp_path, monkeypatch):
+    """Build a one-stylesheet static folder in tmp_path and serve it"""
+    static_dir = tmp_path / 'static'
+    (static_dir / 'css').mkdir(parents=True)
+    (static_dir / 'css' / 'style.css').write_text(CSS)
+    monkeypatch.setattr(build_assets, 'STATIC_DIR', str(static_dir))
+    monkeypatch.setattr(build_assets, 'DIST_DIR', str(static_dir / 'dist'))
+    monkeypatch.setattr(app, 'static_folder', str(static_dir))
+    monkeypatch.setattr('quiz.web.STATIC_DIST_DIR', str(static_dir / 'dist'))
+    monkeypatch.setattr('sys.argv', ['build_assets.py'])
+    build_assets.main()
+    return static_dir
+
+def test_minifiers():
+    assert build_assets.minify_css(CSS) == 'body{color:red;margin:0}\n'
+    assert build_assets.minify_js("// setup\nfunction f() {\n\n    return 1;\n}\n") == 'function f() {\nreturn 1;\n}\n'
+
+def test_build_writes_fingerprinted_variants(tmp_path, monkeypatch):
+    static_dir = build(tmp_path, monkeypatch)
+    built = quiz.web.load_asset_manifest()['css/style.css']
+    assert built.startswith('css/style.') and built.endswith('.css')
+    target = static_dir / 'dist' / built
+    assert target.read_text() == 'body{color:red;margin:0}\n'
+    assert gzip.decompress((static_dir / 'dist' / (built + '.gz')).read_bytes()) == target.read_bytes()
+    assert os.path.exists(f'{target}.br') == (build_assets.brotli is not None)
+
+    # The same source always builds to the same URL
+    build_assets.main()
+    assert quiz.web.load_asset_manifest()['css/style.css'] == built
+
+def test_changed_source_falls_back_to_plain_file(tmp_path, monkeypatch):
+    static_dir = build(tmp_path, monkeypatch)
+    (static_dir / 'css' / 'style.css').write_text(CSS + 'p { color: blue; }\n')
+    assert quiz.web.load_asset_manifest() == {}
+
+    monkeypatch.setattr('quiz.web._asset_manifest', {})
+    assert quiz.web.asset_url('css/style.css') == '/static/css/style.css'
+    monkeypatch.setattr('quiz.web._asset_manifest', {'css/style.css': 'css/style.abc.css'})
+    assert quiz.web.asset_url('css/style.css') == '/static/dist/css/style.abc.css'
+
+def test_built_asset_is_precompressed_and_immutable(tmp_path, monkeypatch):
+    static_dir = build(tmp_path, monkeypatch)
+    built = quiz.web.load_asset_manifest()['css/style.css']
+    # Stand in for the Brotli variant when the package isn't installed
+    (static_dir / 'dist' / (built + '.br')).write_bytes(b'brotli bytes')
+    client = app.test_client()
+    url = f'/static/dist/{built}'
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br' and response.data == b'brotli bytes'
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == b'body{color:red;margin:0}\n'
+
+    response = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b'body{color:red;margin:0}\n'
+
+    assert response.mimetype == 'text/css'
+    assert response.headers['Cache-Control'] == f'public, max-age={quiz.web.STATIC_DIST_MAX_AGE}, immutable'
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+def test_missing_built_asset(tmp_path, monkeypatch):
+    build(tmp_path, monkeypatch)
+    assert app.test_client().get('/static/dist/css/style.0000000000.css').status_code == 404